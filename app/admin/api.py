@@ -7,7 +7,7 @@ import os
 import psutil
 import asyncio
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
@@ -107,12 +107,12 @@ async def get_models_status():
         # Check if Ollama is available
         if ollama_analyzer.is_available:
             try:
-                model_list = ollama_analyzer.client.list()
+                model_list = await ollama_analyzer.client.list()
                 
                 for model in model_list.get('models', []):
                     model_info = ModelInfo(
                         name=model.get('name', 'Unknown'),
-                        status="active" if model.get('name') == ollama_analyzer.default_model else "idle",
+                        status="active" if model.get('name') in ollama_analyzer.router.models() else "idle",
                         size=f"{model.get('size', 0) / (1024**3):.1f}GB",
                         accuracy=round(90 + (hash(model.get('name', '')) % 10), 1),
                         last_used=datetime.now().isoformat()
@@ -342,6 +342,49 @@ async def export_configuration():
     
     return config
 
+@router.get("/ml/client")
+async def get_ml_client_status():
+    """Circuit breaker, latency, batching and fallback state of the ML server client"""
+    from app.ml_client.predict import get_ml_client_stats
+    from app.ml_client.fallback import get_fallback_stats
+    
+    return {**get_ml_client_stats(), "fallback": get_fallback_stats()}
+
+class OllamaRoute(BaseModel):
+    task: str = "*"
+    model: str
+    max_chars: Optional[int] = None
+
+@router.get("/ollama/routes")
+async def get_ollama_routes():
+    """Model routes of the Ollama analyzer with per-route latency and token metrics"""
+    from app.ml_client.ollama_client import ollama_analyzer
+    
+    return ollama_analyzer.router.get_stats()
+
+@router.put("/ollama/routes")
+async def update_ollama_routes(routes: List[OllamaRoute]):
+    """Replace the Ollama model routes at runtime (first matching route wins)"""
+    from app.ml_client.ollama_client import ollama_analyzer
+    
+    # Reject models no Ollama host has, instead of failing on the next document
+    if await ollama_analyzer.ensure_available():
+        from app.ml_client.ollama_pool import model_key
+        
+        installed = set()
+        for host in ollama_analyzer.pool.endpoints:
+            installed |= host.installed or set()
+        missing = sorted({route.model for route in routes if model_key(route.model) not in installed})
+        if missing:
+            raise HTTPException(status_code=400, detail=f"Models not installed in Ollama: {', '.join(missing)}")
+    
+    try:
+        ollama_analyzer.router.set_routes([route.dict() for route in routes])
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return ollama_analyzer.router.get_stats()
+
 @router.get("/health/detailed")
 async def get_detailed_health():
     """Get detailed health status of all components"""
@@ -356,7 +399,8 @@ async def get_detailed_health():
                 "status": "online" if ollama_analyzer.is_available else "offline",
                 "host": ollama_analyzer.ollama_host,
                 "model": ollama_analyzer.default_model,
-                "last_check": datetime.now().isoformat()
+                "last_check": ollama_analyzer.get_availability()["last_probe_at"],
+                "consecutive_failures": ollama_analyzer.get_availability()["consecutive_failures"]
             },
             "vision_api": {
                 "status": "configured" if vision_client.is_configured else "not_configured",
@@ -28,7 +28,7 @@ class Document(Base):
     
     # Processing status
     status = Column(String, nullable=False, default="pending", index=True)
-    # Possible statuses: pending, processing, completed, failed
+    # Possible statuses: pending, processing, completed, failed, cancelled
     
     # Classification results
     doc_type = Column(String, nullable=True, index=True)
@@ -12,11 +12,14 @@ import aiohttp
 from google.cloud import storage
 from google.oauth2 import service_account
 
+from app.utils.deadline import bounded_timeout, check_deadline
+
 logger = logging.getLogger(__name__)
 
 # GCP Configuration
 GCP_BUCKET_NAME = os.getenv("GCP_BUCKET_NAME", "neuralex-incoming-json")
 GCP_CREDENTIALS_PATH = os.getenv("GCP_CREDENTIALS_PATH")
+GCS_FETCH_TIMEOUT = float(os.getenv("GCS_FETCH_TIMEOUT", "60"))
 
 async def fetch_from_gcs(gcs_uri: str) -> Dict[str, Any]:
     """
@@ -30,7 +33,10 @@ async def fetch_from_gcs(gcs_uri: str) -> Dict[str, Any]:
         
     Raises:
         Exception: If fetch fails
+        DeadlineExceeded: If the job deadline has already passed
     """
+    check_deadline("GCS fetch")
+    
     try:
         logger.info(f"Fetching document from GCS: {gcs_uri}")
         
@@ -59,12 +65,15 @@ async def fetch_from_gcs(gcs_uri: str) -> Dict[str, Any]:
         bucket = client.bucket(bucket_name)
         blob = bucket.blob(blob_path)
         
+        # Requests are capped by the remaining job deadline
+        timeout = bounded_timeout(GCS_FETCH_TIMEOUT)
+        
         # Check if blob exists
-        if not blob.exists():
+        if not blob.exists(timeout=timeout):
             raise FileNotFoundError(f"File not found in GCS: {gcs_uri}")
         
         # Download and parse content
-        content = blob.download_as_text()
+        content = blob.download_as_text(timeout=bounded_timeout(GCS_FETCH_TIMEOUT))
         
         # Try to parse as JSON
         try:
@@ -2,6 +2,7 @@
 FastAPI-App mit:
   – /health          GET   -> {"status": "ok"}
   – /ingest          POST  -> nimmt {gcs_uri:str} oder {payload:dict}
+  – /jobs/{id}       DELETE -> bricht wartenden oder laufenden Job ab
   – ruft async gcp_fetcher.fetch()
   – pushed Job in Redis-Queue (key: 'doc_jobs')
   – background-worker konsumiert, ruft ml_client.predict(), speichert Ergebnis in DB
@@ -15,6 +16,7 @@ TODO: Map JSON-Schemas → Pydantic-Models
 
 import os
 import json
+import time
 import uuid
 import asyncio
 import logging
@@ -26,16 +28,17 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from pydantic import BaseModel, Field
-import redis
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 from app.db.session import get_db, engine
 from app.db.models import Document, Entity, Base
-from app.ingestion.gcp_fetcher import fetch_from_gcs
-from app.ml_client.predict import predict_document
 from app.schemas.data_types import IngestRequest, IngestResponse, HealthResponse
 from app.utils.mapping import map_label_to_id, map_id_to_label
+from app.worker.queue_backend import get_queue_backend, close_queue_backend
+from app.worker.background_worker import WorkerPool
+from app.ml_client.predict import startup_ml_client, shutdown_ml_client
+from app.utils.deadline import compute_deadline
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -52,28 +55,40 @@ app = FastAPI(
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
-# Redis connection
-REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
-redis_client = None
+# Deployment mode:
+#   api      -> HTTP only, jobs are handled by separate worker processes
+#   combined -> HTTP plus an embedded pool of WORKER_CONCURRENCY workers
+# Worker-only processes run app.worker.background_worker (see app/run.py)
+RUN_MODE = os.getenv("RUN_MODE", "combined").lower()
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "1"))
+
+# Job queue (Redis or in-process, see QUEUE_BACKEND)
+queue_backend = None
+worker_pool = None
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database and Redis connections on startup"""
-    global redis_client
+    """Initialize database and queue connections on startup"""
+    global queue_backend, worker_pool
     try:
         # Create database tables
         async with engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
         logger.info("Database tables created successfully")
         
-        # Initialize Redis connection
-        redis_client = await aioredis.from_url(REDIS_URL)
-        await redis_client.ping()
-        logger.info("Redis connection established")
+        # Initialize job queue
+        queue_backend = await get_queue_backend()
+        logger.info(f"Job queue backend ready: {queue_backend.name}")
         
-        # Start background worker
-        asyncio.create_task(background_worker())
-        logger.info("Background worker started")
+        if RUN_MODE == "combined":
+            # Embedded workers share the API's queue connection and ML client pool
+            await startup_ml_client()
+            worker_pool = WorkerPool(WORKER_CONCURRENCY, queue_backend=queue_backend)
+            await worker_pool.start()
+        elif RUN_MODE == "api":
+            logger.info("Running in API-only mode, no embedded workers")
+        else:
+            raise ValueError(f"Unsupported RUN_MODE for the API process: {RUN_MODE}")
         
     except Exception as e:
         logger.error(f"Startup error: {e}")
@@ -82,10 +97,17 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up connections on shutdown"""
-    global redis_client
-    if redis_client:
-        await redis_client.close()
-        logger.info("Redis connection closed")
+    global queue_backend, worker_pool
+    if worker_pool:
+        await worker_pool.stop()
+        worker_pool = None
+    
+    await shutdown_ml_client()
+    
+    if queue_backend:
+        await close_queue_backend()
+        queue_backend = None
+        logger.info("Job queue closed")
 
 # Frontend Routes
 @app.get("/", response_class=HTMLResponse)
@@ -143,11 +165,20 @@ async def health_check():
         async with get_db() as db:
             await db.execute(select(1))
         
-        # Test Redis connection
-        if redis_client:
-            await redis_client.ping()
+        # Test queue connection
+        if queue_backend:
+            await queue_backend.ping()
         
-        return HealthResponse(status="ok", timestamp=datetime.utcnow())
+        # In combined mode the embedded workers are part of this service
+        if worker_pool and not worker_pool.is_healthy():
+            raise RuntimeError("Embedded workers are not running")
+        
+        return HealthResponse(
+            status="ok",
+            timestamp=datetime.utcnow(),
+            mode=RUN_MODE,
+            workers=worker_pool.alive_workers() if worker_pool else 0
+        )
     except Exception as e:
         logger.error(f"Health check failed: {e}")
         raise HTTPException(status_code=503, detail=f"Service unavailable: {e}")
@@ -173,15 +204,18 @@ async def ingest_document(request: IngestRequest, background_tasks: BackgroundTa
             db.add(document)
             await db.commit()
         
-        # Queue job for background processing
+        # Queue job for background processing; the deadline follows the SLA
+        # of the event type announced in the payload metadata (if any)
+        metadata = (request.payload or {}).get("metadata") or {}
         job_data = {
             "job_id": job_id,
             "gcs_uri": request.gcs_uri,
             "payload": request.payload,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": datetime.utcnow().isoformat(),
+            "deadline": compute_deadline(time.time(), metadata.get("event_type"))
         }
         
-        await redis_client.lpush("doc_jobs", json.dumps(job_data))
+        await queue_backend.push("doc_jobs", json.dumps(job_data))
         logger.info(f"Queued job {job_id} for processing")
         
         return IngestResponse(
@@ -194,6 +228,19 @@ async def ingest_document(request: IngestRequest, background_tasks: BackgroundTa
         logger.error(f"Ingestion error: {e}")
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {e}")
 
+async def _live_statuses(documents: List[Document]) -> Dict[str, str]:
+    """Document statuses, overlaid with the queue state of jobs still in flight"""
+    # Workers keep the in-flight status in the queue backend, not in the DB;
+    # all pending jobs of a page are looked up in one round trip
+    pending = [document.id for document in documents if document.status == "pending"]
+    job_states = {}
+    if pending and queue_backend:
+        job_states = await queue_backend.get_job_states("doc_jobs", pending)
+    return {
+        document.id: job_states.get(document.id, {}).get("status", document.status)
+        for document in documents
+    }
+
 @app.get("/jobs/{job_id}")
 async def get_job_status(job_id: str):
     """Get the status and results of a processing job"""
@@ -213,7 +260,7 @@ async def get_job_status(job_id: str):
             
             return {
                 "job_id": job_id,
-                "status": document.status,
+                "status": (await _live_statuses([document]))[job_id],
                 "doc_type": document.doc_type,
                 "event_type": document.event_type,
                 "confidence": document.confidence,
@@ -239,6 +286,50 @@ async def get_job_status(job_id: str):
         logger.error(f"Job status error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get job status: {e}")
 
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job; running jobs are aborted by their worker"""
+    try:
+        async with get_db() as db:
+            result = await db.execute(select(Document).where(Document.id == job_id))
+            document = result.scalar_one_or_none()
+            
+            if not document:
+                raise HTTPException(status_code=404, detail="Job not found")
+            
+            if document.status in ("completed", "failed", "cancelled"):
+                raise HTTPException(status_code=409, detail=f"Job already {document.status}")
+            
+            previous_status = await queue_backend.cancel("doc_jobs", job_id)
+            if previous_status not in ("queued", "processing"):
+                raise HTTPException(status_code=409, detail=f"Job already {previous_status}")
+            
+            # Only unfinished jobs are cancelled: a worker may have stored the
+            # result since the row was read
+            update_result = await db.execute(
+                update(Document)
+                .where(Document.id == job_id, Document.status.notin_(("completed", "failed", "cancelled")))
+                .values(status="cancelled", updated_at=datetime.utcnow())
+            )
+            if update_result.rowcount == 0:
+                await db.rollback()
+                raise HTTPException(status_code=409, detail="Job already finished")
+            await db.commit()
+            
+            logger.info(f"Job {job_id} cancelled (was {previous_status})")
+            
+            return {
+                "job_id": job_id,
+                "status": "cancelled",
+                "previous_status": previous_status
+            }
+            
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Job cancel error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to cancel job: {e}")
+
 @app.get("/jobs")
 async def list_jobs(skip: int = 0, limit: int = 50):
     """List all processing jobs with pagination"""
@@ -248,12 +339,13 @@ async def list_jobs(skip: int = 0, limit: int = 50):
                 select(Document).order_by(Document.created_at.desc()).offset(skip).limit(limit)
             )
             documents = result.scalars().all()
+            statuses = await _live_statuses(documents)
             
             return {
                 "jobs": [
                     {
                         "job_id": doc.id,
-                        "status": doc.status,
+                        "status": statuses[doc.id],
                         "doc_type": doc.doc_type,
                         "event_type": doc.event_type,
                         "confidence": doc.confidence,
@@ -271,95 +363,6 @@ async def list_jobs(skip: int = 0, limit: int = 50):
         logger.error(f"List jobs error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to list jobs: {e}")
 
-async def background_worker():
-    """
-    Background worker that processes jobs from Redis queue
-    TODO: Implement background-worker mit aioredis Subscriber
-    """
-    logger.info("Background worker started")
-    
-    while True:
-        try:
-            # Pop job from queue (blocking with timeout)
-            job_data = await redis_client.brpop("doc_jobs", timeout=5)
-            
-            if job_data:
-                queue_name, job_json = job_data
-                job = json.loads(job_json)
-                
-                await process_job(job)
-                
-        except Exception as e:
-            logger.error(f"Background worker error: {e}")
-            await asyncio.sleep(5)  # Wait before retrying
-
-async def process_job(job: Dict[str, Any]):
-    """Process a single job from the queue"""
-    job_id = job["job_id"]
-    logger.info(f"Processing job {job_id}")
-    
-    try:
-        async with get_db() as db:
-            # Update status to processing
-            result = await db.execute(select(Document).where(Document.id == job_id))
-            document = result.scalar_one()
-            document.status = "processing"
-            document.updated_at = datetime.utcnow()
-            await db.commit()
-        
-        # Fetch document content
-        if job.get("gcs_uri"):
-            content = await fetch_from_gcs(job["gcs_uri"])
-        else:
-            content = job.get("payload", {})
-        
-        # Get ML prediction
-        prediction = await predict_document(content)
-        
-        # Store results in database
-        async with get_db() as db:
-            # Update document with prediction results
-            result = await db.execute(select(Document).where(Document.id == job_id))
-            document = result.scalar_one()
-            
-            document.status = "completed"
-            document.doc_type = prediction.get("doc_type")
-            document.event_type = prediction.get("event_type")
-            document.confidence = prediction.get("confidence", 0.0)
-            document.updated_at = datetime.utcnow()
-            
-            # Create entity records
-            entities_data = prediction.get("entities", [])
-            for entity_data in entities_data:
-                entity = Entity(
-                    document_id=job_id,
-                    entity_type=entity_data.get("type"),
-                    text=entity_data.get("text"),
-                    confidence=entity_data.get("confidence", 0.0),
-                    start_pos=entity_data.get("start_pos"),
-                    end_pos=entity_data.get("end_pos")
-                )
-                db.add(entity)
-            
-            await db.commit()
-            
-        logger.info(f"Job {job_id} completed successfully")
-        
-    except Exception as e:
-        logger.error(f"Job {job_id} failed: {e}")
-        
-        # Update status to failed
-        try:
-            async with get_db() as db:
-                result = await db.execute(select(Document).where(Document.id == job_id))
-                document = result.scalar_one()
-                document.status = "failed"
-                document.error_message = str(e)
-                document.updated_at = datetime.utcnow()
-                await db.commit()
-        except Exception as db_error:
-            logger.error(f"Failed to update job {job_id} status: {db_error}")
-
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=5000)
@@ -0,0 +1,146 @@
+"""
+Client-side load balancing across ML server replicas
+
+Each request goes to the endpoint with the lowest (in_flight + 1) * latency,
+using an exponentially weighted moving average of observed latencies, so
+replicas with a queue build-up or slow GPUs get less traffic.
+
+  – passive ejection: ML_EJECT_AFTER consecutive failures take an endpoint
+    out of rotation for ML_EJECT_SECONDS
+  – active probes:    health_check() against every endpoint each
+                      ML_PROBE_INTERVAL seconds (0 disables)
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, List, Optional, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+ML_EJECT_AFTER = int(os.getenv("ML_EJECT_AFTER", "3"))
+ML_EJECT_SECONDS = float(os.getenv("ML_EJECT_SECONDS", "30"))
+ML_PROBE_INTERVAL = float(os.getenv("ML_PROBE_INTERVAL", "10"))
+ML_LATENCY_EWMA_ALPHA = float(os.getenv("ML_LATENCY_EWMA_ALPHA", "0.3"))
+
+# Assumed latency until an endpoint has answered once
+INITIAL_LATENCY = 0.1
+
+
+class Endpoint:
+    """One ML server replica and its load/health state"""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.in_flight = 0
+        self.latency = INITIAL_LATENCY
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and time.monotonic() >= self.ejected_until
+
+    def score(self) -> float:
+        return (self.in_flight + 1) * self.latency
+
+
+class EndpointBalancer:
+    """Least-outstanding-requests balancer weighted by latency"""
+
+    def __init__(self, urls: List[str]):
+        if not urls:
+            raise ValueError("At least one ML server URL is required")
+        self.endpoints = [Endpoint(url) for url in urls]
+        self._probe_task: Optional[asyncio.Task] = None
+
+    def pick(self) -> Endpoint:
+        """Endpoint for the next request (all endpoints if none is available)"""
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.available] or self.endpoints
+        return min(candidates, key=lambda endpoint: endpoint.score())
+
+    def acquire(self) -> Endpoint:
+        """Pick an endpoint and count the request as in flight"""
+        endpoint = self.pick()
+        endpoint.in_flight += 1
+        endpoint.requests += 1
+        return endpoint
+
+    def record_success(self, endpoint: Endpoint, duration: float):
+        endpoint.in_flight -= 1
+        endpoint.consecutive_failures = 0
+        endpoint.latency += ML_LATENCY_EWMA_ALPHA * (duration - endpoint.latency)
+
+    def record_failure(self, endpoint: Endpoint):
+        endpoint.in_flight -= 1
+        endpoint.failures += 1
+        endpoint.consecutive_failures += 1
+
+        if endpoint.consecutive_failures >= ML_EJECT_AFTER and endpoint.available:
+            endpoint.ejected_until = time.monotonic() + ML_EJECT_SECONDS
+            logger.warning(
+                f"Ejecting ML endpoint {endpoint.url} for {ML_EJECT_SECONDS}s "
+                f"after {endpoint.consecutive_failures} consecutive failures"
+            )
+
+    def release(self, endpoint: Endpoint):
+        """Request ended without an outcome (caller was cancelled)"""
+        endpoint.in_flight -= 1
+
+    async def probe(self, health_check: Callable[[str], Awaitable[bool]]):
+        """Run one round of active health probes"""
+        results = await asyncio.gather(
+            *[health_check(endpoint.url) for endpoint in self.endpoints],
+            return_exceptions=True
+        )
+
+        for endpoint, result in zip(self.endpoints, results):
+            healthy = result is True
+            if healthy != endpoint.healthy:
+                logger.info(f"ML endpoint {endpoint.url} is now {'healthy' if healthy else 'unhealthy'}")
+            # Probes only re-admit endpoints they marked down themselves: a
+            # replica ejected for failing /predict may still answer /health,
+            # so it sits out its ejection window
+            endpoint.healthy = healthy
+
+    def start_probing(self, health_check: Callable[[str], Awaitable[bool]], interval: float = ML_PROBE_INTERVAL):
+        """Probe all endpoints in the background on the running loop"""
+        if interval <= 0 or (self._probe_task and not self._probe_task.done()):
+            return
+
+        async def probe_loop():
+            while True:
+                try:
+                    await self.probe(health_check)
+                except Exception as e:
+                    logger.error(f"ML endpoint probing failed: {e}")
+                await asyncio.sleep(interval)
+
+        self._probe_task = asyncio.ensure_future(probe_loop())
+
+    async def stop_probing(self):
+        if self._probe_task:
+            self._probe_task.cancel()
+            await asyncio.gather(self._probe_task, return_exceptions=True)
+            self._probe_task = None
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        """Load and health per endpoint"""
+        now = time.monotonic()
+        return [
+            {
+                "url": endpoint.url,
+                "available": endpoint.available,
+                "healthy": endpoint.healthy,
+                "ejected_for": round(max(endpoint.ejected_until - now, 0.0), 1),
+                "in_flight": endpoint.in_flight,
+                "latency_ms": round(endpoint.latency * 1000, 1),
+                "requests": endpoint.requests,
+                "failures": endpoint.failures
+            }
+            for endpoint in self.endpoints
+        ]
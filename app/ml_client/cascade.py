@@ -0,0 +1,103 @@
+"""
+Confidence-driven model cascade for Ollama extraction
+
+Extraction (single_pass or extract) first runs on the routed model, usually
+a small one. The result is checked and the call is repeated on the next
+model of OLLAMA_CASCADE_MODELS when
+  – the answer is not parseable JSON,
+  – a required field of the document type is missing (REQUIRED_FIELDS), or
+  – the confidence is below OLLAMA_CASCADE_MIN_CONFIDENCE
+    (OLLAMA_CASCADE_MIN_CONFIDENCE_OTHER for unclassified documents).
+
+At most OLLAMA_CASCADE_MAX_ESCALATIONS further calls are made per document.
+An empty OLLAMA_CASCADE_MODELS disables the cascade.
+
+    export OLLAMA_MODEL=phi3
+    export OLLAMA_CASCADE_MODELS=llama3.2
+"""
+
+import os
+from typing import Any, Dict, List, Optional
+
+OLLAMA_CASCADE_MODELS = [model.strip() for model in os.getenv("OLLAMA_CASCADE_MODELS", "").split(",") if model.strip()]
+OLLAMA_CASCADE_MAX_ESCALATIONS = int(os.getenv("OLLAMA_CASCADE_MAX_ESCALATIONS", "1"))
+OLLAMA_CASCADE_MIN_CONFIDENCE = float(os.getenv("OLLAMA_CASCADE_MIN_CONFIDENCE", "0.8"))
+# OTHER never gets the classification bonus of the confidence score (0.2), so a
+# complete OTHER extraction tops out at 0.8 and is held to a lower threshold
+OLLAMA_CASCADE_MIN_CONFIDENCE_OTHER = float(os.getenv("OLLAMA_CASCADE_MIN_CONFIDENCE_OTHER", "0.6"))
+
+# Fields without which an extraction is not usable downstream
+REQUIRED_FIELDS: Dict[str, List[str]] = {
+    "INVOICE": ["invoice_number", "total_amount"],
+    "CONTRACT": ["parties", "start_date"],
+    "RECEIPT": ["merchant", "amount"],
+    "LETTER": ["sender", "date"],
+    "FORM": ["form_type"],
+    "CERTIFICATE": ["certificate_type", "issued_to"],
+    "REPORT": ["report_type"],
+    "OTHER": []
+}
+
+cascade_stats: Dict[str, Dict[str, Any]] = {}
+
+
+def cascade_models(first_model: str) -> List[str]:
+    """Models to try in order: the routed model, then the stronger ones, bounded"""
+    models = [first_model] + [model for model in OLLAMA_CASCADE_MODELS if model != first_model]
+    return models[:1 + max(OLLAMA_CASCADE_MAX_ESCALATIONS, 0)]
+
+
+def min_confidence(doc_type: str) -> float:
+    """Confidence an extraction of doc_type needs to stay on its model"""
+    if doc_type == "OTHER":
+        return OLLAMA_CASCADE_MIN_CONFIDENCE_OTHER
+    return OLLAMA_CASCADE_MIN_CONFIDENCE
+
+
+def validation_failure(doc_type: str, extracted_data: Optional[Dict[str, Any]], confidence: float) -> Optional[str]:
+    """Reason to escalate (invalid_json, missing:<field>, low_confidence) or None if the result is good"""
+    if not isinstance(extracted_data, dict) or extracted_data.get("extraction_method") == "fallback":
+        return "invalid_json"
+    if "error" in extracted_data:
+        return "error"
+
+    for field in REQUIRED_FIELDS.get(doc_type, []):
+        if extracted_data.get(field) in (None, "", [], {}):
+            return f"missing:{field}"
+
+    # Rounded: the score is a float sum and would miss a threshold it reaches exactly
+    if round(confidence, 6) < min_confidence(doc_type):
+        return "low_confidence"
+    return None
+
+
+def record_cascade(doc_type: str, models: List[str], reasons: List[str]):
+    """Count a document and its escalations under its final doc type"""
+    entry = cascade_stats.setdefault(doc_type, {"documents": 0, "escalated": 0, "reasons": {}, "final_models": {}})
+    entry["documents"] += 1
+    if len(models) > 1:
+        entry["escalated"] += 1
+    for reason in reasons:
+        # missing:<field> is counted per field
+        entry["reasons"][reason] = entry["reasons"].get(reason, 0) + 1
+    entry["final_models"][models[-1]] = entry["final_models"].get(models[-1], 0) + 1
+
+
+def get_cascade_stats() -> Dict[str, Any]:
+    documents = sum(entry["documents"] for entry in cascade_stats.values())
+    escalated = sum(entry["escalated"] for entry in cascade_stats.values())
+    return {
+        "enabled": bool(OLLAMA_CASCADE_MODELS),
+        "models": OLLAMA_CASCADE_MODELS,
+        "max_escalations": OLLAMA_CASCADE_MAX_ESCALATIONS,
+        "min_confidence": OLLAMA_CASCADE_MIN_CONFIDENCE,
+        "min_confidence_other": OLLAMA_CASCADE_MIN_CONFIDENCE_OTHER,
+        "escalation_rate": round(escalated / documents, 4) if documents else 0.0,
+        "by_doc_type": {
+            doc_type: {
+                **entry,
+                "escalation_rate": round(entry["escalated"] / entry["documents"], 4)
+            }
+            for doc_type, entry in cascade_stats.items()
+        }
+    }
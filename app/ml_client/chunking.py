@@ -0,0 +1,144 @@
+"""
+Sliding-window prediction for long documents
+
+Texts longer than ML_CHUNK_SIZE characters are split into overlapping
+windows that are predicted concurrently and merged:
+  – entity positions are shifted back to document offsets, duplicates from
+    the overlap regions are dropped (same type, overlapping span -> keep the
+    more confident one)
+  – doc_type / event_type are chosen by confidence-weighted voting, each
+    window weighted by its length
+"""
+
+import os
+import asyncio
+import logging
+from typing import Dict, Any, List, Tuple, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+ML_CHUNKING_ENABLED = os.getenv("ML_CHUNKING_ENABLED", "true").lower() == "true"
+ML_CHUNK_SIZE = int(os.getenv("ML_CHUNK_SIZE", "8000"))
+ML_CHUNK_OVERLAP = int(os.getenv("ML_CHUNK_OVERLAP", "400"))
+
+
+def split_windows(text: str, size: int = ML_CHUNK_SIZE, overlap: int = ML_CHUNK_OVERLAP) -> List[Tuple[int, str]]:
+    """
+    Split text into windows of at most `size` characters overlapping by
+    about `overlap` characters. Windows end at whitespace where possible
+    so words are not cut in half.
+
+    Returns:
+        List of (start offset, window text)
+    """
+    if size <= 0:
+        raise ValueError("Window size must be positive")
+    overlap = max(0, min(overlap, size // 2))
+
+    windows = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            # Back off to the last whitespace inside the overlap zone
+            cut = text.rfind(" ", end - overlap, end) if overlap else -1
+            if cut > start:
+                end = cut
+
+        windows.append((start, text[start:end]))
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+
+    return windows
+
+
+def _vote(window_results: List[Tuple[int, str, Dict[str, Any]]], field: str) -> Tuple[str, float]:
+    """Label with the highest length- and confidence-weighted score"""
+    scores: Dict[str, float] = {}
+    total_weight = 0
+
+    for _, window_text, result in window_results:
+        weight = len(window_text)
+        total_weight += weight
+        label = result.get(field, "unknown")
+        scores[label] = scores.get(label, 0.0) + weight * float(result.get("confidence", 0.0))
+
+    if not scores or not total_weight:
+        return "unknown", 0.0
+
+    label = max(scores, key=scores.get)
+    return label, round(scores[label] / total_weight, 4)
+
+
+def merge_window_predictions(window_results: List[Tuple[int, str, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Merge per-window predictions into one document prediction
+
+    Args:
+        window_results: (start offset, window text, prediction) per window
+    """
+    doc_type, confidence = _vote(window_results, "doc_type")
+    event_type, _ = _vote(window_results, "event_type")
+
+    # (window index, entity with document offsets)
+    entities = []
+    for window, (offset, _, result) in enumerate(window_results):
+        for entity in result.get("entities", []):
+            entities.append((window, {
+                **entity,
+                "start_pos": entity.get("start_pos", 0) + offset,
+                "end_pos": entity.get("end_pos", 0) + offset
+            }))
+
+    # Overlap regions are seen by two windows: of overlapping same-type spans
+    # from different windows keep the most confident. Sorted by start, only
+    # the last kept span of the type can overlap; spans of one window stay.
+    entities.sort(key=lambda item: item[1]["start_pos"])
+    merged: List[Dict[str, Any]] = []
+    last_kept: Dict[Any, Tuple[int, int]] = {}  # type -> (index in merged, window)
+    for window, entity in entities:
+        previous = last_kept.get(entity.get("type"))
+        if previous is not None:
+            index, previous_window = previous
+            kept = merged[index]
+            if previous_window != window and entity["start_pos"] < kept["end_pos"]:
+                if entity.get("confidence", 0.0) > kept.get("confidence", 0.0):
+                    merged[index] = entity
+                    last_kept[entity.get("type")] = (index, window)
+                continue
+
+        last_kept[entity.get("type")] = (len(merged), window)
+        merged.append(entity)
+
+    return {
+        "doc_type": doc_type,
+        "event_type": event_type,
+        "confidence": confidence,
+        "entities": merged,
+        "chunks": len(window_results)
+    }
+
+
+async def predict_chunked(
+    text: str,
+    metadata: Dict[str, Any],
+    predict_window: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]],
+    size: int = ML_CHUNK_SIZE,
+    overlap: int = ML_CHUNK_OVERLAP
+) -> Dict[str, Any]:
+    """Predict all windows of a long text concurrently and merge the results"""
+    windows = split_windows(text, size, overlap)
+    logger.info(f"Predicting {len(text)} characters in {len(windows)} windows")
+
+    results = await asyncio.gather(*[
+        predict_window({
+            "text": window_text,
+            "metadata": {**metadata, "chunk_index": index, "chunk_offset": offset}
+        })
+        for index, (offset, window_text) in enumerate(windows)
+    ])
+
+    return merge_window_predictions([
+        (offset, window_text, result) for (offset, window_text), result in zip(windows, results)
+    ])
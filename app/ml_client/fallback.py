@@ -0,0 +1,137 @@
+"""
+Tiered classification with graceful degradation
+
+Tiers (ML_FALLBACK_TIERS, in order):
+  – ml:        ML server (predict_document)
+  – heuristic: keyword heuristics (predict_document_fallback)
+  – rules:     rule-based classifiers from app.schemas
+
+The ML tier is skipped while its circuit is open or when the job deadline
+leaves less than ML_FALLBACK_DEADLINE_RESERVE seconds. Results of a cheaper
+tier are flagged "degraded" so the worker can queue them for re-scoring.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List
+
+from app.ml_client import predict
+from app.ml_client.predict import predict_document, predict_document_fallback, _extract_text_from_payload
+from app.ml_client.resilience import OPEN
+from app.schemas.doc_types import classify_document_type
+from app.schemas.event_types import classify_event_type
+from app.utils.deadline import get_deadline
+
+logger = logging.getLogger(__name__)
+
+ML_FALLBACK_TIERS = [
+    tier.strip() for tier in os.getenv("ML_FALLBACK_TIERS", "ml,heuristic,rules").split(",") if tier.strip()
+]
+ML_FALLBACK_DEADLINE_RESERVE = float(os.getenv("ML_FALLBACK_DEADLINE_RESERVE", "1.0"))
+
+tier_stats: Dict[str, int] = {}
+
+
+async def _ml_tier(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await predict_document(payload)
+
+
+async def _heuristic_tier(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await predict_document_fallback(payload)
+
+
+async def _rules_tier(payload: Dict[str, Any]) -> Dict[str, Any]:
+    features = {"text": _extract_text_from_payload(payload)}
+    doc_classification = classify_document_type(features)
+    event_classification = classify_event_type(features)
+
+    return {
+        "doc_type": doc_classification.doc_type.value,
+        "event_type": event_classification.event_type.value,
+        "confidence": min(doc_classification.confidence, event_classification.confidence),
+        "entities": []
+    }
+
+
+TIERS = {
+    "ml": _ml_tier,
+    "heuristic": _heuristic_tier,
+    "rules": _rules_tier
+}
+
+
+async def predict_with_fallback(
+    payload: Dict[str, Any],
+    deadline: Optional[float] = None,
+    tiers: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Classify with the first tier that can answer in time
+
+    Args:
+        payload: Document data to classify
+        deadline: Unix timestamp by which the job should be finished,
+            defaults to the current job deadline
+        tiers: Tier order, defaults to ML_FALLBACK_TIERS
+
+    Returns:
+        Prediction dict; cheaper tiers add "degraded": True, "tier" and
+        "degraded_reason"
+
+    Raises:
+        The last tier's error if no tier produced a result
+    """
+    tiers = [tier for tier in (tiers or ML_FALLBACK_TIERS) if tier in TIERS]
+    if deadline is None:
+        deadline = get_deadline()
+    if not tiers:
+        raise ValueError("No valid classification tiers configured")
+
+    reason = None
+    for index, tier in enumerate(tiers):
+        is_last = index == len(tiers) - 1
+        timeout = None
+
+        if tier == "ml" and not is_last:
+            if predict.ml_breaker.state == OPEN:
+                reason = "circuit_open"
+                continue
+            if deadline is not None:
+                timeout = deadline - time.time() - ML_FALLBACK_DEADLINE_RESERVE
+                if timeout <= 0:
+                    reason = "deadline"
+                    continue
+
+        try:
+            if timeout is not None:
+                result = await asyncio.wait_for(TIERS[tier](payload), timeout=timeout)
+            else:
+                result = await TIERS[tier](payload)
+        except asyncio.TimeoutError:
+            if is_last:
+                raise
+            reason = "deadline"
+            logger.warning(f"Tier {tier} ran into the job deadline, degrading")
+            continue
+        except Exception as e:
+            if is_last:
+                raise
+            reason = f"{tier}_error"
+            logger.warning(f"Tier {tier} failed, degrading: {e}")
+            continue
+
+        tier_stats[tier] = tier_stats.get(tier, 0) + 1
+        if index > 0:
+            result["degraded"] = True
+            result["tier"] = tier
+            result["degraded_reason"] = reason
+            result.setdefault("model_version", f"fallback-{tier}")
+            logger.info(f"Classified with degraded tier {tier} ({reason})")
+        return result
+
+
+def get_fallback_stats() -> Dict[str, Any]:
+    """Answers per tier since process start"""
+    return {"tiers": ML_FALLBACK_TIERS, "answered": dict(tier_stats)}
@@ -0,0 +1,270 @@
+"""
+Response cache for deterministic Ollama generations
+
+Keyed by sha256 over model, prompt, format and options. Only calls with a
+temperature of at most LLM_CACHE_MAX_TEMPERATURE are cached (classification
+and single-pass prompts); sampled calls always go to the model.
+
+Two tiers:
+  – in-process LRU (LLM_CACHE_SIZE entries)
+  – persistent tier shared across restarts (LLM_CACHE_BACKEND):
+      sqlite  file at LLM_CACHE_PATH (default)
+      redis   REDIS_URL, shared by all workers
+    both bounded to LLM_CACHE_MAX_ENTRIES, least recently used evicted first
+"""
+
+import os
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+from app.utils.cache import LRUCache
+from app.worker.queue_backend import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1000"))
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "sqlite").lower()  # sqlite | redis | none
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "neuralex_llm_cache.db")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "50000"))
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.1"))
+
+KEY_PREFIX = "llm_cache"
+# The SQLite tier is pruned every PRUNE_INTERVAL writes, so it can exceed
+# LLM_CACHE_MAX_ENTRIES by at most that many entries
+PRUNE_INTERVAL = 100
+
+
+def cache_key(request: Dict[str, Any]) -> Optional[str]:
+    """Cache key for a generate request, None if the call is not deterministic enough"""
+    options = request.get("options") or {}
+    temperature = options.get("temperature")
+    if temperature is None or float(temperature) > LLM_CACHE_MAX_TEMPERATURE or request.get("stream"):
+        return None
+
+    material = json.dumps(
+        {
+            "model": request.get("model"),
+            "prompt": request.get("prompt"),
+            "system": request.get("system"),
+            "format": request.get("format"),
+            "options": options
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheStore:
+    """On-disk tier; all SQLite access runs on one dedicated thread"""
+
+    name = "sqlite"
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="llm-cache")
+        self._writes = 0
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_last_used ON llm_cache (last_used)")
+            self._conn.commit()
+        return self._conn
+
+    def _get(self, key: str) -> Optional[str]:
+        conn = self._connection()
+        row = conn.execute("SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        conn.commit()
+        return row[0]
+
+    def _set(self, key: str, value: str):
+        conn = self._connection()
+        conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, value, last_used) VALUES (?, ?, ?)",
+            (key, value, time.time())
+        )
+        self._writes += 1
+        if self._writes % PRUNE_INTERVAL == 0:
+            self._prune()
+        conn.commit()
+
+    def _prune(self):
+        """Drop the least recently used entries beyond max_entries"""
+        self._conn.execute(
+            """
+            DELETE FROM llm_cache WHERE key NOT IN (
+                SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT ?
+            )
+            """,
+            (self.max_entries,)
+        )
+
+    def _size(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+    def _close(self):
+        if self._conn is not None:
+            self._prune()
+            self._conn.commit()
+            self._conn.close()
+            self._conn = None
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, value: str):
+        await self._run(self._set, key, value)
+
+    async def size(self) -> int:
+        return await self._run(self._size)
+
+    async def close(self):
+        await self._run(self._close)
+        self._executor.shutdown(wait=True)
+
+
+class RedisCacheStore:
+    """Shared tier; a sorted set of last-use times bounds the number of entries"""
+
+    name = "redis"
+
+    def __init__(self, redis_client, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.redis = redis_client
+        self.max_entries = max_entries
+        self.index_key = f"{KEY_PREFIX}:index"
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.redis.get(f"{KEY_PREFIX}:{key}")
+        if value is not None:
+            await self.redis.zadd(self.index_key, {key: time.time()})
+        return value
+
+    async def set(self, key: str, value: str):
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(f"{KEY_PREFIX}:{key}", value)
+            pipe.zadd(self.index_key, {key: time.time()})
+            pipe.zcard(self.index_key)
+            _, _, size = await pipe.execute()
+
+        if size > self.max_entries:
+            evicted = await self.redis.zpopmin(self.index_key, size - self.max_entries)
+            if evicted:
+                keys = [member.decode() if isinstance(member, bytes) else member for member, _ in evicted]
+                await self.redis.delete(*[f"{KEY_PREFIX}:{key}" for key in keys])
+
+    async def size(self) -> int:
+        return await self.redis.zcard(self.index_key)
+
+    async def close(self):
+        await self.redis.close()
+
+
+class LLMCache:
+    """Two-tier cache for Ollama generate responses"""
+
+    def __init__(self, store=None, max_size: int = LLM_CACHE_SIZE):
+        self.lru = LRUCache(max_size)
+        self.store = store
+        self.stats = {"store_hits": 0, "store_errors": 0, "writes": 0}
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached response or None"""
+        cached = self.lru.get(key)
+        if cached is not None or self.store is None:
+            return cached
+
+        try:
+            value = await self.store.get(key)
+        except Exception as e:
+            self.stats["store_errors"] += 1
+            logger.warning(f"LLM cache {self.store.name} lookup failed: {e}")
+            return None
+
+        if value is None:
+            return None
+
+        cached = json.loads(value)
+        self.lru.set(key, cached)
+        self.stats["store_hits"] += 1
+        return cached
+
+    async def set(self, key: str, response: Dict[str, Any]):
+        """Store a response in both tiers"""
+        self.lru.set(key, response)
+        self.stats["writes"] += 1
+
+        if self.store is None:
+            return
+
+        try:
+            await self.store.set(key, json.dumps(response, ensure_ascii=False))
+        except Exception as e:
+            self.stats["store_errors"] += 1
+            logger.warning(f"LLM cache {self.store.name} write failed: {e}")
+
+    async def close(self):
+        if self.store is not None:
+            await self.store.close()
+            self.store = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        lru_stats = self.lru.get_stats()
+        lookups = lru_stats["hits"] + lru_stats["misses"]
+        hits = lru_stats["hits"] + self.stats["store_hits"]
+        return {
+            "enabled": True,
+            "max_temperature": LLM_CACHE_MAX_TEMPERATURE,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "lru": lru_stats,
+            "store": {
+                "backend": self.store.name if self.store else None,
+                "max_entries": LLM_CACHE_MAX_ENTRIES,
+                **self.stats
+            }
+        }
+
+
+def create_llm_cache() -> Optional[LLMCache]:
+    """Build the cache from configuration, None when disabled"""
+    if not LLM_CACHE_ENABLED:
+        return None
+
+    store = None
+    if LLM_CACHE_BACKEND == "sqlite":
+        store = SQLiteCacheStore()
+    elif LLM_CACHE_BACKEND == "redis":
+        import redis.asyncio as redis
+        store = RedisCacheStore(redis.from_url(REDIS_URL))
+
+    return LLMCache(store)
@@ -0,0 +1,132 @@
+"""
+Map-reduce extraction for documents longer than one Ollama prompt window
+
+The extraction prompts only hold OLLAMA_CHUNK_SIZE characters of text.
+Longer documents are split into overlapping windows (split_windows from the
+ML chunking), every window is extracted concurrently (at most
+OLLAMA_MAP_CONCURRENCY calls at a time per document) and the results are
+merged field by field:
+  – LAST_WINS fields (totals, end dates): the last window that has a value
+    wins, e.g. the grand total on the final page
+  – UNION fields (parties, items, keywords): values of all windows, without
+    duplicates from the overlap regions
+  – all other fields: the first window that has a value wins
+
+Documents with more than OLLAMA_MAX_CHUNKS windows keep the first windows
+and the last one, where totals and closing terms usually are.
+"""
+
+import os
+import json
+import asyncio
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from app.ml_client.chunking import split_windows
+
+OLLAMA_MAP_REDUCE_ENABLED = os.getenv("OLLAMA_MAP_REDUCE_ENABLED", "true").lower() == "true"
+OLLAMA_CHUNK_SIZE = int(os.getenv("OLLAMA_CHUNK_SIZE", "2000"))
+OLLAMA_CHUNK_OVERLAP = int(os.getenv("OLLAMA_CHUNK_OVERLAP", "200"))
+OLLAMA_MAP_CONCURRENCY = int(os.getenv("OLLAMA_MAP_CONCURRENCY", "4"))
+OLLAMA_MAX_CHUNKS = int(os.getenv("OLLAMA_MAX_CHUNKS", "16"))
+
+LAST_WINS = {"total_amount", "tax_amount", "amount", "value", "end_date", "expiry_date", "status"}
+UNION = {"parties", "items", "entities", "keywords", "key_terms", "key_findings"}
+
+T = TypeVar("T")
+
+
+def chunk_text(text: str) -> List[str]:
+    """Prompt-sized windows of the text; a single window if it fits or map-reduce is off"""
+    if not OLLAMA_MAP_REDUCE_ENABLED or len(text) <= OLLAMA_CHUNK_SIZE:
+        return [text]
+
+    chunks = [window for _, window in split_windows(text, OLLAMA_CHUNK_SIZE, OLLAMA_CHUNK_OVERLAP)]
+    if len(chunks) > OLLAMA_MAX_CHUNKS > 1:
+        chunks = chunks[:OLLAMA_MAX_CHUNKS - 1] + chunks[-1:]
+    return chunks
+
+
+async def map_chunks(chunks: List[str], extract: Callable[[str], Awaitable[T]],
+                     concurrency: int = OLLAMA_MAP_CONCURRENCY) -> List[T]:
+    """extract(chunk) for every chunk, at most `concurrency` at a time, results in chunk order"""
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+
+    async def run(chunk: str) -> T:
+        async with semaphore:
+            return await extract(chunk)
+
+    return await asyncio.gather(*[run(chunk) for chunk in chunks])
+
+
+def majority(labels: List[Optional[str]]) -> Optional[str]:
+    """Most frequent label, ties go to the one seen first"""
+    counts = Counter(label for label in labels if label)
+    if not counts:
+        return None
+    best = max(counts.values())
+    return next(label for label in labels if label and counts[label] == best)
+
+
+def _is_empty(value: Any) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def _union(values: List[Any]) -> List[Any]:
+    merged, seen = [], set()
+    for value in values:
+        for item in value if isinstance(value, list) else [value]:
+            key = item.strip().casefold() if isinstance(item, str) else json.dumps(item, sort_keys=True, default=str)
+            if key not in seen:
+                seen.add(key)
+                merged.append(item)
+    return merged
+
+
+def merge_extractions(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merge per-window extractions in document order
+
+    Windows without usable data (fallback or error results) are skipped; if
+    no window has data the first result is returned unchanged.
+    """
+    usable = [
+        result for result in results
+        if isinstance(result, dict) and "error" not in result and result.get("extraction_method") != "fallback"
+    ]
+    if not usable:
+        return results[0] if results else {}
+
+    values: Dict[str, List[Any]] = {}
+    for result in usable:
+        for field, value in result.items():
+            if not _is_empty(value):
+                values.setdefault(field, []).append(value)
+
+    merged: Dict[str, Any] = {}
+    for field, field_values in values.items():
+        if field in UNION:
+            merged[field] = _union(field_values)
+        elif field in LAST_WINS:
+            merged[field] = field_values[-1]
+        else:
+            merged[field] = field_values[0]
+    return merged
+
+
+def merge_classified(outcomes: List[Optional[Tuple[str, str, Dict[str, Any]]]],
+                     doc_type: Optional[str] = None) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Merge per-window (doc_type, event_type, data) results of single-pass extraction
+
+    The document type is the majority of the windows unless given; event type
+    and data come from the windows that agree with it.
+    """
+    valid = [outcome for outcome in outcomes if outcome is not None]
+    if not valid:
+        return None
+
+    doc_type = doc_type or majority([outcome[0] for outcome in valid])
+    agreeing = [outcome for outcome in valid if outcome[0] == doc_type]
+    event_type = majority([outcome[1] for outcome in agreeing])
+    return doc_type, event_type, merge_extractions([outcome[2] for outcome in agreeing])
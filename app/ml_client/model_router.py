@@ -0,0 +1,150 @@
+"""
+Task-aware model selection for the Ollama analyzer
+
+Every generate call names its task:
+  doc_type     classification of the document type (short answer)
+  event_type   classification of the event type (short answer)
+  single_pass  type, event and fields in one JSON answer
+  extract      structured extraction (multi_call mode)
+
+OLLAMA_MODEL_ROUTES is a JSON list checked in order; the first route whose
+task matches ("*" matches every task) and whose max_chars is not exceeded by
+the document text picks the model. Without a match OLLAMA_MODEL is used.
+
+    export OLLAMA_MODEL_ROUTES='[
+      {"task": "doc_type", "model": "gemma:2b"},
+      {"task": "event_type", "model": "gemma:2b"},
+      {"task": "extract", "max_chars": 3000, "model": "phi3"},
+      {"task": "*", "model": "llama3.2"}
+    ]'
+
+Routes can be replaced at runtime (GET/PUT /admin/ollama/routes).
+"""
+
+import os
+import json
+import logging
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ROUTE_TASKS = ("doc_type", "event_type", "single_pass", "extract")
+
+
+@dataclass
+class ModelRoute:
+    """Model for a task, optionally limited to documents up to max_chars"""
+    task: str
+    model: str
+    max_chars: Optional[int] = None
+
+    def matches(self, task: str, text_length: int) -> bool:
+        if self.task not in ("*", task):
+            return False
+        return self.max_chars is None or text_length <= self.max_chars
+
+    @property
+    def label(self) -> str:
+        size = f"<={self.max_chars}" if self.max_chars is not None else "any"
+        return f"{self.task}[{size}]"
+
+
+def parse_routes(raw: Any) -> List[ModelRoute]:
+    """
+    Validate a route table (JSON string or list of dicts)
+
+    Raises:
+        ValueError: Unknown task, missing model or invalid max_chars
+    """
+    if isinstance(raw, str):
+        raw = json.loads(raw) if raw.strip() else []
+    if not isinstance(raw, list):
+        raise ValueError("Routes must be a list")
+
+    routes = []
+    for index, entry in enumerate(raw):
+        if not isinstance(entry, dict):
+            raise ValueError(f"Route {index} must be an object")
+        task = str(entry.get("task", "*"))
+        model = str(entry.get("model") or "").strip()
+        max_chars = entry.get("max_chars")
+
+        if task != "*" and task not in ROUTE_TASKS:
+            raise ValueError(f"Route {index}: unknown task '{task}' (expected one of {', '.join(ROUTE_TASKS)} or *)")
+        if not model:
+            raise ValueError(f"Route {index}: model is required")
+        if max_chars is not None and (not isinstance(max_chars, int) or max_chars <= 0):
+            raise ValueError(f"Route {index}: max_chars must be a positive integer")
+
+        routes.append(ModelRoute(task=task, model=model, max_chars=max_chars))
+    return routes
+
+
+class ModelRouter:
+    """Picks the model per task and input size and keeps per-route metrics"""
+
+    def __init__(self, default_model: str, routes: Optional[List[ModelRoute]] = None):
+        self.default_model = default_model
+        self.routes = routes or []
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+
+    def select(self, task: str, text_length: int) -> str:
+        """Model for a generate call of this task on a text of text_length characters"""
+        for route in self.routes:
+            if route.matches(task, text_length):
+                return route.model
+        return self.default_model
+
+    def set_routes(self, raw: Any) -> List[ModelRoute]:
+        """Replace the route table; invalid tables leave the current one in place"""
+        self.routes = parse_routes(raw)
+        logger.info(f"Ollama model routes updated: {[asdict(route) for route in self.routes]}")
+        return self.routes
+
+    def models(self) -> List[str]:
+        """All models the routes can select, default model included"""
+        return list(dict.fromkeys([route.model for route in self.routes] + [self.default_model]))
+
+    def record(self, task: str, model: str, seconds: float = 0.0,
+               prompt_tokens: int = 0, eval_tokens: int = 0, cache_hit: bool = False):
+        """Add one generate call to the metrics of its task and model"""
+        entry = self.metrics.setdefault(
+            f"{task}:{model}", {
+                "task": task, "model": model, "calls": 0, "cache_hits": 0,
+                "prompt_tokens": 0, "eval_tokens": 0, "seconds": 0.0
+            }
+        )
+        if cache_hit:
+            entry["cache_hits"] += 1
+            return
+        entry["calls"] += 1
+        entry["prompt_tokens"] += prompt_tokens
+        entry["eval_tokens"] += eval_tokens
+        entry["seconds"] += seconds
+
+    def get_stats(self) -> Dict[str, Any]:
+        metrics = []
+        for entry in self.metrics.values():
+            calls = entry["calls"]
+            metrics.append({
+                **entry,
+                "seconds": round(entry["seconds"], 3),
+                "avg_latency": round(entry["seconds"] / calls, 3) if calls else 0.0,
+                "tokens_per_second": round(entry["eval_tokens"] / entry["seconds"], 1) if entry["seconds"] else 0.0
+            })
+        return {
+            "default_model": self.default_model,
+            "routes": [{**asdict(route), "label": route.label} for route in self.routes],
+            "metrics": metrics
+        }
+
+
+def create_model_router(default_model: str) -> ModelRouter:
+    """Router from OLLAMA_MODEL_ROUTES; an invalid table falls back to the default model"""
+    try:
+        routes = parse_routes(os.getenv("OLLAMA_MODEL_ROUTES", ""))
+    except ValueError as e:
+        logger.error(f"Invalid OLLAMA_MODEL_ROUTES, using {default_model} for every task: {e}")
+        routes = []
+    return ModelRouter(default_model, routes)
@@ -5,63 +5,502 @@ Verarbeitet OCR-JSON-Daten und extrahiert Event-Types, Doc-Types und strukturier
 
 import os
 import json
+import time
+import asyncio
 import logging
+import httpx
 import ollama
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Callable, Awaitable, AsyncIterator
+from contextvars import ContextVar
 from datetime import datetime
 
+from app.utils.text_extraction import extract_text
+from app.utils.json_stream import JSONMemberStream
+from app.utils.deadline import bounded_timeout, check_deadline
+from app.ml_client.llm_cache import cache_key, create_llm_cache
+from app.ml_client.model_router import create_model_router
+from app.ml_client.ollama_pool import OLLAMA_HOSTS, OLLAMA_KEEP_ALIVE, OllamaPool
+from app.ml_client.map_reduce import OLLAMA_CHUNK_SIZE, chunk_text, map_chunks, merge_classified, merge_extractions
+from app.ml_client.cascade import OLLAMA_CASCADE_MODELS, cascade_models, record_cascade, validation_failure
+from app.ml_client.preclassifier import PRECLASSIFIER_ENABLED, PreClassification, preclassify
+
 logger = logging.getLogger(__name__)
 
+# Obergrenze pro Ollama-Aufruf; bei Jobs zusätzlich durch die Job-Deadline begrenzt
+OLLAMA_REQUEST_TIMEOUT = float(os.getenv("OLLAMA_REQUEST_TIMEOUT", "120"))
+
+# Connection-Pool des asynchronen Clients (parallele Analysen teilen sich die Verbindungen)
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "20"))
+OLLAMA_MAX_KEEPALIVE = int(os.getenv("OLLAMA_MAX_KEEPALIVE", "10"))
+OLLAMA_PROBE_TIMEOUT = float(os.getenv("OLLAMA_PROBE_TIMEOUT", "5"))
+
+# Hintergrund-Prüfung der Verfügbarkeit: erneut nach OLLAMA_PROBE_TTL Sekunden,
+# bei Ausfall mit exponentiellem Backoff zwischen BACKOFF_MIN und BACKOFF_MAX
+OLLAMA_PROBE_TTL = float(os.getenv("OLLAMA_PROBE_TTL", "30"))
+OLLAMA_PROBE_BACKOFF_MIN = float(os.getenv("OLLAMA_PROBE_BACKOFF_MIN", "1"))
+OLLAMA_PROBE_BACKOFF_MAX = float(os.getenv("OLLAMA_PROBE_BACKOFF_MAX", "300"))
+
+# single_pass: ein Prompt mit JSON-Ausgabe für Typ, Event und Felder
+# multi_call: drei Aufrufe (Dokumenttyp, Event-Type, Extraktion) zum Vergleich
+OLLAMA_ANALYSIS_MODE = os.getenv("OLLAMA_ANALYSIS_MODE", "single_pass").lower()
+# json: format="json"; schema: JSON-Schema als format (Ollama >= 0.5)
+OLLAMA_OUTPUT_FORMAT = os.getenv("OLLAMA_OUTPUT_FORMAT", "json").lower()
+
+DOC_TYPES = {
+    "INVOICE": "Rechnung/Faktura",
+    "CONTRACT": "Vertrag/Vereinbarung",
+    "RECEIPT": "Quittung/Beleg",
+    "LETTER": "Brief/Anschreiben",
+    "FORM": "Formular/Antrag",
+    "CERTIFICATE": "Zertifikat/Bescheinigung",
+    "REPORT": "Bericht/Report",
+    "OTHER": "Sonstiges"
+}
+
+EVENT_MAPPING = {
+    "INVOICE": ["PAYMENT_DUE", "PAYMENT_RECEIVED", "INVOICE_SENT", "OVERDUE"],
+    "CONTRACT": ["CONTRACT_SIGNED", "CONTRACT_EXPIRED", "CONTRACT_RENEWED", "CONTRACT_TERMINATED"],
+    "RECEIPT": ["PAYMENT_CONFIRMED", "EXPENSE_RECORDED", "REFUND_ISSUED"],
+    "LETTER": ["CORRESPONDENCE_RECEIVED", "NOTIFICATION_SENT", "COMPLAINT_FILED"],
+    "FORM": ["APPLICATION_SUBMITTED", "FORM_COMPLETED", "REQUEST_FILED"],
+    "CERTIFICATE": ["CERTIFICATION_ISSUED", "QUALIFICATION_EARNED", "COMPLIANCE_VERIFIED"],
+    "REPORT": ["REPORT_GENERATED", "ANALYSIS_COMPLETED", "STATUS_UPDATED"],
+    "OTHER": ["DOCUMENT_PROCESSED", "DATA_EXTRACTED", "ARCHIVE_CREATED"]
+}
+
+# Felder pro Dokumenttyp (wie in den Extraktions-Prompts des multi_call-Modus)
+EXTRACTION_FIELDS = {
+    "INVOICE": {
+        "invoice_number": "Rechnungsnummer", "date": "Rechnungsdatum", "due_date": "Fälligkeitsdatum",
+        "total_amount": "Gesamtbetrag", "currency": "Währung", "vendor_name": "Lieferantenname",
+        "customer_name": "Kundenname", "items": "Liste der Positionen", "tax_amount": "Steuerbetrag"
+    },
+    "CONTRACT": {
+        "contract_type": "Vertragstyp", "parties": "Vertragsparteien", "start_date": "Vertragsbeginn",
+        "end_date": "Vertragsende", "value": "Vertragswert", "key_terms": "Wichtige Bedingungen"
+    },
+    "RECEIPT": {
+        "merchant": "Händlername", "date": "Datum", "amount": "Betrag",
+        "payment_method": "Zahlungsmethode", "items": "Gekaufte Artikel"
+    },
+    "LETTER": {
+        "sender": "Absender", "recipient": "Empfänger", "date": "Datum",
+        "subject": "Betreff", "main_topic": "Hauptthema"
+    },
+    "FORM": {
+        "form_type": "Formulartyp", "applicant_name": "Antragstellername", "date": "Datum",
+        "reference_number": "Referenznummer", "status": "Status"
+    },
+    "CERTIFICATE": {
+        "certificate_type": "Zertifikatstyp", "issued_to": "Ausgestellt für", "issued_by": "Ausgestellt von",
+        "issue_date": "Ausstellungsdatum", "expiry_date": "Ablaufdatum", "certificate_number": "Zertifikatsnummer"
+    },
+    "REPORT": {
+        "report_type": "Berichtstyp", "author": "Autor", "date": "Datum",
+        "period": "Berichtszeitraum", "key_findings": "Wichtige Erkenntnisse"
+    },
+    "OTHER": {
+        "title": "Titel/Überschrift", "date": "Relevantes Datum",
+        "entities": "Wichtige Entitäten (Namen, Organisationen)", "keywords": "Schlüsselwörter",
+        "summary": "Kurze Zusammenfassung"
+    }
+}
+
+# Fortschritts-Callback einer Analyse: emit(event, daten), z.B. für Server-Sent Events
+EmitFn = Callable[[str, Dict[str, Any]], None]
+
+# LLM-Verbrauch der laufenden Analyse (Aufrufe, Tokens, Sekunden)
+_llm_usage: ContextVar[Optional[Dict[str, float]]] = ContextVar("llm_usage", default=None)
+
 class OllamaDocumentAnalyzer:
     """
     Ollama-basierter Document Analyzer für strukturierte Datenextraktion
     """
     
     def __init__(self):
-        self.ollama_host = os.environ.get("OLLAMA_HOST", "http://localhost:11434")
+        # Kein Netzwerkzugriff beim Anlegen: Client und Verfügbarkeit werden erst bei Bedarf
+        # bzw. vom Hintergrund-Prober (start_probing) ermittelt
         self.default_model = os.environ.get("OLLAMA_MODEL", "llama3.2")
-        self.client = ollama.Client(host=self.ollama_host)
+        # Ollama-Server (OLLAMA_HOSTS); Aufrufe gehen an den Host, der das Modell geladen hat
+        self.pool = OllamaPool(OLLAMA_HOSTS, self._create_client)
+        self.ollama_host = self.pool.endpoints[0].url
+        
+        # Modell pro Aufgabe und Textlänge (OLLAMA_MODEL_ROUTES), sonst default_model
+        self.router = create_model_router(self.default_model)
+        
+        # Cache für deterministische Generierungen (None wenn deaktiviert)
+        self.cache = create_llm_cache()
         
-        # Prüfe Ollama-Verfügbarkeit
-        self.is_available = self._check_ollama_availability()
+        # LLM-Verbrauch pro Analysemodus, zum Vergleich single_pass vs. multi_call
+        self.usage_stats: Dict[str, Dict[str, float]] = {}
         
-        if self.is_available:
-            logger.info(f"Ollama verfügbar auf {self.ollama_host} mit Modell {self.default_model}")
+        # Verfügbarkeit: None = noch nicht geprüft
+        self._available: Optional[bool] = None
+        self._failures = 0
+        self._last_error: Optional[str] = None
+        self._last_probe_at: Optional[str] = None
+        self._next_probe = 0.0
+        self._probe_task: Optional[asyncio.Task] = None
+        self._probe_wake: Optional[asyncio.Event] = None
+
+    def _create_client(self, host: str) -> ollama.AsyncClient:
+        """Asynchroner Client pro Host, beim ersten Zugriff angelegt (blockiert den Event-Loop nicht)"""
+        return ollama.AsyncClient(
+            host=host,
+            timeout=OLLAMA_REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_KEEPALIVE
+            )
+        )
+
+    @property
+    def client(self) -> ollama.AsyncClient:
+        """Client des ersten Hosts (Modell-Listen im Admin-Bereich)"""
+        return self.pool.endpoints[0].client
+
+    @client.setter
+    def client(self, client):
+        self.pool.endpoints[0].client = client
+
+    @property
+    def is_available(self) -> bool:
+        """Zuletzt festgestellter Zustand des Ollama-Servers (False solange ungeprüft)"""
+        return bool(self._available)
+
+    async def probe(self) -> bool:
+        """
+        Prüft alle Ollama-Server (installierte und geladene Modelle) und plant die nächste
+        Prüfung: nach OLLAMA_PROBE_TTL wenn ein Host erreichbar ist, sonst mit exponentiellem Backoff
+        """
+        errors = await self.pool.refresh(OLLAMA_PROBE_TIMEOUT)
+        if all(errors):
+            self._mark_unavailable(errors[0])
         else:
-            logger.warning(f"Ollama nicht verfügbar auf {self.ollama_host}")
+            if self._available is not True:
+                logger.info(f"Ollama verfügbar auf {self.ollama_host} mit Modell {self.default_model}")
+            self._available = True
+            self._failures = 0
+            self._last_error = None
+            self._next_probe = time.monotonic() + OLLAMA_PROBE_TTL
+        
+        self._last_probe_at = datetime.now().isoformat()
+        return self._available
+
+    def _mark_unavailable(self, error: Exception):
+        """Ausfall vermerken (Prüfung oder Verbindungsfehler bei einer Generierung)"""
+        if self._available is not False:
+            logger.warning(f"Ollama nicht erreichbar auf {self.ollama_host}: {error}")
+        self._available = False
+        self._failures += 1
+        self._last_error = str(error)
+        backoff = min(OLLAMA_PROBE_BACKOFF_MIN * 2 ** (self._failures - 1), OLLAMA_PROBE_BACKOFF_MAX)
+        self._next_probe = time.monotonic() + backoff
+        if self._probe_wake is not None:
+            self._probe_wake.set()
+
+    def _probing(self) -> bool:
+        return self._probe_task is not None and not self._probe_task.done()
+
+    async def _probe_loop(self):
+        while True:
+            delay = self._next_probe - time.monotonic()
+            if delay > 0:
+                # Aufwachen, wenn ein Ausfall die nächste Prüfung vorzieht
+                self._probe_wake.clear()
+                try:
+                    await asyncio.wait_for(self._probe_wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.probe()
+
+    def start_probing(self):
+        """Startet die Hintergrund-Prüfung im laufenden Event-Loop (App-Start)"""
+        if not self._probing():
+            self._probe_wake = asyncio.Event()
+            self._probe_task = asyncio.create_task(self._probe_loop())
+
+    async def ensure_available(self) -> bool:
+        """Verfügbarkeit für eine Anfrage; ohne Hintergrund-Prüfung wird bei Fälligkeit direkt geprüft"""
+        if self._available is None or (not self._probing() and time.monotonic() >= self._next_probe):
+            await self.probe()
+        return self.is_available
+
+    def get_availability(self) -> Dict[str, Any]:
+        """Live-Zustand der Verfügbarkeitsprüfung"""
+        return {
+            "available": self.is_available,
+            "checked": self._available is not None,
+            "last_probe_at": self._last_probe_at,
+            "consecutive_failures": self._failures,
+            "next_probe_in": round(max(self._next_probe - time.monotonic(), 0.0), 1),
+            "last_error": self._last_error,
+            "background_probing": self._probing()
+        }
 
-    def _check_ollama_availability(self) -> bool:
-        """Prüft ob Ollama Server erreichbar ist"""
+    async def _generate(self, task: str, on_text: Optional[Callable[[str], None]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Ollama-Generate mit Timeout aus der verbleibenden Job-Deadline.
+        task benennt die Route (doc_type, event_type, single_pass, extract) für die Metriken.
+        Nach Ablauf der Deadline wird kein Aufruf mehr gestartet.
+        Deterministische Aufrufe (niedrige Temperatur) kommen aus dem LLM-Cache.
+        Mit on_text wird die Antwort gestreamt und jedes Textstück sofort gemeldet.
+        """
+        usage = _llm_usage.get()
+        
+        key = cache_key(kwargs) if self.cache else None
+        if key:
+            cached = await self.cache.get(key)
+            if cached is not None:
+                if usage is not None:
+                    usage["cache_hits"] += 1
+                self.router.record(task, kwargs["model"], cache_hit=True)
+                if on_text:
+                    on_text(cached["response"])
+                return cached
+        
+        check_deadline("Ollama generate")
+        
+        started = time.monotonic()
         try:
-            models = self.client.list()
-            return True
-        except Exception as e:
-            logger.error(f"Ollama nicht erreichbar: {e}")
-            return False
+            response = await asyncio.wait_for(
+                self._pooled_generate(on_text, **kwargs),
+                timeout=bounded_timeout(OLLAMA_REQUEST_TIMEOUT)
+            )
+        except (httpx.TransportError, ConnectionError) as e:
+            # Server weg: Verfügbarkeit sofort aktualisieren, der Prober übernimmt die Wiederherstellung
+            self._mark_unavailable(e)
+            raise
+        
+        elapsed = time.monotonic() - started
+        prompt_tokens = response.get("prompt_eval_count") or 0
+        eval_tokens = response.get("eval_count") or 0
+        self.router.record(task, kwargs["model"], elapsed, prompt_tokens, eval_tokens)
+        if usage is not None:
+            usage["llm_calls"] += 1
+            usage["prompt_tokens"] += prompt_tokens
+            usage["eval_tokens"] += eval_tokens
+            usage["llm_seconds"] += elapsed
+        
+        if key:
+            await self.cache.set(key, {
+                "response": response["response"],
+                "prompt_eval_count": response.get("prompt_eval_count"),
+                "eval_count": response.get("eval_count")
+            })
+        return response
+
+    async def _pooled_generate(self, on_text: Optional[Callable[[str], None]] = None, **kwargs) -> Dict[str, Any]:
+        """
+        Generate auf dem Host mit geladenem Modell und geringster Last.
+        Bei Verbindungs- oder Serverfehlern wird der nächste Host versucht, solange
+        noch kein Text gestreamt wurde. keep_alive hält das Modell auf dem Host geladen.
+        """
+        model = kwargs["model"]
+        tried: List[str] = []
+        streamed = False
+        last_error: Optional[Exception] = None
+        
+        def forward(piece: str):
+            nonlocal streamed
+            streamed = streamed or bool(piece)
+            on_text(piece)
+        
+        while (host := self.pool.acquire_for(model, exclude=tried)) is not None:
+            tried.append(host.url)
+            started = time.monotonic()
+            try:
+                if on_text:
+                    response = await self._stream_generate(host.client, forward, keep_alive=OLLAMA_KEEP_ALIVE, **kwargs)
+                else:
+                    response = await host.client.generate(keep_alive=OLLAMA_KEEP_ALIVE, **kwargs)
+            except (httpx.TransportError, ConnectionError, ollama.ResponseError) as e:
+                self.pool.record_failure(host)
+                if streamed:
+                    raise
+                last_error = e
+                logger.warning(f"Ollama-Host {host.url} fehlgeschlagen: {e}")
+                continue
+            except BaseException:
+                self.pool.release(host)
+                raise
+            
+            self.pool.record_success(host, time.monotonic() - started)
+            self.pool.record_loaded(host, model)
+            return response
+        
+        raise last_error
+
+    async def _stream_generate(self, client: ollama.AsyncClient, on_text: Callable[[str], None], **kwargs) -> Dict[str, Any]:
+        """Gestreamtes Generate; liefert die zusammengesetzte Antwort wie ein einzelner Aufruf"""
+        pieces = []
+        last: Dict[str, Any] = {}
+        async for chunk in await client.generate(stream=True, **kwargs):
+            pieces.append(chunk["response"])
+            on_text(chunk["response"])
+            last = chunk
+        return {
+            "response": "".join(pieces),
+            "prompt_eval_count": last.get("prompt_eval_count"),
+            "eval_count": last.get("eval_count")
+        }
+
+    def _member_listener(self, max_depth: int, on_member: Callable[[Tuple[str, ...], Any], None]) -> Callable[[str], None]:
+        """on_text-Callback, der fertig geparste JSON-Felder an on_member meldet"""
+        scanner = JSONMemberStream(max_depth)
+        
+        def on_text(piece: str):
+            for path, value in scanner.feed(piece):
+                on_member(path, value)
+        
+        return on_text
+
+    def _record_usage(self, mode: str, usage: Dict[str, float]):
+        """Addiert den Verbrauch einer Analyse zur Statistik ihres Modus"""
+        totals = self.usage_stats.setdefault(
+            mode, {
+                "documents": 0, "llm_calls": 0, "cache_hits": 0,
+                "prompt_tokens": 0, "eval_tokens": 0, "llm_seconds": 0.0
+            }
+        )
+        totals["documents"] += 1
+        for key, value in usage.items():
+            totals[key] += value
+
+    def get_usage_stats(self) -> Dict[str, Any]:
+        """Durchschnittlicher LLM-Verbrauch pro Dokument je Analysemodus"""
+        return {
+            mode: {
+                **totals,
+                "llm_seconds": round(totals["llm_seconds"], 3),
+                "per_document": {
+                    key: round(totals[key] / totals["documents"], 3)
+                    for key in ("llm_calls", "cache_hits", "prompt_tokens", "eval_tokens", "llm_seconds")
+                }
+            }
+            for mode, totals in self.usage_stats.items()
+        }
+
+    async def close(self):
+        """Beendet die Verfügbarkeitsprüfung, schließt die Connection-Pools und den LLM-Cache"""
+        if self._probing():
+            self._probe_task.cancel()
+        await self.pool.close()
+        if self.cache:
+            await self.cache.close()
 
-    async def analyze_document(self, ocr_json: Dict[str, Any]) -> Dict[str, Any]:
+    async def analyze_document(self, ocr_json: Dict[str, Any], mode: Optional[str] = None) -> Dict[str, Any]:
         """
         Analysiert OCR-JSON und extrahiert strukturierte Daten
         
         Args:
             ocr_json: OCR-verarbeitetes JSON-Dokument
+            mode: single_pass oder multi_call (Standard: OLLAMA_ANALYSIS_MODE)
             
         Returns:
             Strukturierte Analyse mit Doc-Type, Event-Type und extrahierten Daten
         """
-        if not self.is_available:
+        return await self._analyze(ocr_json, mode)
+
+    async def analyze_document_stream(
+        self, ocr_json: Dict[str, Any], mode: Optional[str] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Analyse wie analyze_document, liefert aber Zwischenergebnisse sobald sie feststehen:
+        ("doc_type", ...), ("event_type", ...), ("field", {"name", "value"}) pro extrahiertem
+        Feld und zum Schluss ("result", <Ergebnis>) bzw. ("error", {"error": ...}).
+        ("escalated", {"model", "reason"}): die Extraktion läuft auf einem stärkeren Modell
+        erneut, bereits gemeldete Felder werden ersetzt.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        async def run():
+            try:
+                result = await self._analyze(ocr_json, mode, emit=lambda kind, data: queue.put_nowait((kind, data)))
+                queue.put_nowait(("error" if "error" in result else "result", result))
+            finally:
+                queue.put_nowait(None)
+        
+        # Eigener Task: der LLM-Verbrauch (ContextVar) bleibt auf diese Analyse beschränkt
+        task = asyncio.create_task(run())
+        try:
+            while (item := await queue.get()) is not None:
+                yield item
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _analyze(self, ocr_json: Dict[str, Any], mode: Optional[str] = None,
+                       emit: Optional[EmitFn] = None) -> Dict[str, Any]:
+        if not await self.ensure_available():
             return {"error": "Ollama nicht verfügbar"}
+        
+        mode = (mode or OLLAMA_ANALYSIS_MODE).lower()
+        usage = {"llm_calls": 0, "cache_hits": 0, "prompt_tokens": 0, "eval_tokens": 0, "llm_seconds": 0.0}
+        usage_token = _llm_usage.set(usage)
+        
+        # Doc-Type und Event-Type werden je nur einmal gemeldet, nach einer
+        # Eskalation aber erneut (außer sie stammen aus den Keyword-Regeln)
+        announced = set()
+        from_rules = set()
+        
+        def announce(kind: str, data: Dict[str, Any]):
+            if emit is None:
+                return
+            if kind == "escalated":
+                announced.intersection_update(from_rules)
+            elif kind != "field":
+                if kind in announced:
+                    return
+                announced.add(kind)
+            emit(kind, data)
             
         try:
             # Extrahiere Text aus OCR-JSON
             text_content = self._extract_text_from_ocr(ocr_json)
             
-            # Dokument-Klassifizierung
-            doc_type = await self._classify_document_type(text_content)
-            event_type = await self._classify_event_type(text_content, doc_type)
+            # Eindeutige Dokumente per Keyword-Regeln klassifizieren, ohne LLM-Aufruf
+            rules = preclassify(text_content) if PRECLASSIFIER_ENABLED else PreClassification()
+            if rules.doc_type:
+                from_rules.add("doc_type")
+                announce("doc_type", {"doc_type": rules.doc_type, "source": "rules"})
+            if rules.event_type:
+                from_rules.add("event_type")
+                announce("event_type", {"event_type": rules.event_type, "source": "rules"})
+            
+            stream_to = announce if emit else None
+            single_pass, models, reasons = None, [], []
+            if mode == "single_pass":
+                async def single_pass_attempt(model: str):
+                    outcome = await self._analyze_single_pass(text_content, rules.doc_type, stream_to, model)
+                    if outcome is not None and rules.event_type:
+                        outcome = (outcome[0], rules.event_type, outcome[2])
+                    return outcome
+                
+                single_pass, models, reasons = await self._cascade("single_pass", text_content, single_pass_attempt, announce)
+            if single_pass is not None:
+                doc_type, event_type, extracted_data = single_pass
+            else:
+                mode = "multi_call"
+                # Dokument-Klassifizierung
+                doc_type = rules.doc_type or await self._classify_document_type(text_content)
+                announce("doc_type", {"doc_type": doc_type, "source": "llm"})
+                event_type = rules.event_type or await self._classify_event_type(text_content, doc_type)
+                announce("event_type", {"event_type": event_type, "source": "llm"})
+                
+                # Strukturierte Datenextraktion basierend auf Doc-Type
+                async def extract_attempt(model: str):
+                    return doc_type, event_type, await self._extract_structured_data(text_content, doc_type, stream_to, model)
+                
+                extraction, extract_models, extract_reasons = await self._cascade(
+                    "extract", text_content, extract_attempt, announce
+                )
+                extracted_data = extraction[2]
+                models, reasons = models + extract_models, reasons + extract_reasons
             
-            # Strukturierte Datenextraktion basierend auf Doc-Type
-            extracted_data = await self._extract_structured_data(text_content, doc_type)
+            if OLLAMA_CASCADE_MODELS:
+                record_cascade(doc_type, models, reasons)
             
             # Confidence-Score berechnen
             confidence = self._calculate_confidence(doc_type, event_type, extracted_data)
@@ -76,31 +515,184 @@ class OllamaDocumentAnalyzer:
                 "original_text": text_content[:1000],  # Erste 1000 Zeichen für Debug
                 "processed_at": datetime.now().isoformat(),
                 "processor": "ollama",
-                "model": self.default_model
+                "model": models[-1],
+                "analysis_mode": mode,
+                "cascade": {"models": models, "reasons": reasons},
+                "classification_source": "rules" if rules.doc_type else "llm",
+                "llm_usage": {**usage, "llm_seconds": round(usage["llm_seconds"], 3)}
             }
             
+            self._record_usage(mode, usage)
             return result
             
         except Exception as e:
             logger.error(f"Fehler bei Dokument-Analyse: {e}")
             return {"error": str(e)}
+        finally:
+            _llm_usage.reset(usage_token)
+
+    async def _cascade(
+        self, task: str, text: str,
+        attempt: Callable[[str], Awaitable[Optional[Tuple[str, str, Dict[str, Any]]]]],
+        announce: EmitFn
+    ) -> Tuple[Optional[Tuple[str, str, Dict[str, Any]]], List[str], List[str]]:
+        """
+        Führt attempt(model) zuerst mit dem gerouteten Modell aus und eskaliert auf die
+        Modelle aus OLLAMA_CASCADE_MODELS, solange das Ergebnis die Prüfung nicht besteht.
+        Gibt das letzte verwertbare Ergebnis, die verwendeten Modelle und die Eskalationsgründe zurück.
+        """
+        result, models, reasons = None, [], []
+        for model in cascade_models(self.router.select(task, len(text))):
+            if models:
+                logger.info(f"Eskaliere {task} von {models[-1]} auf {model}: {reasons[-1]}")
+                announce("escalated", {"model": model, "reason": reasons[-1]})
+            models.append(model)
+            
+            outcome = await attempt(model)
+            if outcome is None:
+                reasons.append("invalid_json")
+                continue
+            result = outcome
+            
+            # Form zuerst prüfen: Confidence gibt es nur für ein Feld-Objekt
+            confidence = self._calculate_confidence(*outcome) if isinstance(outcome[2], dict) else 0.0
+            reason = validation_failure(outcome[0], outcome[2], confidence)
+            if reason is None:
+                break
+            reasons.append(reason)
+        
+        return result, models, reasons
 
-    def _extract_text_from_ocr(self, ocr_json: Dict[str, Any]) -> str:
-        """Extrahiert den vollständigen Text aus OCR-JSON"""
-        text = ""
+    async def _analyze_single_pass(
+        self, text: str, doc_type: Optional[str] = None, emit: Optional[EmitFn] = None,
+        model: Optional[str] = None
+    ) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """
+        Dokumenttyp, Event-Type und Felder in einem einzigen LLM-Aufruf.
+        Mit vorgegebenem doc_type (Vorklassifizierung) nur Event-Type und Felder.
+        Mit emit wird die Antwort gestreamt und jedes fertige Feld sofort gemeldet.
+        Gibt None zurück, wenn die Antwort kein verwertbares JSON ist
+        (der Aufrufer fällt dann auf multi_call zurück).
+        Lange Texte werden abschnittsweise parallel analysiert und zusammengeführt.
+        """
+        chunks = chunk_text(text)
+        if len(chunks) == 1:
+            return await self._single_pass_window(text, doc_type, emit, model)
+        
+        model = model or self.router.select("single_pass", len(text))
+        outcomes = await map_chunks(chunks, lambda chunk: self._single_pass_window(chunk, doc_type, None, model))
+        merged = merge_classified(outcomes, doc_type)
+        if merged is not None and emit:
+            self._emit_merged(emit, *merged)
+        return merged
+
+    async def _single_pass_window(
+        self, text: str, doc_type: Optional[str] = None, emit: Optional[EmitFn] = None,
+        model: Optional[str] = None
+    ) -> Optional[Tuple[str, str, Dict[str, Any]]]:
+        """Single-Pass-Aufruf für einen Text, der in ein Prompt-Fenster passt"""
+        streamed = {"doc_type": doc_type}
         
-        # Verschiedene OCR-JSON-Formate unterstützen
-        if "text" in ocr_json:
-            text = ocr_json["text"]
-        elif "fullTextAnnotation" in ocr_json:
-            text = ocr_json["fullTextAnnotation"]["text"]
-        elif "responses" in ocr_json and len(ocr_json["responses"]) > 0:
-            text = ocr_json["responses"][0].get("fullTextAnnotation", {}).get("text", "")
-        elif "pages" in ocr_json:
-            # Für multi-page Dokumente
-            text = "\n".join([page.get("text", "") for page in ocr_json["pages"]])
+        def on_member(path: Tuple[str, ...], value: Any):
+            if path == ("doc_type",) and str(value).upper() in DOC_TYPES:
+                streamed["doc_type"] = streamed["doc_type"] or str(value).upper()
+                emit("doc_type", {"doc_type": streamed["doc_type"], "source": "llm"})
+            elif path == ("event_type",) and str(value).upper() in EVENT_MAPPING.get(streamed["doc_type"], []):
+                emit("event_type", {"event_type": str(value).upper(), "source": "llm"})
+            elif len(path) == 2 and path[0] == "data":
+                emit("field", {"name": path[1], "value": value})
         
-        return text.strip()
+        try:
+            response = await self._generate(
+                "single_pass",
+                on_text=self._member_listener(2, on_member) if emit else None,
+                model=model or self.router.select("single_pass", len(text)),
+                prompt=self._get_single_pass_prompt(text, doc_type),
+                format=self._single_pass_format(doc_type),
+                options={"temperature": 0.1, "top_p": 0.9}
+            )
+            analysis = json.loads(response['response'])
+        except json.JSONDecodeError:
+            logger.warning("Single-Pass-Antwort ist kein JSON, verwende drei Einzelaufrufe")
+            return None
+        except Exception as e:
+            logger.error(f"Fehler bei Single-Pass-Analyse: {e}")
+            return None
+        
+        if not isinstance(analysis, dict):
+            return None
+        
+        doc_type = doc_type or str(analysis.get("doc_type", "")).strip().upper()
+        if doc_type not in DOC_TYPES:
+            doc_type = "OTHER"
+        
+        possible_events = EVENT_MAPPING[doc_type]
+        event_type = str(analysis.get("event_type", "")).strip().upper()
+        if event_type not in possible_events:
+            event_type = possible_events[0]
+        
+        extracted_data = analysis.get("data")
+        if not isinstance(extracted_data, dict):
+            extracted_data = self._fallback_extraction(text, doc_type)
+        
+        return doc_type, event_type, extracted_data
+
+    def _get_single_pass_prompt(self, text: str, doc_type: Optional[str] = None) -> str:
+        doc_types = [doc_type] if doc_type else list(DOC_TYPES)
+        events = "\n".join(f"{name}: {', '.join(EVENT_MAPPING[name])}" for name in doc_types)
+        fields = "\n".join(
+            f"{name}: " + ", ".join(f"{field} ({label})" for field, label in EXTRACTION_FIELDS[name].items())
+            for name in doc_types
+        )
+        
+        if doc_type:
+            classification = f"1. Der Dokumenttyp ist {doc_type} ({DOC_TYPES[doc_type]})."
+        else:
+            classification = "1. Klassifiziere den Dokumenttyp:\n" + "\n".join(
+                f"{name} - {label}" for name, label in DOC_TYPES.items()
+            )
+        
+        return f"""
+Analysiere den folgenden Dokumenttext.
+
+{classification}
+
+2. Wähle den passendsten Event-Type für diesen Dokumenttyp:
+{events}
+
+3. Extrahiere die Felder des Dokumenttyps (falls vorhanden):
+{fields}
+
+Text:
+{text[:OLLAMA_CHUNK_SIZE]}
+
+Antworte nur als JSON im Format:
+{{"doc_type": "{doc_type or 'INVOICE'}", "event_type": "{EVENT_MAPPING[doc_type or 'INVOICE'][0]}", "data": {{"feldname": "wert"}}}}
+"""
+
+    def _single_pass_format(self, doc_type: Optional[str] = None) -> Any:
+        """format-Parameter für Ollama: "json" oder ein JSON-Schema"""
+        if OLLAMA_OUTPUT_FORMAT != "schema":
+            return "json"
+        doc_types = [doc_type] if doc_type else list(DOC_TYPES)
+        return {
+            "type": "object",
+            "properties": {
+                "doc_type": {"type": "string", "enum": doc_types},
+                "event_type": {
+                    "type": "string",
+                    "enum": sorted({event for name in doc_types for event in EVENT_MAPPING[name]})
+                },
+                "data": {"type": "object"}
+            },
+            "required": ["doc_type", "event_type", "data"]
+        }
+
+    def _extract_text_from_ocr(self, ocr_json: Dict[str, Any]) -> str:
+        """Extrahiert den vollständigen Text aus OCR-JSON"""
+        # Gemeinsamer Extraktor mit dem ML-Pfad: alle Textfelder, begrenzt auf
+        # TEXT_EXTRACTION_MAX_CHARS, ohne doppelte OCR-Strukturen
+        return extract_text(ocr_json).text.strip()
 
     async def _classify_document_type(self, text: str) -> str:
         """Klassifiziert den Dokumenttyp"""
@@ -123,8 +715,9 @@ Antworte nur mit dem Dokumenttyp in GROSSBUCHSTABEN (z.B. INVOICE):
 """
         
         try:
-            response = self.client.generate(
-                model=self.default_model,
+            response = await self._generate(
+                "doc_type",
+                model=self.router.select("doc_type", len(text)),
                 prompt=prompt,
                 options={"temperature": 0.1, "top_p": 0.9}
             )
@@ -132,8 +725,7 @@ Antworte nur mit dem Dokumenttyp in GROSSBUCHSTABEN (z.B. INVOICE):
             doc_type = response['response'].strip().upper()
             
             # Validiere Antwort
-            valid_types = ["INVOICE", "CONTRACT", "RECEIPT", "LETTER", "FORM", "CERTIFICATE", "REPORT", "OTHER"]
-            if doc_type in valid_types:
+            if doc_type in DOC_TYPES:
                 return doc_type
             else:
                 return "OTHER"
@@ -145,18 +737,7 @@ Antworte nur mit dem Dokumenttyp in GROSSBUCHSTABEN (z.B. INVOICE):
     async def _classify_event_type(self, text: str, doc_type: str) -> str:
         """Klassifiziert den Event-Type basierend auf Dokumenttyp"""
         
-        event_mapping = {
-            "INVOICE": ["PAYMENT_DUE", "PAYMENT_RECEIVED", "INVOICE_SENT", "OVERDUE"],
-            "CONTRACT": ["CONTRACT_SIGNED", "CONTRACT_EXPIRED", "CONTRACT_RENEWED", "CONTRACT_TERMINATED"],
-            "RECEIPT": ["PAYMENT_CONFIRMED", "EXPENSE_RECORDED", "REFUND_ISSUED"],
-            "LETTER": ["CORRESPONDENCE_RECEIVED", "NOTIFICATION_SENT", "COMPLAINT_FILED"],
-            "FORM": ["APPLICATION_SUBMITTED", "FORM_COMPLETED", "REQUEST_FILED"],
-            "CERTIFICATE": ["CERTIFICATION_ISSUED", "QUALIFICATION_EARNED", "COMPLIANCE_VERIFIED"],
-            "REPORT": ["REPORT_GENERATED", "ANALYSIS_COMPLETED", "STATUS_UPDATED"],
-            "OTHER": ["DOCUMENT_PROCESSED", "DATA_EXTRACTED", "ARCHIVE_CREATED"]
-        }
-        
-        possible_events = event_mapping.get(doc_type, ["DOCUMENT_PROCESSED"])
+        possible_events = EVENT_MAPPING.get(doc_type, ["DOCUMENT_PROCESSED"])
         
         prompt = f"""
 Basierend auf dem Dokumenttyp "{doc_type}" und dem folgenden Text, wähle den passendsten Event-Type:
@@ -170,8 +751,9 @@ Antworte nur mit dem Event-Type in GROSSBUCHSTABEN:
 """
         
         try:
-            response = self.client.generate(
-                model=self.default_model,
+            response = await self._generate(
+                "event_type",
+                model=self.router.select("event_type", len(text)),
                 prompt=prompt,
                 options={"temperature": 0.1}
             )
@@ -187,8 +769,40 @@ Antworte nur mit dem Event-Type in GROSSBUCHSTABEN:
             logger.error(f"Fehler bei Event-Type-Klassifizierung: {e}")
             return possible_events[0]
 
-    async def _extract_structured_data(self, text: str, doc_type: str) -> Dict[str, Any]:
-        """Extrahiert strukturierte Daten basierend auf Dokumenttyp"""
+    async def _extract_structured_data(self, text: str, doc_type: str, emit: Optional[EmitFn] = None,
+                                       model: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Extrahiert strukturierte Daten basierend auf Dokumenttyp (mit emit: Felder gestreamt).
+        Lange Texte werden abschnittsweise parallel extrahiert und zusammengeführt.
+        """
+        chunks = chunk_text(text)
+        if len(chunks) == 1:
+            return await self._extract_window(text, doc_type, emit, model)
+        
+        model = model or self.router.select("extract", len(text))
+        extracted_data = merge_extractions(
+            await map_chunks(chunks, lambda chunk: self._extract_window(chunk, doc_type, None, model))
+        )
+        if emit:
+            self._emit_merged(emit, None, None, extracted_data)
+        return extracted_data
+
+    def _emit_merged(self, emit: EmitFn, doc_type: Optional[str], event_type: Optional[str],
+                     extracted_data: Dict[str, Any]):
+        """Meldet das zusammengeführte Ergebnis mehrerer Abschnitte (Felder erst nach dem Merge)"""
+        if doc_type:
+            emit("doc_type", {"doc_type": doc_type, "source": "llm"})
+        if event_type:
+            emit("event_type", {"event_type": event_type, "source": "llm"})
+        for name, value in extracted_data.items():
+            emit("field", {"name": name, "value": value})
+
+    async def _extract_window(self, text: str, doc_type: str, emit: Optional[EmitFn] = None,
+                              model: Optional[str] = None) -> Dict[str, Any]:
+        """Extraktionsaufruf für einen Text, der in ein Prompt-Fenster passt"""
+        
+        def on_member(path: Tuple[str, ...], value: Any):
+            emit("field", {"name": path[0], "value": value})
         
         extraction_prompts = {
             "INVOICE": self._get_invoice_extraction_prompt(text),
@@ -204,8 +818,10 @@ Antworte nur mit dem Event-Type in GROSSBUCHSTABEN:
         prompt = extraction_prompts.get(doc_type, extraction_prompts["OTHER"])
         
         try:
-            response = self.client.generate(
-                model=self.default_model,
+            response = await self._generate(
+                "extract",
+                on_text=self._member_listener(1, on_member) if emit else None,
+                model=model or self.router.select("extract", len(text)),
                 prompt=prompt,
                 options={"temperature": 0.2}
             )
@@ -219,7 +835,11 @@ Antworte nur mit dem Event-Type in GROSSBUCHSTABEN:
             elif extracted_text.startswith("```"):
                 extracted_text = extracted_text[3:-3]
             
-            return json.loads(extracted_text)
+            extracted = json.loads(extracted_text)
+            if not isinstance(extracted, dict):
+                logger.warning("Extraktion ist kein JSON-Objekt, verwende Fallback-Extraktion")
+                return self._fallback_extraction(text, doc_type)
+            return extracted
             
         except json.JSONDecodeError:
             logger.warning("JSON-Parsing fehlgeschlagen, verwende Fallback-Extraktion")
@@ -233,7 +853,7 @@ Antworte nur mit dem Event-Type in GROSSBUCHSTABEN:
 Extrahiere die folgenden Daten aus der Rechnung und gib sie als JSON zurück:
 
 Text:
-{text[:2000]}
+{text[:OLLAMA_CHUNK_SIZE]}
 
 Extrahiere diese Felder (falls vorhanden):
 - invoice_number: Rechnungsnummer
@@ -254,7 +874,7 @@ Antwort nur als JSON:
 Extrahiere die folgenden Daten aus dem Vertrag und gib sie als JSON zurück:
 
 Text:
-{text[:2000]}
+{text[:OLLAMA_CHUNK_SIZE]}
 
 Extrahiere diese Felder:
 - contract_type: Vertragstyp
@@ -272,7 +892,7 @@ Antwort nur als JSON:
 Extrahiere die folgenden Daten aus der Quittung und gib sie als JSON zurück:
 
 Text:
-{text[:2000]}
+{text[:OLLAMA_CHUNK_SIZE]}
 
 Extrahiere diese Felder:
 - merchant: Händlername
@@ -289,7 +909,7 @@ Antwort nur als JSON:
 Extrahiere die folgenden Daten aus dem Brief und gib sie als JSON zurück:
 
 Text:
-{text[:2000]}
+{text[:OLLAMA_CHUNK_SIZE]}
 
 Extrahiere diese Felder:
 - sender: Absender
@@ -306,7 +926,7 @@ Antwort nur als JSON:
 Extrahiere die folgenden Daten aus dem Formular und gib sie als JSON zurück:
 
 Text:
-{text[:2000]}
+{text[:OLLAMA_CHUNK_SIZE]}
 
 Extrahiere diese Felder:
 - form_type: Formulartyp
@@ -323,7 +943,7 @@ Antwort nur als JSON:
 Extrahiere die folgenden Daten aus dem Zertifikat und gib sie als JSON zurück:
 
 Text:
-{text[:2000]}
+{text[:OLLAMA_CHUNK_SIZE]}
 
 Extrahiere diese Felder:
 - certificate_type: Zertifikatstyp
@@ -341,7 +961,7 @@ Antwort nur als JSON:
 Extrahiere die folgenden Daten aus dem Bericht und gib sie als JSON zurück:
 
 Text:
-{text[:2000]}
+{text[:OLLAMA_CHUNK_SIZE]}
 
 Extrahiere diese Felder:
 - report_type: Berichtstyp
@@ -358,7 +978,7 @@ Antwort nur als JSON:
 Extrahiere die wichtigsten Daten aus dem Dokument und gib sie als JSON zurück:
 
 Text:
-{text[:2000]}
+{text[:OLLAMA_CHUNK_SIZE]}
 
 Extrahiere diese Felder:
 - title: Titel/Überschrift
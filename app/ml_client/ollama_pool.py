@@ -0,0 +1,156 @@
+"""
+Pool of Ollama servers with model-affinity routing
+
+OLLAMA_HOSTS lists the servers (comma separated, default OLLAMA_HOST). For
+every generate call the pool picks, in this order of preference,
+  1. a host that has the model loaded (ollama ps),
+  2. a host that has it installed (ollama list),
+  3. any host whose models are not known yet,
+and within that tier the least loaded one (in-flight requests weighted by
+latency, as for the ML server replicas). Loading a model on a CPU box takes
+tens of seconds, so a busy host with the model resident usually beats an
+idle one that would have to swap.
+
+Failed hosts are ejected like ML endpoints and the call moves on to the next
+host. Models stay resident for OLLAMA_KEEP_ALIVE after each call.
+"""
+
+import os
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from app.ml_client.balancer import Endpoint, EndpointBalancer
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_HOSTS = [
+    host.strip()
+    for host in os.getenv("OLLAMA_HOSTS", os.getenv("OLLAMA_HOST", "http://localhost:11434")).split(",")
+    if host.strip()
+]
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+
+
+def model_key(name: Optional[str]) -> Optional[str]:
+    """Ollama model names without tag mean :latest"""
+    if not name:
+        return None
+    return name if ":" in name else f"{name}:latest"
+
+
+def model_names(response: Any) -> Set[str]:
+    """Normalized model names from a list() or ps() response"""
+    names = set()
+    for entry in (response or {}).get("models", []) or []:
+        # ollama >= 0.4 reports "model", older versions "name"
+        name = model_key(entry.get("model") or entry.get("name"))
+        if name:
+            names.add(name)
+    return names
+
+
+class OllamaHost(Endpoint):
+    """One Ollama server, its client and the models it has installed and loaded"""
+
+    def __init__(self, url: str, client_factory: Callable[[str], Any]):
+        super().__init__(url)
+        self._client_factory = client_factory
+        self._client = None
+        self.installed: Optional[Set[str]] = None
+        self.loaded: Set[str] = set()
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory(self.url)
+        return self._client
+
+    @client.setter
+    def client(self, client):
+        self._client = client
+
+    def affinity(self, model: str) -> int:
+        """0 loaded, 1 installed, 2 unknown, 3 not installed"""
+        key = model_key(model)
+        if key in self.loaded:
+            return 0
+        if self.installed is None:
+            return 2
+        return 1 if key in self.installed else 3
+
+
+class OllamaPool(EndpointBalancer):
+    """Least-loaded balancing across Ollama hosts, preferring hosts with the model resident"""
+
+    def __init__(self, urls: List[str], client_factory: Callable[[str], Any]):
+        if not urls:
+            raise ValueError("At least one Ollama host is required")
+        super().__init__(urls)
+        self.endpoints = [OllamaHost(url, client_factory) for url in urls]
+
+    def pick_for(self, model: str, exclude: Iterable[str] = ()) -> Optional[OllamaHost]:
+        """Best host for the model, None if every host has been excluded"""
+        remaining = [host for host in self.endpoints if host.url not in exclude]
+        candidates = [host for host in remaining if host.available] or remaining
+        if not candidates:
+            return None
+        return min(candidates, key=lambda host: (host.affinity(model), host.score()))
+
+    def acquire_for(self, model: str, exclude: Iterable[str] = ()) -> Optional[OllamaHost]:
+        """pick_for and count the request as in flight"""
+        host = self.pick_for(model, exclude)
+        if host is not None:
+            host.in_flight += 1
+            host.requests += 1
+        return host
+
+    def record_loaded(self, host: OllamaHost, model: str):
+        """A successful generate leaves the model resident on the host"""
+        host.loaded.add(model_key(model))
+
+    async def refresh(self, timeout: float) -> List[Optional[Exception]]:
+        """Update health, installed and loaded models of every host; returns the error per host"""
+        return await asyncio.gather(*[self._refresh_host(host, timeout) for host in self.endpoints])
+
+    async def _refresh_host(self, host: OllamaHost, timeout: float) -> Optional[Exception]:
+        try:
+            installed = model_names(await asyncio.wait_for(host.client.list(), timeout=timeout))
+        except Exception as e:
+            if host.healthy:
+                logger.warning(f"Ollama host {host.url} unreachable: {e}")
+            host.healthy = False
+            return e
+
+        try:
+            loaded = model_names(await asyncio.wait_for(host.client.ps(), timeout=timeout))
+        except Exception as e:
+            # Servers without /api/ps: keep the models seen in successful calls
+            logger.debug(f"Ollama host {host.url} ps failed: {e}")
+            loaded = host.loaded & installed
+
+        if not host.healthy:
+            logger.info(f"Ollama host {host.url} is reachable again")
+        host.healthy = True
+        host.ejected_until = 0.0
+        host.consecutive_failures = 0
+        host.installed = installed
+        host.loaded = loaded
+        return None
+
+    @property
+    def available(self) -> bool:
+        return any(host.available for host in self.endpoints)
+
+    async def close(self):
+        for host in self.endpoints:
+            if host._client is not None:
+                await host._client.close()
+                host._client = None
+
+    def get_stats(self) -> List[Dict[str, Any]]:
+        stats = super().get_stats()
+        for entry, host in zip(stats, self.endpoints):
+            entry["installed"] = sorted(host.installed) if host.installed is not None else None
+            entry["loaded"] = sorted(host.loaded)
+        return stats
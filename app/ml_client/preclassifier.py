@@ -0,0 +1,182 @@
+"""
+Rule-based pre-classification before any LLM call (Ollama path)
+
+The scored keyword classifier from app.schemas decides the document type
+when its confidence reaches PRECLASSIFIER_DOC_THRESHOLD; the analyzer then
+skips the LLM classification and goes straight to extraction. The event type
+is scored the same way among the events of that document type and used when
+it reaches PRECLASSIFIER_EVENT_THRESHOLD.
+
+Thresholds are calibrated on a labeled sample (one JSON object per line,
+{"text": ..., "doc_type": "INVOICE"}):
+
+    python -m app.ml_client.preclassifier labeled.jsonl --precision 0.98
+"""
+
+import os
+import sys
+import json
+import argparse
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.schemas.doc_types import DocumentType, classify_document_type
+from app.schemas.keyword_scoring import score_keywords
+
+PRECLASSIFIER_ENABLED = os.getenv("PRECLASSIFIER_ENABLED", "true").lower() == "true"
+PRECLASSIFIER_DOC_THRESHOLD = float(os.getenv("PRECLASSIFIER_DOC_THRESHOLD", "0.8"))
+PRECLASSIFIER_EVENT_THRESHOLD = float(os.getenv("PRECLASSIFIER_EVENT_THRESHOLD", "0.7"))
+
+# Schema document types with an Ollama counterpart; others always go to the LLM
+OLLAMA_DOC_TYPES = {
+    DocumentType.INVOICE: "INVOICE",
+    DocumentType.CONTRACT: "CONTRACT",
+    DocumentType.RECEIPT: "RECEIPT",
+    DocumentType.LETTER: "LETTER",
+    DocumentType.FORM: "FORM",
+    DocumentType.REPORT: "REPORT"
+}
+
+# Weighted keywords for the Ollama event types of a document type
+EVENT_KEYWORDS: Dict[str, Dict[str, Dict[str, float]]] = {
+    "INVOICE": {
+        "PAYMENT_DUE": {
+            "fällig": 1.5, "due date": 1.5, "zahlungsziel": 1.5, "amount due": 1.5,
+            "zahlbar bis": 1.5, "payable": 1.0
+        },
+        "PAYMENT_RECEIVED": {"payment received": 2.0, "zahlung erhalten": 2.0, "bezahlt": 1.0, "paid": 1.0},
+        "OVERDUE": {"overdue": 2.0, "überfällig": 2.0, "mahnung": 2.0, "zahlungserinnerung": 2.0, "reminder": 1.0}
+    },
+    "RECEIPT": {
+        "PAYMENT_CONFIRMED": {"bezahlt": 1.0, "paid": 1.0, "kartenzahlung": 1.5, "cash": 1.0},
+        "REFUND_ISSUED": {"refund": 2.0, "rückerstattung": 2.0, "erstattung": 2.0, "gutschrift": 1.5},
+        "EXPENSE_RECORDED": {"expense": 1.5, "spesen": 1.5, "bewirtung": 1.5, "reisekosten": 1.5}
+    },
+    "CONTRACT": {
+        "CONTRACT_TERMINATED": {"kündigung": 2.0, "termination": 2.0, "terminate": 1.5},
+        "CONTRACT_RENEWED": {"verlängerung": 2.0, "renewal": 2.0, "renew": 1.5},
+        "CONTRACT_SIGNED": {"unterzeichnet": 1.5, "signed": 1.5, "unterschrift": 1.0, "signature": 1.0},
+        "CONTRACT_EXPIRED": {"abgelaufen": 1.5, "expired": 1.5, "endet am": 1.0}
+    }
+}
+
+preclassifier_stats: Dict[str, Any] = {"documents": 0, "doc_type_hits": 0, "event_type_hits": 0, "by_doc_type": {}}
+
+
+@dataclass
+class PreClassification:
+    """Rule-based decision; None fields are left to the LLM"""
+    doc_type: Optional[str] = None
+    event_type: Optional[str] = None
+    doc_confidence: float = 0.0
+    event_confidence: float = 0.0
+
+
+def _score_doc_type(text: str) -> Tuple[Optional[str], float]:
+    """Ollama doc type and keyword confidence (None for types without a counterpart)"""
+    classification = classify_document_type({"text": text})
+    return OLLAMA_DOC_TYPES.get(classification.doc_type), classification.confidence
+
+
+def preclassify(
+    text: str,
+    doc_threshold: float = None,
+    event_threshold: float = None
+) -> PreClassification:
+    """
+    Decide document and event type without an LLM where the keywords are clear
+
+    Args:
+        text: Document text
+        doc_threshold: Minimum doc type confidence (default PRECLASSIFIER_DOC_THRESHOLD)
+        event_threshold: Minimum event type confidence (default PRECLASSIFIER_EVENT_THRESHOLD)
+    """
+    doc_threshold = PRECLASSIFIER_DOC_THRESHOLD if doc_threshold is None else doc_threshold
+    event_threshold = PRECLASSIFIER_EVENT_THRESHOLD if event_threshold is None else event_threshold
+    preclassifier_stats["documents"] += 1
+
+    doc_type, doc_confidence = _score_doc_type(text)
+    if doc_type is None or doc_confidence < doc_threshold:
+        return PreClassification(doc_confidence=doc_confidence)
+
+    result = PreClassification(doc_type=doc_type, doc_confidence=doc_confidence)
+    preclassifier_stats["doc_type_hits"] += 1
+    preclassifier_stats["by_doc_type"][doc_type] = preclassifier_stats["by_doc_type"].get(doc_type, 0) + 1
+
+    scores = score_keywords(text, EVENT_KEYWORDS.get(doc_type, {}))
+    if scores.best is not None and scores.confidence() >= event_threshold:
+        result.event_type = scores.best
+        result.event_confidence = scores.confidence()
+        preclassifier_stats["event_type_hits"] += 1
+
+    return result
+
+
+def calibrate_threshold(samples: List[Tuple[str, str]], target_precision: float = 0.98) -> Dict[str, Any]:
+    """
+    Lowest doc type threshold whose accepted documents reach target_precision
+
+    Args:
+        samples: (text, expected Ollama doc type) pairs
+        target_precision: Required share of correct rule decisions
+
+    Returns:
+        Dict with threshold (above 1.0 if no threshold is good enough),
+        precision and coverage (share of samples that would skip the LLM)
+    """
+    scored = []
+    for text, expected in samples:
+        doc_type, confidence = _score_doc_type(text)
+        if doc_type is not None:
+            scored.append((confidence, doc_type == str(expected).upper()))
+    scored.sort(key=lambda item: item[0], reverse=True)
+
+    best = {"threshold": 1.01, "precision": None, "coverage": 0.0, "samples": len(samples)}
+    correct = 0
+    for index, (confidence, is_correct) in enumerate(scored):
+        correct += is_correct
+        # Only cut between distinct confidences
+        if index + 1 < len(scored) and scored[index + 1][0] == confidence:
+            continue
+        precision = correct / (index + 1)
+        if precision >= target_precision:
+            best.update(
+                threshold=confidence,
+                precision=round(precision, 4),
+                coverage=round((index + 1) / len(samples), 4)
+            )
+
+    return best
+
+
+def get_preclassifier_stats() -> Dict[str, Any]:
+    documents = preclassifier_stats["documents"]
+    return {
+        "enabled": PRECLASSIFIER_ENABLED,
+        "doc_threshold": PRECLASSIFIER_DOC_THRESHOLD,
+        "event_threshold": PRECLASSIFIER_EVENT_THRESHOLD,
+        "hit_rate": round(preclassifier_stats["doc_type_hits"] / documents, 4) if documents else 0.0,
+        **preclassifier_stats
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calibrate the pre-classifier doc type threshold")
+    parser.add_argument("samples", help="JSONL file with {\"text\": ..., \"doc_type\": ...} per line")
+    parser.add_argument("--precision", type=float, default=0.98, help="Required precision")
+    args = parser.parse_args()
+
+    with open(args.samples, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    samples = [(row["text"], row["doc_type"]) for row in rows]
+
+    result = calibrate_threshold(samples, args.precision)
+    print(json.dumps(result, indent=2))
+    if result["threshold"] <= 1.0:
+        print(f"export PRECLASSIFIER_DOC_THRESHOLD={result['threshold']}")
+    else:
+        print("No threshold reaches the requested precision", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
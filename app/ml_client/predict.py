@@ -7,34 +7,196 @@ TODO: Add retry-logic in ml_client.predict()
 """
 
 import os
+import gzip
 import json
+import time
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple, Set
 import asyncio
 
 import httpx
-from tenacity import retry, stop_after_attempt, wait_exponential
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
+from tenacity.stop import stop_base
+
+try:
+    import ijson  # incremental parsing of large responses; json.loads without it
+except ImportError:
+    ijson = None
+
+from app.ml_client.resilience import CircuitBreaker, LatencyTracker, hedged
+from app.ml_client.prediction_cache import PredictionCache, create_prediction_cache
+from app.ml_client.balancer import EndpointBalancer
+from app.ml_client.chunking import ML_CHUNKING_ENABLED, ML_CHUNK_SIZE, predict_chunked
+from app.utils.text_extraction import ExtractedText, extract_text, payload_to_text
+from app.utils.deadline import bounded_timeout, check_deadline, remaining_time
 
 logger = logging.getLogger(__name__)
 
 # ML Server Configuration
 ML_SERVER_URL = os.getenv("ML_SERVER_URL", "http://localhost:8000")
+# Several replicas (comma-separated) are balanced client-side; defaults to ML_SERVER_URL
+ML_SERVER_URLS = [
+    url.strip() for url in os.getenv("ML_SERVER_URLS", ML_SERVER_URL).split(",") if url.strip()
+]
 ML_API_KEY = os.getenv("ML_API_KEY", "default_key")
 REQUEST_TIMEOUT = int(os.getenv("ML_REQUEST_TIMEOUT", "30"))
 
+# Connection pool for the shared client (one per process)
+ML_MAX_CONNECTIONS = int(os.getenv("ML_MAX_CONNECTIONS", "100"))
+ML_MAX_KEEPALIVE = int(os.getenv("ML_MAX_KEEPALIVE", "20"))
+ML_KEEPALIVE_EXPIRY = float(os.getenv("ML_KEEPALIVE_EXPIRY", "30"))
+ML_HTTP2 = os.getenv("ML_HTTP2", "false").lower() == "true"
+
+# Request batching (needs a model server that accepts {"documents": [...]})
+ML_BATCHING_ENABLED = os.getenv("ML_BATCHING_ENABLED", "false").lower() == "true"
+ML_BATCH_MAX_SIZE = int(os.getenv("ML_BATCH_MAX_SIZE", "16"))
+ML_BATCH_MAX_WAIT_MS = float(os.getenv("ML_BATCH_MAX_WAIT_MS", "10"))
+
+# Retries only for transient errors (timeouts, connection errors, 5xx)
+ML_RETRY_ATTEMPTS = int(os.getenv("ML_RETRY_ATTEMPTS", "3"))
+ML_RETRY_MIN_WAIT = float(os.getenv("ML_RETRY_MIN_WAIT", "0.5"))
+ML_RETRY_MAX_WAIT = float(os.getenv("ML_RETRY_MAX_WAIT", "4"))
+# Time a retry needs after its backoff to be worth starting (matches the timeout floor)
+ML_RETRY_MIN_ATTEMPT = float(os.getenv("ML_RETRY_MIN_ATTEMPT", "1.0"))
+
+# Hedged requests: second attempt once the first is slower than p95
+ML_HEDGE_ENABLED = os.getenv("ML_HEDGE_ENABLED", "false").lower() == "true"
+ML_HEDGE_MIN_SAMPLES = int(os.getenv("ML_HEDGE_MIN_SAMPLES", "20"))
+ML_HEDGE_MIN_DELAY_MS = float(os.getenv("ML_HEDGE_MIN_DELAY_MS", "50"))
+
+# Request compression (auto: gzip large bodies until the server answers 415)
+ML_REQUEST_COMPRESSION = os.getenv("ML_REQUEST_COMPRESSION", "auto").lower()
+ML_COMPRESSION_MIN_BYTES = int(os.getenv("ML_COMPRESSION_MIN_BYTES", "16384"))
+ML_COMPRESSION_LEVEL = int(os.getenv("ML_COMPRESSION_LEVEL", "5"))
+
+# Incremental response parsing (needs ijson, buffered parsing otherwise)
+ML_STREAM_PARSING = os.getenv("ML_STREAM_PARSING", "true").lower() == "true"
+
+_http_client: Optional[httpx.AsyncClient] = None
+compression_stats = {"accepted": True, "compressed_requests": 0, "bytes_in": 0, "bytes_out": 0}
+
+# Process-wide resilience state for the ML server
+ml_breaker = CircuitBreaker("ml_server")
+ml_latency = LatencyTracker()
+hedge_stats = {"hedges_sent": 0, "hedges_won": 0}
+ml_balancer = EndpointBalancer(ML_SERVER_URLS)
+
+_prediction_cache: Optional[PredictionCache] = None
+_prediction_cache_created = False
+
 class MLClientError(Exception):
     """Custom exception for ML client errors"""
-    pass
+    
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+def _http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])"""
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
+def get_ml_client() -> httpx.AsyncClient:
+    """
+    Get the process-wide HTTP client for the ML server.
+    Connections are pooled and kept alive, so calls and retries
+    skip the TCP/TLS handshake.
+    """
+    global _http_client
+    
+    if _http_client is None or _http_client.is_closed:
+        http2 = ML_HTTP2
+        if http2 and not _http2_available():
+            logger.warning("ML_HTTP2 enabled but h2 is not installed, falling back to HTTP/1.1")
+            http2 = False
+        
+        _http_client = httpx.AsyncClient(
+            timeout=REQUEST_TIMEOUT,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=ML_MAX_CONNECTIONS,
+                max_keepalive_connections=ML_MAX_KEEPALIVE,
+                keepalive_expiry=ML_KEEPALIVE_EXPIRY
+            ),
+            headers={
+                "Authorization": f"Bearer {ML_API_KEY}",
+                "User-Agent": "NeuraLex-Platform/1.0"
+            }
+        )
+        logger.info(
+            f"ML client pool created (max_connections={ML_MAX_CONNECTIONS}, "
+            f"keepalive={ML_MAX_KEEPALIVE}, http2={http2})"
+        )
+    
+    return _http_client
+
+async def startup_ml_client():
+    """Create the shared ML client and start endpoint health probes on process startup"""
+    get_ml_client()
+    ml_balancer.start_probing(health_check)
+
+def get_prediction_cache() -> Optional[PredictionCache]:
+    """Process-wide prediction cache (None when PREDICTION_CACHE_ENABLED is off)"""
+    global _prediction_cache, _prediction_cache_created
+    
+    if not _prediction_cache_created:
+        _prediction_cache = create_prediction_cache(get_server_info)
+        _prediction_cache_created = True
+    
+    return _prediction_cache
+
+async def shutdown_ml_client():
+    """Close the shared ML client, its pooled connections and the cache's Redis connection"""
+    global _http_client, _prediction_cache, _prediction_cache_created
+    
+    await ml_balancer.stop_probing()
+    
+    if _prediction_cache is not None:
+        await _prediction_cache.close()
+    _prediction_cache = None
+    _prediction_cache_created = False
+    
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+        logger.info("ML client pool closed")
+
+def _is_retryable(error: BaseException) -> bool:
+    """Retry timeouts, connection errors and server errors; never an open circuit or a 4xx"""
+    if not isinstance(error, MLClientError):
+        return False
+    return error.status_code is None or error.status_code >= 500 or error.status_code == 429
+
+class _stop_at_deadline(stop_base):
+    """Stop retrying when the job deadline leaves no room for the backoff plus another attempt"""
+    
+    def __call__(self, retry_state) -> bool:
+        remaining = remaining_time()
+        if remaining is None:
+            return False
+        # tenacity computes the backoff (upcoming_sleep) before asking stop
+        return remaining <= (retry_state.upcoming_sleep or 0) + ML_RETRY_MIN_ATTEMPT
+
+_retry_transient = retry(
+    stop=stop_after_attempt(ML_RETRY_ATTEMPTS) | _stop_at_deadline(),
+    wait=wait_exponential(multiplier=1, min=ML_RETRY_MIN_WAIT, max=ML_RETRY_MAX_WAIT),
+    retry=retry_if_exception(_is_retryable),
     reraise=True
 )
+
+@_retry_transient
 async def predict_document(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     Send document to ML server for prediction
     
+    Results are cached per document text and model version. Texts longer
+    than ML_CHUNK_SIZE are predicted as overlapping windows and merged. With
+    ML_BATCHING_ENABLED concurrent calls are aggregated into batched
+    /predict requests; callers still get their own result.
+    
     Args:
         payload: Document data to classify
         
@@ -57,162 +219,539 @@ async def predict_document(payload: Dict[str, Any]) -> Dict[str, Any]:
         
     Raises:
         MLClientError: If prediction fails
+        CircuitOpenError: If the ML server circuit is open (no request sent)
     """
-    try:
-        logger.info(f"Sending prediction request to ML server: {ML_SERVER_URL}")
+    extracted = extract_text(payload)
+    text = extracted.text or _extract_text_from_payload(payload)
+    
+    cache = get_prediction_cache()
+    if cache:
+        model_version = await cache.get_model_version()
+        cached = await cache.get(text, model_version)
+        if cached is not None:
+            return cached
+    
+    if ML_CHUNKING_ENABLED and len(text) > ML_CHUNK_SIZE:
+        result = await predict_chunked(text, payload.get("metadata", {}), _predict_one)
+    else:
+        result = await _predict_one(payload)
+    _annotate_source_paths(result, extracted)
+    
+    if cache:
+        await cache.set(text, result, model_version)
+    return result
+
+@_retry_transient
+async def predict_documents(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Send several documents to the ML server in one batched request
+    
+    Request:  POST /predict {"documents": [<request>, ...]}
+    Response: {"predictions": [<prediction>, ...]} in request order
+    
+    Returns:
+        List of prediction results, one per payload (see predict_document)
         
-        # Prepare request data
-        request_data = {
-            "text": _extract_text_from_payload(payload),
-            "metadata": payload.get("metadata", {}),
-            "options": {
-                "include_entities": True,
-                "include_confidence": True
-            }
+    Raises:
+        MLClientError: If prediction fails
+    """
+    if not payloads:
+        return []
+    
+    cache = get_prediction_cache()
+    if not cache:
+        return await _predict_batch(payloads)
+    
+    # Only documents missing from the cache go to the server
+    texts = [_extract_text_from_payload(payload) for payload in payloads]
+    model_version = await cache.get_model_version()
+    results: List[Optional[Dict[str, Any]]] = [await cache.get(text, model_version) for text in texts]
+    missing = [index for index, result in enumerate(results) if result is None]
+    
+    if missing:
+        predictions = await _predict_batch([payloads[index] for index in missing])
+        for index, prediction in zip(missing, predictions):
+            results[index] = prediction
+            await cache.set(texts[index], prediction, model_version)
+    
+    return results
+
+async def _predict_one(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Single request, aggregated into a batch when batching is enabled"""
+    if ML_BATCHING_ENABLED:
+        return await get_prediction_batcher().submit(payload)
+    return await _predict_single(payload)
+
+def _build_request_data(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Build the /predict request body for one document"""
+    return {
+        "text": _extract_text_from_payload(payload),
+        "metadata": payload.get("metadata", {}),
+        "options": {
+            "include_entities": True,
+            "include_confidence": True
         }
+    }
+
+async def _post_predict(request_data: Dict[str, Any], hedge: bool = False, batch: bool = False) -> Any:
+    """
+    POST to /predict through the circuit breaker; single-document requests
+    are hedged once enough latency samples exist
+    """
+    ml_breaker.before_call()
+    start = time.monotonic()
+    
+    try:
+        if hedge and ML_HEDGE_ENABLED and len(ml_latency) >= ML_HEDGE_MIN_SAMPLES:
+            delay = max(ml_latency.percentile(0.95), ML_HEDGE_MIN_DELAY_MS / 1000)
+            result = await hedged(lambda: _send_predict(request_data, batch), delay, hedge_stats)
+        else:
+            result = await _send_predict(request_data, batch)
+    except MLClientError as e:
+        duration = time.monotonic() - start
+        # Rejected requests (4xx) say nothing about server health
+        if e.status_code is not None and 400 <= e.status_code < 500:
+            ml_breaker.record_success(duration)
+        else:
+            ml_breaker.record_failure(duration)
+        raise
+    except BaseException:
+        ml_breaker.release()
+        raise
+    
+    duration = time.monotonic() - start
+    ml_breaker.record_success(duration)
+    ml_latency.observe(duration)
+    return result
+
+async def _encode_request(request_data: Dict[str, Any], allow_compression: bool = True) -> Tuple[bytes, bool]:
+    """Serialise the request body, gzipped when it is large and the server accepts it"""
+    body = json.dumps(request_data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    
+    compress = (
+        allow_compression
+        and ML_REQUEST_COMPRESSION != "off"
+        and compression_stats["accepted"]
+        and len(body) >= ML_COMPRESSION_MIN_BYTES
+    )
+    if not compress:
+        return body, False
+    
+    # Multi-MB bodies are compressed off the event loop
+    if len(body) > 1024 * 1024:
+        compressed = await asyncio.to_thread(gzip.compress, body, ML_COMPRESSION_LEVEL)
+    else:
+        compressed = gzip.compress(body, ML_COMPRESSION_LEVEL)
+    
+    compression_stats["compressed_requests"] += 1
+    compression_stats["bytes_in"] += len(body)
+    compression_stats["bytes_out"] += len(compressed)
+    return compressed, True
+
+async def _send_predict(request_data: Dict[str, Any], batch: bool = False) -> Any:
+    """
+    POST to /predict on the least loaded ML endpoint and return the validated
+    prediction (a list of predictions for batch requests, None if the
+    response has no predictions array)
+    """
+    # No request once the job deadline has passed (not retried, the fallback degrades)
+    check_deadline("ML prediction")
+    
+    body, compressed = await _encode_request(request_data)
+    endpoint = ml_balancer.acquire()
+    start = time.monotonic()
+    # Never wait longer than the job deadline allows
+    timeout = bounded_timeout(REQUEST_TIMEOUT)
+    
+    try:
+        # Make async HTTP request over the shared connection pool
+        client = get_ml_client()
+        while True:
+            headers = {"Content-Type": "application/json"}
+            if compressed:
+                headers["Content-Encoding"] = "gzip"
+            
+            async with client.stream(
+                "POST",
+                f"{endpoint.url}/predict",
+                content=body,
+                headers=headers,
+                timeout=timeout
+            ) as response:
+                # Servers without gzip support: send uncompressed from now on
+                if response.status_code == 415 and compressed and ML_REQUEST_COMPRESSION == "auto":
+                    logger.warning(f"ML server {endpoint.url} rejected a gzip request body, compression disabled")
+                    compression_stats["accepted"] = False
+                    body, compressed = await _encode_request(request_data, allow_compression=False)
+                    continue
+                
+                # Check response status
+                if response.status_code != 200:
+                    await response.aread()
+                    error_msg = f"ML server error ({endpoint.url}): {response.status_code} - {response.text}"
+                    logger.error(error_msg)
+                    raise MLClientError(error_msg, status_code=response.status_code)
+                
+                # Parse and validate the response while it streams in
+                result = await _read_prediction_response(response, batch)
+            break
         
-        # Set up headers
-        headers = {
-            "Content-Type": "application/json",
-            "Authorization": f"Bearer {ML_API_KEY}",
-            "User-Agent": "NeuraLex-Platform/1.0"
-        }
+        ml_balancer.record_success(endpoint, time.monotonic() - start)
+        return result
+        
+    except MLClientError as e:
+        # A rejected request (4xx) still came from a working replica
+        if e.status_code is not None and e.status_code < 500:
+            ml_balancer.record_success(endpoint, time.monotonic() - start)
+        else:
+            ml_balancer.record_failure(endpoint)
+        raise
+        
+    except asyncio.CancelledError:
+        ml_balancer.release(endpoint)
+        raise
         
-        # Make async HTTP request
-        async with httpx.AsyncClient(timeout=REQUEST_TIMEOUT) as client:
-            response = await client.post(
-                f"{ML_SERVER_URL}/predict",
-                json=request_data,
-                headers=headers
-            )
-            
-            # Check response status
-            if response.status_code != 200:
-                error_msg = f"ML server error: {response.status_code} - {response.text}"
-                logger.error(error_msg)
-                raise MLClientError(error_msg)
-            
-            # Parse response
-            result = response.json()
-            
-            # Validate response structure
-            validated_result = _validate_prediction_response(result)
-            
-            logger.info("Successfully received prediction from ML server")
-            return validated_result
-            
     except httpx.TimeoutException:
-        error_msg = f"ML server timeout after {REQUEST_TIMEOUT} seconds"
+        ml_balancer.record_failure(endpoint)
+        error_msg = f"ML server timeout after {timeout:.1f} seconds ({endpoint.url})"
         logger.error(error_msg)
         raise MLClientError(error_msg)
         
     except httpx.RequestError as e:
-        error_msg = f"ML server connection error: {e}"
+        ml_balancer.record_failure(endpoint)
+        error_msg = f"ML server connection error ({endpoint.url}): {e}"
         logger.error(error_msg)
         raise MLClientError(error_msg)
         
     except Exception as e:
+        ml_balancer.record_failure(endpoint)
         error_msg = f"ML prediction failed: {e}"
         logger.error(error_msg)
         raise MLClientError(error_msg)
 
-def _extract_text_from_payload(payload: Dict[str, Any]) -> str:
-    """Extract text content from various payload formats"""
+async def _read_prediction_response(response: httpx.Response, batch: bool) -> Any:
+    """Validated prediction(s) from a streamed /predict response"""
+    if ML_STREAM_PARSING and ijson is not None:
+        parser = _PredictionStreamParser(batch)
+        events = ijson.parse_coro(parser, use_float=True)
+        async for chunk in response.aiter_bytes():
+            events.send(chunk)
+        events.close()
+        return parser.result()
+    
+    data = json.loads(await response.aread())
+    if not batch:
+        return _validate_prediction_response(data if isinstance(data, dict) else {})
+    
+    predictions = data.get("predictions") if isinstance(data, dict) else None
+    if not isinstance(predictions, list):
+        return None
+    return [
+        _validate_prediction_response(prediction if isinstance(prediction, dict) else {})
+        for prediction in predictions
+    ]
+
+class _PredictionStreamParser:
+    """
+    ijson event sink building validated predictions incrementally.
+    
+    Entities are assembled one at a time and normalised as soon as their
+    object closes, so the raw entity list is never held in memory next to
+    the validated one.
+    """
+    
+    def __init__(self, batch: bool):
+        self.batch = batch
+        self.predictions: Optional[List[Dict[str, Any]]] = None
+        self.current: Optional[Dict[str, Any]] = None if batch else _empty_prediction()
+        self._entity: Optional[Any] = None
+        self._entity_depth = 0
+    
+    def send(self, event: Tuple[str, str, Any]):
+        prefix, kind, value = event
+        
+        if self._entity is not None:
+            self._entity.event(kind, value)
+            if kind in ("start_map", "start_array"):
+                self._entity_depth += 1
+            elif kind in ("end_map", "end_array"):
+                self._entity_depth -= 1
+                if self._entity_depth == 0:
+                    validated = _validate_entity(self._entity.value)
+                    if validated is not None:
+                        self.current["entities"].append(validated)
+                    self._entity = None
+            return
+        
+        if self.batch:
+            if prefix == "predictions" and kind == "start_array":
+                self.predictions = []
+                return
+            if prefix == "predictions.item" and self.predictions is not None:
+                if kind == "start_map":
+                    self.current = _empty_prediction()
+                elif kind == "end_map":
+                    self.predictions.append(self.current)
+                    self.current = None
+                elif kind not in ("map_key", "end_array"):
+                    # Non-object items are answered with defaults, like an empty prediction
+                    self.predictions.append(_empty_prediction())
+                return
+            if self.current is None or not prefix.startswith("predictions.item."):
+                return
+            prefix = prefix[len("predictions.item."):]
+        
+        if prefix == "entities.item" and kind == "start_map":
+            self._entity = ijson.ObjectBuilder()
+            self._entity.event(kind, value)
+            self._entity_depth = 1
+        elif prefix in _PREDICTION_HEADER_FIELDS and kind in ("string", "number", "boolean", "null"):
+            _set_header_field(self.current, prefix, value)
+    
+    def close(self):
+        pass
+    
+    def result(self) -> Any:
+        return self.predictions if self.batch else self.current
+
+async def _predict_single(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """One document, one request"""
+    logger.info("Sending prediction request to ML server")
+    
+    result = await _post_predict(_build_request_data(payload), hedge=True)
+    
+    logger.info("Successfully received prediction from ML server")
+    return result
+
+async def _predict_batch(payloads: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Several documents in one batched request"""
+    logger.info(f"Sending batch of {len(payloads)} documents to ML server")
+    
+    predictions = await _post_predict({
+        "documents": [_build_request_data(payload) for payload in payloads]
+    }, batch=True)
+    
+    if not isinstance(predictions, list) or len(predictions) != len(payloads):
+        raise MLClientError(
+            f"ML server returned {len(predictions) if isinstance(predictions, list) else 'no'} "
+            f"predictions for a batch of {len(payloads)}"
+        )
+    
+    return predictions
+
+class PredictionBatcher:
+    """
+    Aggregates concurrent predict_document calls into batched requests.
+    
+    A batch is sent when it reaches max_size or max_wait_ms after its first
+    request, whichever comes first. Single-request batches use the plain
+    endpoint, so an idle system pays no batching overhead beyond the wait.
+    """
+    
+    def __init__(self, max_size: int = None, max_wait_ms: float = None):
+        self.max_size = max_size or ML_BATCH_MAX_SIZE
+        self.max_wait = (max_wait_ms if max_wait_ms is not None else ML_BATCH_MAX_WAIT_MS) / 1000
+        self.batch_supported = True
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+        self.stats = {"requests": 0, "batches": 0, "batched_requests": 0}
     
-    # Direct text field
-    if "text" in payload:
-        return str(payload["text"])
+    async def submit(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Queue one document for the next batch and wait for its prediction"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((payload, future))
+        self.stats["requests"] += 1
+        
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        
+        return await future
     
-    # Content field
-    if "content" in payload:
-        return str(payload["content"])
+    def _flush(self):
+        """Send everything collected so far as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        
+        # Callers that gave up (e.g. cancelled jobs) are dropped from the batch
+        batch = [(payload, future) for payload, future in self._pending if not future.done()]
+        self._pending = []
+        if not batch:
+            return
+        
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
     
-    # Body field
-    if "body" in payload:
-        return str(payload["body"])
+    async def _send(self, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        payloads = [payload for payload, _ in batch]
+        
+        try:
+            if len(batch) == 1 or not self.batch_supported:
+                results = await asyncio.gather(
+                    *[_predict_single(payload) for payload in payloads],
+                    return_exceptions=True
+                )
+            else:
+                results = await self._send_batch(payloads)
+        except Exception as e:
+            results = [e] * len(batch)
+        
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
     
-    # Message field
-    if "message" in payload:
-        return str(payload["message"])
+    async def _send_batch(self, payloads: List[Dict[str, Any]]) -> List[Any]:
+        try:
+            results = await _predict_batch(payloads)
+        except MLClientError as e:
+            # Servers without batch support reject the request shape
+            if e.status_code not in (404, 405, 415, 422):
+                raise
+            logger.warning(f"ML server does not accept batched requests ({e.status_code}), batching disabled")
+            self.batch_supported = False
+            return await asyncio.gather(
+                *[_predict_single(payload) for payload in payloads],
+                return_exceptions=True
+            )
+        
+        self.stats["batches"] += 1
+        self.stats["batched_requests"] += len(payloads)
+        return results
     
-    # Document field with text
-    if "document" in payload and isinstance(payload["document"], dict):
-        doc = payload["document"]
-        if "text" in doc:
-            return str(doc["text"])
-        if "content" in doc:
-            return str(doc["content"])
+    def get_stats(self) -> Dict[str, Any]:
+        """Batching statistics"""
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "avg_batch_size": round(self.stats["batched_requests"] / batches, 2) if batches else 0.0,
+            "batch_supported": self.batch_supported,
+            "max_size": self.max_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
+
+def get_ml_client_stats() -> Dict[str, Any]:
+    """Circuit breaker, latency, hedging and batching statistics for this process"""
+    return {
+        "endpoints": ml_balancer.get_stats(),
+        "circuit_breaker": ml_breaker.get_stats(),
+        "latency": ml_latency.get_stats(),
+        "hedging": {"enabled": ML_HEDGE_ENABLED, **hedge_stats},
+        "compression": {"mode": ML_REQUEST_COMPRESSION, **compression_stats},
+        "stream_parsing": ML_STREAM_PARSING and ijson is not None,
+        "batching": _batcher.get_stats() if _batcher else {"enabled": ML_BATCHING_ENABLED},
+        "cache": _prediction_cache.get_stats() if _prediction_cache else {"enabled": False},
+        "retry": {
+            "attempts": ML_RETRY_ATTEMPTS,
+            "min_wait": ML_RETRY_MIN_WAIT,
+            "max_wait": ML_RETRY_MAX_WAIT
+        }
+    }
+
+_batcher: Optional[PredictionBatcher] = None
+_batcher_loop: Optional[asyncio.AbstractEventLoop] = None
+
+def get_prediction_batcher() -> PredictionBatcher:
+    """Get the batcher for the running event loop"""
+    global _batcher, _batcher_loop
     
-    # Try to extract from nested structures
-    for key, value in payload.items():
-        if isinstance(value, str) and len(value) > 10:  # Likely text content
-            return value
+    loop = asyncio.get_running_loop()
+    if _batcher is None or _batcher_loop is not loop:
+        _batcher = PredictionBatcher()
+        _batcher_loop = loop
     
-    # Fallback: serialize entire payload as text
-    return json.dumps(payload, indent=2)
+    return _batcher
+
+def _extract_text_from_payload(payload: Dict[str, Any]) -> str:
+    """Extract text content from various payload formats (bounded, see app.utils.text_extraction)"""
+    return payload_to_text(payload)
+
+def _annotate_source_paths(result: Dict[str, Any], extracted: ExtractedText):
+    """Record the JSON path each entity was found in"""
+    for entity in result.get("entities", []):
+        path = extracted.path_at(entity.get("start_pos", 0))
+        if path:
+            entity["metadata"] = {**(entity.get("metadata") or {}), "source_path": path}
+
+_PREDICTION_HEADER_FIELDS = ("doc_type", "event_type", "confidence")
+
+def _empty_prediction() -> Dict[str, Any]:
+    return {"doc_type": "unknown", "event_type": "unknown", "confidence": 0.0, "entities": []}
+
+def _set_header_field(validated: Dict[str, Any], key: str, value: Any):
+    """Store one top-level prediction field, normalised"""
+    if key == "confidence":
+        confidence = float(value or 0.0)
+        validated["confidence"] = confidence if 0.0 <= confidence <= 1.0 else 0.0
+    elif value is not None:
+        validated[key] = value
+
+def _validate_entity(entity: Any) -> Optional[Dict[str, Any]]:
+    """Validate and normalize one entity (None for non-objects)"""
+    if not isinstance(entity, dict):
+        return None
+    
+    validated_entity = {
+        "type": entity.get("type", "unknown"),
+        "text": entity.get("text", ""),
+        "confidence": float(entity.get("confidence", 0.0)),
+        "start_pos": int(entity.get("start_pos", 0)),
+        "end_pos": int(entity.get("end_pos", 0))
+    }
+    
+    # Validate entity confidence
+    if not 0.0 <= validated_entity["confidence"] <= 1.0:
+        validated_entity["confidence"] = 0.0
+    
+    return validated_entity
 
 def _validate_prediction_response(response: Dict[str, Any]) -> Dict[str, Any]:
     """Validate and normalize prediction response"""
     
     # Ensure required fields exist
-    validated = {
-        "doc_type": response.get("doc_type", "unknown"),
-        "event_type": response.get("event_type", "unknown"),
-        "confidence": float(response.get("confidence", 0.0)),
-        "entities": []
-    }
-    
-    # Validate confidence score
-    if not 0.0 <= validated["confidence"] <= 1.0:
-        validated["confidence"] = 0.0
+    validated = _empty_prediction()
+    for key in _PREDICTION_HEADER_FIELDS:
+        if key in response:
+            _set_header_field(validated, key, response[key])
     
     # Process entities
     entities = response.get("entities", [])
     if isinstance(entities, list):
         for entity in entities:
-            if isinstance(entity, dict):
-                validated_entity = {
-                    "type": entity.get("type", "unknown"),
-                    "text": entity.get("text", ""),
-                    "confidence": float(entity.get("confidence", 0.0)),
-                    "start_pos": int(entity.get("start_pos", 0)),
-                    "end_pos": int(entity.get("end_pos", 0))
-                }
-                
-                # Validate entity confidence
-                if not 0.0 <= validated_entity["confidence"] <= 1.0:
-                    validated_entity["confidence"] = 0.0
-                
+            validated_entity = _validate_entity(entity)
+            if validated_entity is not None:
                 validated["entities"].append(validated_entity)
     
     return validated
 
-async def health_check() -> bool:
-    """Check if ML server is available"""
+async def health_check(base_url: Optional[str] = None) -> bool:
+    """Check if an ML server is available (any configured endpoint when base_url is omitted)"""
+    if base_url is None:
+        results = await asyncio.gather(*[health_check(url) for url in ML_SERVER_URLS])
+        return any(results)
+    
     try:
-        async with httpx.AsyncClient(timeout=5) as client:
-            response = await client.get(f"{ML_SERVER_URL}/health")
-            return response.status_code == 200
+        response = await get_ml_client().get(f"{base_url.rstrip('/')}/health", timeout=5)
+        return response.status_code == 200
     except Exception:
         return False
 
 async def get_server_info() -> Optional[Dict[str, Any]]:
     """Get information about the ML server"""
     try:
-        headers = {
-            "Authorization": f"Bearer {ML_API_KEY}",
-            "User-Agent": "NeuraLex-Platform/1.0"
-        }
+        response = await get_ml_client().get(f"{ml_balancer.pick().url}/info", timeout=10)
+        
+        if response.status_code == 200:
+            return response.json()
         
-        async with httpx.AsyncClient(timeout=10) as client:
-            response = await client.get(
-                f"{ML_SERVER_URL}/info",
-                headers=headers
-            )
-            
-            if response.status_code == 200:
-                return response.json()
-            
     except Exception as e:
         logger.error(f"Failed to get server info: {e}")
     
@@ -0,0 +1,158 @@
+"""
+Prediction cache for the ML server
+
+Two tiers, keyed by sha256(document text) and the model version:
+  – in-process LRU (PREDICTION_CACHE_SIZE entries)
+  – Redis with TTL (PREDICTION_CACHE_REDIS_TTL), shared by all workers
+
+The model version comes from the server's /info endpoint and is re-checked
+every PREDICTION_CACHE_VERSION_CHECK seconds. A new version clears the LRU;
+Redis entries of the old version are no longer addressed and expire.
+Callers pass the version they looked up with to set(), so a prediction made
+by the old model is dropped instead of being stored under the new version.
+"""
+
+import os
+import copy
+import json
+import time
+import hashlib
+import logging
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+from app.utils.cache import LRUCache
+from app.worker.queue_backend import REDIS_URL
+
+logger = logging.getLogger(__name__)
+
+PREDICTION_CACHE_ENABLED = os.getenv("PREDICTION_CACHE_ENABLED", "true").lower() == "true"
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "1000"))
+PREDICTION_CACHE_REDIS_TTL = int(os.getenv("PREDICTION_CACHE_REDIS_TTL", "86400"))
+PREDICTION_CACHE_VERSION_CHECK = float(os.getenv("PREDICTION_CACHE_VERSION_CHECK", "60"))
+# The Redis tier is on by default wherever Redis already carries the job queue
+PREDICTION_CACHE_REDIS = os.getenv(
+    "PREDICTION_CACHE_REDIS",
+    "true" if os.getenv("QUEUE_BACKEND", "redis") == "redis" else "false"
+).lower() == "true"
+
+KEY_PREFIX = "ml_cache"
+
+
+class PredictionCache:
+    """Model-version-aware two-tier cache for prediction results"""
+
+    def __init__(
+        self,
+        server_info: Callable[[], Awaitable[Optional[Dict[str, Any]]]],
+        max_size: int = PREDICTION_CACHE_SIZE,
+        redis_client=None,
+        redis_ttl: int = PREDICTION_CACHE_REDIS_TTL
+    ):
+        self._server_info = server_info
+        self.lru = LRUCache(max_size)
+        self.redis = redis_client
+        self.redis_ttl = redis_ttl
+        self.model_version = "unknown"
+        self._version_checked_at = 0.0
+        self.stats = {"redis_hits": 0, "redis_errors": 0, "invalidations": 0}
+
+    async def get_model_version(self) -> str:
+        """Current model version, refreshed from /info at most once per check interval"""
+        now = time.monotonic()
+        if now - self._version_checked_at < PREDICTION_CACHE_VERSION_CHECK:
+            return self.model_version
+
+        # Mark first so concurrent lookups keep using the known version
+        self._version_checked_at = now
+        info = await self._server_info()
+        version = str((info or {}).get("model_version") or (info or {}).get("version") or "")
+
+        if version and version != self.model_version:
+            if self.model_version != "unknown":
+                logger.info(f"ML model changed {self.model_version} -> {version}, clearing prediction cache")
+                self.stats["invalidations"] += 1
+            self.lru.clear()
+            self.model_version = version
+
+        return self.model_version
+
+    def _key(self, text: str, model_version: str) -> str:
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        return f"{KEY_PREFIX}:{model_version}:{digest}"
+
+    async def get(self, text: str, model_version: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Cached prediction for this text under model_version (default: the current model), or None"""
+        key = self._key(text, model_version or await self.get_model_version())
+
+        result = self.lru.get(key)
+        if result is not None:
+            return copy.deepcopy(result)
+
+        if self.redis is None:
+            return None
+
+        try:
+            cached = await self.redis.get(key)
+        except Exception as e:
+            self.stats["redis_errors"] += 1
+            logger.warning(f"Prediction cache Redis lookup failed: {e}")
+            return None
+
+        if cached is None:
+            return None
+
+        result = json.loads(cached)
+        self.lru.set(key, result)
+        self.stats["redis_hits"] += 1
+        return copy.deepcopy(result)
+
+    async def set(self, text: str, prediction: Dict[str, Any], model_version: str):
+        """Store a prediction made under model_version in both tiers; dropped if the model changed since"""
+        if model_version != self.model_version:
+            logger.debug(f"Not caching prediction of model {model_version}, current model is {self.model_version}")
+            return
+
+        key = self._key(text, model_version)
+        self.lru.set(key, copy.deepcopy(prediction))
+
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.set(key, json.dumps(prediction), ex=self.redis_ttl)
+        except Exception as e:
+            self.stats["redis_errors"] += 1
+            logger.warning(f"Prediction cache Redis write failed: {e}")
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.close()
+            self.redis = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit rates per tier; misses are lookups that reached the ML server"""
+        lru_stats = self.lru.get_stats()
+        lookups = lru_stats["hits"] + lru_stats["misses"]
+        hits = lru_stats["hits"] + self.stats["redis_hits"]
+        return {
+            "enabled": True,
+            "model_version": self.model_version,
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "lru": lru_stats,
+            "redis": {"enabled": self.redis is not None, "ttl": self.redis_ttl, **self.stats}
+        }
+
+
+def create_prediction_cache(server_info: Callable[[], Awaitable[Optional[Dict[str, Any]]]]) -> Optional[PredictionCache]:
+    """Build the cache from configuration, None when disabled"""
+    if not PREDICTION_CACHE_ENABLED:
+        return None
+
+    redis_client = None
+    if PREDICTION_CACHE_REDIS:
+        import redis.asyncio as redis
+        redis_client = redis.from_url(REDIS_URL)
+
+    return PredictionCache(server_info, redis_client=redis_client)
@@ -0,0 +1,213 @@
+"""
+Resilience helpers for calls to remote model servers
+
+  – CircuitBreaker:  closed -> open (error rate / slow calls) -> half-open probes -> closed
+  – LatencyTracker:  rolling latency window for percentiles (p95 hedge delay)
+  – hedged():        start a second attempt once the first is slower than the delay
+"""
+
+import os
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Any, Optional, Callable, Awaitable
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker configuration
+BREAKER_WINDOW = int(os.getenv("ML_BREAKER_WINDOW", "20"))
+BREAKER_MIN_CALLS = int(os.getenv("ML_BREAKER_MIN_CALLS", "10"))
+BREAKER_ERROR_RATE = float(os.getenv("ML_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_SLOW_CALL_SECONDS = float(os.getenv("ML_BREAKER_SLOW_CALL_SECONDS", "10"))
+BREAKER_SLOW_CALL_RATE = float(os.getenv("ML_BREAKER_SLOW_CALL_RATE", "0.8"))
+BREAKER_OPEN_SECONDS = float(os.getenv("ML_BREAKER_OPEN_SECONDS", "30"))
+BREAKER_HALF_OPEN_CALLS = int(os.getenv("ML_BREAKER_HALF_OPEN_CALLS", "1"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+class CircuitOpenError(Exception):
+    """Raised without calling the server while the circuit is open"""
+    pass
+
+class CircuitBreaker:
+    """
+    Count-based circuit breaker.
+
+    Opens when, over the last `window` calls (and at least `min_calls`),
+    the failure rate or the slow-call rate reaches its threshold. After
+    `open_seconds` up to `half_open_calls` probes are let through; if they
+    all succeed the circuit closes, any failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: int = BREAKER_WINDOW,
+        min_calls: int = BREAKER_MIN_CALLS,
+        error_rate: float = BREAKER_ERROR_RATE,
+        slow_call_seconds: float = BREAKER_SLOW_CALL_SECONDS,
+        slow_call_rate: float = BREAKER_SLOW_CALL_RATE,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+        half_open_calls: int = BREAKER_HALF_OPEN_CALLS
+    ):
+        self.name = name
+        self.min_calls = min_calls
+        self.error_rate = error_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._calls: deque = deque(maxlen=window)  # (failed, slow)
+        self._probes_in_flight = 0
+        self._probe_successes = 0
+        self.stats = {"rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        """Current state; an open circuit turns half-open once its timeout passed"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._probes_in_flight = 0
+            self._probe_successes = 0
+            logger.info(f"Circuit {self.name} half-open, probing")
+        return self._state
+
+    def before_call(self):
+        """Reserve a call slot or fail fast"""
+        state = self.state
+
+        if state == OPEN or (state == HALF_OPEN and self._probes_in_flight >= self.half_open_calls):
+            self.stats["rejected"] += 1
+            raise CircuitOpenError(f"Circuit {self.name} is open")
+
+        if state == HALF_OPEN:
+            self._probes_in_flight += 1
+
+    def record_success(self, duration: float):
+        """Record a completed call"""
+        slow = duration >= self.slow_call_seconds
+
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+            if slow:
+                self._open()
+                return
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._close()
+            return
+
+        self._calls.append((False, slow))
+        self._evaluate()
+
+    def release(self):
+        """Give back a call slot without an outcome (caller was cancelled)"""
+        if self._state == HALF_OPEN:
+            self._probes_in_flight = max(self._probes_in_flight - 1, 0)
+
+    def record_failure(self, duration: float = 0.0):
+        """Record a failed call"""
+        if self._state == HALF_OPEN:
+            self._open()
+            return
+
+        self._calls.append((True, duration >= self.slow_call_seconds))
+        self._evaluate()
+
+    def _evaluate(self):
+        if self._state != CLOSED or len(self._calls) < self.min_calls:
+            return
+
+        failures = sum(1 for failed, _ in self._calls if failed)
+        slow_calls = sum(1 for _, slow in self._calls if slow)
+
+        if failures / len(self._calls) >= self.error_rate or slow_calls / len(self._calls) >= self.slow_call_rate:
+            self._open()
+
+    def _open(self):
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._calls.clear()
+        self.stats["opened"] += 1
+        logger.warning(f"Circuit {self.name} opened for {self.open_seconds}s")
+
+    def _close(self):
+        self._state = CLOSED
+        self._calls.clear()
+        logger.info(f"Circuit {self.name} closed")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Breaker state and counters"""
+        calls = len(self._calls)
+        return {
+            "state": self.state,
+            "window_calls": calls,
+            "error_rate": round(sum(1 for failed, _ in self._calls if failed) / calls, 3) if calls else 0.0,
+            "slow_call_rate": round(sum(1 for _, slow in self._calls if slow) / calls, 3) if calls else 0.0,
+            **self.stats
+        }
+
+class LatencyTracker:
+    """Rolling window of call latencies"""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque = deque(maxlen=window)
+
+    def observe(self, duration: float):
+        self._samples.append(duration)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency percentile (q in 0..1), None without samples"""
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def get_stats(self) -> Dict[str, Any]:
+        p50 = self.percentile(0.5)
+        p95 = self.percentile(0.95)
+        return {
+            "samples": len(self._samples),
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None
+        }
+
+async def hedged(call: Callable[[], Awaitable[Any]], delay: float, stats: Optional[Dict[str, int]] = None) -> Any:
+    """
+    Run call(); if it has not finished after `delay` seconds, start a second
+    attempt and return whichever succeeds first. Only for idempotent calls.
+    """
+    first = asyncio.ensure_future(call())
+    pending = {first}
+
+    try:
+        done, pending = await asyncio.wait(pending, timeout=delay)
+        if done:
+            return first.result()
+
+        if stats is not None:
+            stats["hedges_sent"] = stats.get("hedges_sent", 0) + 1
+        second = asyncio.ensure_future(call())
+        pending.add(second)
+
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    if task is second and stats is not None:
+                        stats["hedges_won"] = stats.get("hedges_won", 0) + 1
+                    return task.result()
+                if not pending:
+                    raise task.exception()
+    finally:
+        for task in pending:
+            task.cancel()
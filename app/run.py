@@ -0,0 +1,40 @@
+"""
+Entry points for the deployment modes
+
+  python -m app.run api        -> HTTP API only (scale API pods on request load)
+  python -m app.run worker     -> job workers only, health on WORKER_HEALTH_PORT
+  python -m app.run combined   -> HTTP API plus embedded pool of WORKER_CONCURRENCY workers
+
+HOST / PORT configure the HTTP listener for api and combined mode.
+"""
+
+import os
+import sys
+import asyncio
+
+RUN_MODES = ("api", "worker", "combined")
+
+
+def run(mode: str):
+    """Start the process in the given deployment mode"""
+    if mode not in RUN_MODES:
+        raise SystemExit(f"Unknown run mode '{mode}', expected one of: {', '.join(RUN_MODES)}")
+
+    # app.main reads RUN_MODE at import time
+    os.environ["RUN_MODE"] = mode
+
+    if mode == "worker":
+        from app.worker.background_worker import main as worker_main
+        asyncio.run(worker_main())
+        return
+
+    import uvicorn
+    uvicorn.run(
+        "app.main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "5000"))
+    )
+
+
+if __name__ == "__main__":
+    run(sys.argv[1] if len(sys.argv) > 1 else os.getenv("RUN_MODE", "combined"))
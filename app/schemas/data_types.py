@@ -37,6 +37,8 @@ class HealthResponse(BaseModel):
     status: str = Field(description="Service status")
     timestamp: datetime = Field(description="Check timestamp")
     version: Optional[str] = Field("1.0.0", description="Service version")
+    mode: Optional[str] = Field(None, description="Deployment mode (api, worker, combined)")
+    workers: Optional[int] = Field(None, description="Number of running embedded workers")
 
 class EntityData(BaseModel):
     """Schema for extracted entities"""
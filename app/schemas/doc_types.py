@@ -7,6 +7,8 @@ from enum import Enum
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 
+from app.schemas.keyword_scoring import score_keywords
+
 class DocumentType(str, Enum):
     """Enumeration of supported document types"""
     EMAIL = "email"
@@ -161,47 +163,65 @@ def get_types_by_category(category: DocumentCategory) -> List[DocumentType]:
         if info.category == category.value
     ]
 
+# Weighted keywords per document type (English and German)
+DOC_TYPE_KEYWORDS: Dict[DocumentType, Dict[str, float]] = {
+    DocumentType.INVOICE: {
+        "invoice": 2.0, "rechnung": 2.0, "amount due": 2.0, "zahlungsziel": 1.5, "bill": 1.0,
+        "due date": 1.0, "fällig": 1.0, "vat": 1.0, "mwst": 1.0, "ust-id": 1.0,
+        "net amount": 0.5, "nettobetrag": 0.5, "iban": 0.5
+    },
+    DocumentType.CONTRACT: {
+        "contract": 2.0, "vertrag": 2.0, "agreement": 2.0, "vereinbarung": 1.5,
+        "terms and conditions": 1.5, "parties": 1.0, "laufzeit": 1.0, "kündigung": 1.0,
+        "hereby": 0.5, "signature": 0.5, "unterschrift": 0.5
+    },
+    DocumentType.EMAIL: {
+        "subject:": 1.5, "betreff:": 1.0, "from:": 1.0, "to:": 1.0, "von:": 0.5, "an:": 0.5,
+        "cc:": 0.5, "email": 1.0, "e-mail": 1.0
+    },
+    DocumentType.MEMO: {"memorandum": 2.5, "memo": 2.0, "aktennotiz": 2.5, "notiz": 1.0},
+    DocumentType.RECEIPT: {
+        "receipt": 2.0, "quittung": 2.0, "kassenbon": 2.5, "kassenbeleg": 2.5, "beleg": 1.0,
+        "paid": 1.0, "bezahlt": 1.0, "transaction": 1.0, "kartenzahlung": 1.5, "cash": 1.0
+    },
+    DocumentType.LETTER: {
+        "sehr geehrte": 1.5, "mit freundlichen grüßen": 1.5, "dear": 1.0,
+        "sincerely": 1.0, "yours faithfully": 1.0, "kind regards": 0.5
+    },
+    DocumentType.FORM: {
+        "formular": 2.0, "application form": 2.0, "antrag": 1.5, "bitte ausfüllen": 1.0,
+        "please fill": 1.0, "form": 0.5
+    },
+    DocumentType.REPORT: {
+        "report": 1.5, "bericht": 1.5, "findings": 1.0, "quarterly": 1.0, "quartal": 1.0,
+        "summary": 0.5, "zusammenfassung": 0.5
+    },
+    DocumentType.STATEMENT: {
+        "kontoauszug": 2.5, "account statement": 2.0, "statement": 1.5,
+        "opening balance": 1.5, "kontostand": 1.5
+    },
+    DocumentType.PROPOSAL: {"proposal": 2.0, "angebot": 1.5, "quotation": 1.5, "offer": 1.0}
+}
+
 def classify_document_type(features: Dict[str, Any]) -> DocumentClassification:
     """
-    Simple rule-based document type classification
-    This would be replaced with ML model predictions in production
+    Rule-based document type classification from weighted keyword matches.
+    The confidence grows with the amount of matching evidence and shrinks
+    when keywords of other types match as well (see keyword_scoring).
     """
-    text = features.get("text", "").lower()
+    scores = score_keywords(features.get("text", ""), DOC_TYPE_KEYWORDS)
     
-    # Simple heuristic classification
-    if "invoice" in text or "bill" in text or "amount due" in text:
-        return DocumentClassification(
-            doc_type=DocumentType.INVOICE,
-            category=DocumentCategory.FINANCIAL,
-            confidence=0.85
-        )
-    elif "contract" in text or "agreement" in text or "terms and conditions" in text:
-        return DocumentClassification(
-            doc_type=DocumentType.CONTRACT,
-            category=DocumentCategory.LEGAL,
-            confidence=0.80
-        )
-    elif "from:" in text and "to:" in text and "subject:" in text:
-        return DocumentClassification(
-            doc_type=DocumentType.EMAIL,
-            category=DocumentCategory.COMMUNICATION,
-            confidence=0.90
-        )
-    elif "memorandum" in text or "memo" in text:
-        return DocumentClassification(
-            doc_type=DocumentType.MEMO,
-            category=DocumentCategory.COMMUNICATION,
-            confidence=0.75
-        )
-    elif "receipt" in text or "paid" in text or "transaction" in text:
-        return DocumentClassification(
-            doc_type=DocumentType.RECEIPT,
-            category=DocumentCategory.FINANCIAL,
-            confidence=0.80
-        )
-    else:
+    if scores.best is None:
         return DocumentClassification(
             doc_type=DocumentType.UNKNOWN,
             category=DocumentCategory.OTHER,
             confidence=0.5
         )
+    
+    return DocumentClassification(
+        doc_type=scores.best,
+        category=DocumentCategory(get_document_type_info(scores.best).category),
+        confidence=scores.confidence(),
+        alternative_types=scores.alternatives(),
+        features={"keywords": scores.matched[scores.best]}
+    )
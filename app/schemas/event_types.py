@@ -7,6 +7,8 @@ from enum import Enum
 from typing import List, Optional, Dict, Any
 from pydantic import BaseModel, Field
 
+from app.schemas.keyword_scoring import score_keywords
+
 class EventType(str, Enum):
     """Enumeration of supported event types"""
     GENERAL = "general"
@@ -212,95 +214,61 @@ def get_types_by_category(category: EventCategory) -> List[EventType]:
         if info.category == category.value
     ]
 
+# Weighted keywords per event type (English and German)
+EVENT_TYPE_KEYWORDS: Dict[EventType, Dict[str, float]] = {
+    EventType.BILLING: {
+        "invoice": 1.5, "rechnung": 1.5, "payment": 1.5, "zahlung": 1.5, "amount due": 1.5,
+        "bill": 1.0, "überweisung": 1.0
+    },
+    EventType.LEGAL: {
+        "contract": 1.5, "vertrag": 1.5, "legal": 1.5, "court": 1.5, "gericht": 1.5,
+        "rechtlich": 1.0, "compliance": 1.0
+    },
+    EventType.COMMUNICATION: {
+        "email": 1.0, "e-mail": 1.0, "message": 1.0, "nachricht": 1.0, "communication": 1.0
+    },
+    EventType.TRANSACTION: {
+        "transaction": 1.5, "transaktion": 1.5, "purchase": 1.0, "sale": 1.0, "verkauf": 1.0
+    },
+    EventType.SUPPORT: {
+        "support": 1.5, "störung": 1.5, "help": 1.0, "hilfe": 1.0, "issue": 1.0, "problem": 1.0
+    },
+    EventType.APPROVAL: {
+        "approval": 1.5, "approve": 1.5, "authorize": 1.5, "genehmigung": 1.5, "freigabe": 1.5
+    }
+}
+
+URGENCY_KEYWORDS = ["urgent", "asap", "immediately", "critical", "emergency", "dringend", "sofort"]
+
+def _event_classification(event_type: EventType, confidence: float, urgency_score: float,
+                          keywords: List[str]) -> EventClassification:
+    info = get_event_type_info(event_type)
+    return EventClassification(
+        event_type=event_type,
+        priority=EventPriority(info.priority),
+        category=EventCategory(info.category),
+        confidence=confidence,
+        urgency_score=urgency_score,
+        keywords=keywords
+    )
+
 def classify_event_type(features: Dict[str, Any]) -> EventClassification:
     """
-    Simple rule-based event type classification
-    This would be replaced with ML model predictions in production
+    Rule-based event type classification from weighted keyword matches.
+    Urgency words only decide the type (URGENT) when nothing else matched.
     """
-    text = features.get("text", "").lower()
-    urgency_keywords = ["urgent", "asap", "immediately", "critical", "emergency"]
+    text = features.get("text", "")
+    urgency = score_keywords(text, {EventType.URGENT: {keyword: 1.0 for keyword in URGENCY_KEYWORDS}})
+    keywords = urgency.matched.get(EventType.URGENT, [])
+    urgency_score = min(len(keywords) * 0.2, 1.0)
     
-    urgency_score = 0.0
-    keywords = []
-    
-    # Calculate urgency score
-    for keyword in urgency_keywords:
-        if keyword in text:
-            urgency_score += 0.2
-            keywords.append(keyword)
+    scores = score_keywords(text, EVENT_TYPE_KEYWORDS)
+    if scores.best is not None:
+        return _event_classification(
+            scores.best, scores.confidence(), urgency_score, keywords + scores.matched[scores.best]
+        )
     
-    urgency_score = min(urgency_score, 1.0)
+    if urgency_score > 0.4:
+        return _event_classification(EventType.URGENT, urgency.confidence(), urgency_score, keywords)
     
-    # Classification logic
-    if "invoice" in text or "payment" in text or "bill" in text:
-        return EventClassification(
-            event_type=EventType.BILLING,
-            priority=EventPriority.HIGH,
-            category=EventCategory.FINANCIAL,
-            confidence=0.85,
-            urgency_score=urgency_score,
-            keywords=keywords + ["billing", "payment"]
-        )
-    elif "contract" in text or "legal" in text or "compliance" in text:
-        return EventClassification(
-            event_type=EventType.LEGAL,
-            priority=EventPriority.HIGH,
-            category=EventCategory.REGULATORY,
-            confidence=0.80,
-            urgency_score=urgency_score,
-            keywords=keywords + ["legal", "compliance"]
-        )
-    elif "email" in text or "message" in text or "communication" in text:
-        return EventClassification(
-            event_type=EventType.COMMUNICATION,
-            priority=EventPriority.MEDIUM,
-            category=EventCategory.BUSINESS,
-            confidence=0.75,
-            urgency_score=urgency_score,
-            keywords=keywords + ["communication"]
-        )
-    elif "transaction" in text or "purchase" in text or "sale" in text:
-        return EventClassification(
-            event_type=EventType.TRANSACTION,
-            priority=EventPriority.HIGH,
-            category=EventCategory.FINANCIAL,
-            confidence=0.80,
-            urgency_score=urgency_score,
-            keywords=keywords + ["transaction"]
-        )
-    elif "support" in text or "help" in text or "issue" in text:
-        return EventClassification(
-            event_type=EventType.SUPPORT,
-            priority=EventPriority.MEDIUM,
-            category=EventCategory.CUSTOMER,
-            confidence=0.75,
-            urgency_score=urgency_score,
-            keywords=keywords + ["support", "help"]
-        )
-    elif "approval" in text or "authorize" in text or "approve" in text:
-        return EventClassification(
-            event_type=EventType.APPROVAL,
-            priority=EventPriority.HIGH,
-            category=EventCategory.ADMINISTRATIVE,
-            confidence=0.80,
-            urgency_score=urgency_score,
-            keywords=keywords + ["approval"]
-        )
-    elif urgency_score > 0.4:
-        return EventClassification(
-            event_type=EventType.URGENT,
-            priority=EventPriority.CRITICAL,
-            category=EventCategory.OPERATIONAL,
-            confidence=0.70,
-            urgency_score=urgency_score,
-            keywords=keywords
-        )
-    else:
-        return EventClassification(
-            event_type=EventType.GENERAL,
-            priority=EventPriority.MEDIUM,
-            category=EventCategory.OTHER,
-            confidence=0.60,
-            urgency_score=urgency_score,
-            keywords=keywords
-        )
+    return _event_classification(EventType.GENERAL, 0.6, urgency_score, keywords)
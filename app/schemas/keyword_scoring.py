@@ -0,0 +1,75 @@
+"""
+Weighted keyword scoring for the rule-based classifiers
+
+Every label has a table of weighted keywords. A keyword counts once when it
+starts a word in the text, so "rechnung" also matches "Rechnungsnummer".
+The confidence of a label is its share of all matched weight, damped so a
+single weak hit does not look certain:
+
+    confidence = score(label) / (sum of all scores + KEYWORD_SMOOTHING)
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+KEYWORD_SMOOTHING = float(os.getenv("KEYWORD_SMOOTHING", "1.0"))
+
+
+@lru_cache(maxsize=None)
+def _keyword_pattern(keyword: str) -> re.Pattern:
+    return re.compile(r"(?<!\w)" + re.escape(keyword))
+
+
+@dataclass
+class KeywordScores:
+    """Matched weight per label, best label first"""
+    ranked: List[Tuple[Any, float]] = field(default_factory=list)
+    matched: Dict[Any, List[str]] = field(default_factory=dict)
+
+    @property
+    def total(self) -> float:
+        return sum(score for _, score in self.ranked)
+
+    @property
+    def best(self) -> Optional[Any]:
+        return self.ranked[0][0] if self.ranked else None
+
+    def confidence(self, label: Any = None) -> float:
+        """Confidence of label (default: the best label)"""
+        label = self.best if label is None else label
+        score = dict(self.ranked).get(label, 0.0)
+        return round(score / (self.total + KEYWORD_SMOOTHING), 4)
+
+    def alternatives(self, limit: int = 3) -> List[Dict[str, Any]]:
+        """Runner-up labels with their confidence"""
+        return [
+            {"type": getattr(label, "value", label), "confidence": self.confidence(label)}
+            for label, _ in self.ranked[1:limit + 1]
+        ]
+
+
+def score_keywords(text: str, table: Dict[Any, Dict[str, float]]) -> KeywordScores:
+    """
+    Score every label of table against text
+
+    Args:
+        text: Document text (matched case-insensitively)
+        table: label -> {keyword: weight}
+
+    Returns:
+        KeywordScores with labels that matched at least one keyword
+    """
+    text = text.lower()
+    scores = KeywordScores()
+
+    for label, keywords in table.items():
+        hits = [keyword for keyword in keywords if _keyword_pattern(keyword).search(text)]
+        if hits:
+            scores.ranked.append((label, sum(keywords[keyword] for keyword in hits)))
+            scores.matched[label] = hits
+
+    scores.ranked.sort(key=lambda item: item[1], reverse=True)
+    return scores
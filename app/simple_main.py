@@ -7,14 +7,16 @@ import logging
 from fastapi import FastAPI, Request, Form, BackgroundTasks, Depends, File, UploadFile
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
 import uuid
 import json
 from datetime import datetime
 from app.integrations.google_vision_api import vision_client
-from app.ml_client.ollama_client import ollama_analyzer
+from app.ml_client.ollama_client import ollama_analyzer, OLLAMA_ANALYSIS_MODE
+from app.ml_client.preclassifier import get_preclassifier_stats
+from app.ml_client.cascade import get_cascade_stats
 from app.admin.api import router as admin_router
 
 # Configure logging
@@ -37,6 +39,9 @@ templates = Jinja2Templates(directory="templates")
 # Include admin API routes
 app.include_router(admin_router)
 
+# Server-Sent Events: kein Caching, kein Puffern durch Reverse-Proxies (nginx)
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
 # In-memory storage for demo purposes
 documents = {}
 jobs = {}
@@ -59,8 +64,15 @@ class IngestResponse(BaseModel):
 async def startup_event():
     """Initialize application on startup"""
     logger.info("NeuraLex Platform starting up...")
+    # Ollama wird im Hintergrund geprüft, der Start wartet nicht auf den Server
+    ollama_analyzer.start_probing()
     logger.info("Application initialized successfully")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop the Ollama availability probe and close its connection pool on shutdown"""
+    await ollama_analyzer.close()
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Serve the main dashboard page"""
@@ -286,21 +298,7 @@ async def analyze_document_with_ollama(request: Request):
             return {"error": result["error"], "ollama_available": ollama_analyzer.is_available}
         
         # Speichere Ergebnis lokal
-        job_id = result["document_id"]
-        documents[job_id] = {
-            "id": job_id,
-            "status": result["status"],
-            "created_at": result["processed_at"],
-            "updated_at": result["processed_at"],
-            "source": "ollama_analysis",
-            "doc_type": result["doc_type"],
-            "event_type": result["event_type"],
-            "confidence": result["confidence"],
-            "extracted_data": result["extracted_data"],
-            "original_text": result.get("original_text", ""),
-            "processor": result["processor"],
-            "model": result["model"]
-        }
+        _store_ollama_result(result)
         
         return result
         
@@ -308,6 +306,25 @@ async def analyze_document_with_ollama(request: Request):
         logger.error(f"Fehler bei Ollama-Analyse: {e}")
         return {"error": str(e), "ollama_available": ollama_analyzer.is_available}
 
+@app.post("/api/ollama/analyze/stream")
+async def analyze_document_with_ollama_stream(request: Request):
+    """Wie /api/ollama/analyze, aber als Server-Sent Events mit Zwischenergebnissen"""
+    ocr_data = await request.json()
+    
+    async def events():
+        try:
+            async for kind, data in ollama_analyzer.analyze_document_stream(ocr_data):
+                if kind == "result":
+                    _store_ollama_result(data)
+                elif kind == "error":
+                    data = {"error": data["error"], "ollama_available": ollama_analyzer.is_available}
+                yield _sse(kind, data)
+        except Exception as e:
+            logger.error(f"Fehler bei Ollama-Analyse (Stream): {e}")
+            yield _sse("error", {"error": str(e), "ollama_available": ollama_analyzer.is_available})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.post("/api/process/complete")
 async def complete_document_processing(file: UploadFile = File(...)):
     """Vollständige Dokumentverarbeitung: OCR + Ollama-Analyse"""
@@ -325,41 +342,97 @@ async def complete_document_processing(file: UploadFile = File(...)):
         if "error" in analysis_result:
             return {"error": f"Analyse fehlgeschlagen: {analysis_result['error']}", "stage": "analysis"}
         
-        # Kombiniere OCR + Analyse Ergebnisse
-        final_result = {
-            "document_id": analysis_result["document_id"],
-            "status": "completed",
-            "filename": file.filename,
-            "processing_stages": {
-                "ocr": {
-                    "completed": True,
-                    "source": "google_vision_api",
-                    "raw_text": ocr_result.get("text", "")
-                },
-                "analysis": {
-                    "completed": True,
-                    "source": "ollama",
-                    "model": analysis_result["model"]
-                }
-            },
-            "doc_type": analysis_result["doc_type"],
-            "event_type": analysis_result["event_type"],
-            "confidence": analysis_result["confidence"],
-            "extracted_data": analysis_result["extracted_data"],
-            "created_at": analysis_result["processed_at"],
-            "updated_at": analysis_result["processed_at"]
-        }
-        
-        # Speichere vollständiges Ergebnis
-        job_id = final_result["document_id"]
-        documents[job_id] = final_result
-        
-        return final_result
+        # Kombiniere OCR + Analyse Ergebnisse und speichere sie
+        return _store_complete_result(file.filename, ocr_result, analysis_result)
         
     except Exception as e:
         logger.error(f"Fehler bei vollständiger Dokumentverarbeitung: {e}")
         return {"error": str(e), "stage": "unknown"}
 
+@app.post("/api/process/complete/stream")
+async def complete_document_processing_stream(file: UploadFile = File(...)):
+    """
+    Vollständige Dokumentverarbeitung als Server-Sent Events:
+    ocr, doc_type, event_type, field (pro extrahiertem Feld), result bzw. error
+    """
+    image_data = await file.read()
+    filename = file.filename
+    content_type = file.content_type or "image/png"
+    
+    async def events():
+        try:
+            ocr_result = await vision_client.perform_ocr(image_data, content_type)
+            if "error" in ocr_result:
+                yield _sse("error", {"error": f"OCR fehlgeschlagen: {ocr_result['error']}", "stage": "ocr"})
+                return
+            
+            text = ocr_result.get("text", "")
+            yield _sse("ocr", {"document_id": ocr_result.get("document_id"), "characters": len(text), "text": text[:1000]})
+            
+            async for kind, data in ollama_analyzer.analyze_document_stream(ocr_result):
+                if kind == "result":
+                    data = _store_complete_result(filename, ocr_result, data)
+                elif kind == "error":
+                    data = {"error": f"Analyse fehlgeschlagen: {data['error']}", "stage": "analysis"}
+                yield _sse(kind, data)
+        
+        except Exception as e:
+            logger.error(f"Fehler bei vollständiger Dokumentverarbeitung (Stream): {e}")
+            yield _sse("error", {"error": str(e), "stage": "unknown"})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _store_ollama_result(result: dict):
+    """Speichert ein Ollama-Analyseergebnis lokal"""
+    job_id = result["document_id"]
+    documents[job_id] = {
+        "id": job_id,
+        "status": result["status"],
+        "created_at": result["processed_at"],
+        "updated_at": result["processed_at"],
+        "source": "ollama_analysis",
+        "doc_type": result["doc_type"],
+        "event_type": result["event_type"],
+        "confidence": result["confidence"],
+        "extracted_data": result["extracted_data"],
+        "original_text": result.get("original_text", ""),
+        "processor": result["processor"],
+        "model": result["model"]
+    }
+
+def _store_complete_result(filename: Optional[str], ocr_result: dict, analysis_result: dict) -> dict:
+    """Kombiniert OCR- und Analyseergebnis und speichert es lokal"""
+    final_result = {
+        "document_id": analysis_result["document_id"],
+        "status": "completed",
+        "filename": filename,
+        "processing_stages": {
+            "ocr": {
+                "completed": True,
+                "source": "google_vision_api",
+                "raw_text": ocr_result.get("text", "")
+            },
+            "analysis": {
+                "completed": True,
+                "source": "ollama",
+                "model": analysis_result["model"]
+            }
+        },
+        "doc_type": analysis_result["doc_type"],
+        "event_type": analysis_result["event_type"],
+        "confidence": analysis_result["confidence"],
+        "extracted_data": analysis_result["extracted_data"],
+        "created_at": analysis_result["processed_at"],
+        "updated_at": analysis_result["processed_at"]
+    }
+    
+    documents[final_result["document_id"]] = final_result
+    return final_result
+
+def _sse(event: str, data: dict) -> str:
+    """Formatiert ein Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
 @app.post("/api/vision/ocr")
 async def perform_ocr(file: UploadFile = File(...)):
     """Führt OCR auf einem hochgeladenen Bild durch"""
@@ -468,8 +541,16 @@ async def get_configuration_status():
         },
         "ollama": {
             "available": ollama_analyzer.is_available,
+            "availability": ollama_analyzer.get_availability(),
             "host": ollama_analyzer.ollama_host,
-            "model": ollama_analyzer.default_model
+            "hosts": ollama_analyzer.pool.get_stats(),
+            "model": ollama_analyzer.default_model,
+            "analysis_mode": OLLAMA_ANALYSIS_MODE,
+            "routing": ollama_analyzer.router.get_stats(),
+            "cascade": get_cascade_stats(),
+            "usage": ollama_analyzer.get_usage_stats(),
+            "preclassifier": get_preclassifier_stats(),
+            "cache": ollama_analyzer.cache.get_stats() if ollama_analyzer.cache else {"enabled": False}
         },
         "database": {
             "type": "in_memory",
@@ -0,0 +1,93 @@
+"""
+Job deadlines derived from the event type's processing SLA
+
+A job's deadline is its ingest time plus the processing_sla (minutes) of
+its event type; jobs without a known event type use the UNKNOWN SLA. The
+worker sets the deadline for the job in a context variable, and downstream
+calls (ML server, GCS, Ollama) cap their timeouts with bounded_timeout()
+and are skipped with DeadlineExceeded (check_deadline) once it has passed.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from app.schemas.event_types import EventType, get_event_type_info
+
+_current_deadline: ContextVar[Optional[float]] = ContextVar("job_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when work is skipped because the job deadline has passed"""
+    pass
+
+
+def sla_seconds(event_type: Optional[str]) -> float:
+    """Processing SLA of an event type in seconds"""
+    try:
+        info = get_event_type_info(EventType(str(event_type).lower()))
+    except ValueError:
+        info = get_event_type_info(EventType.UNKNOWN)
+    return float(info.processing_sla or get_event_type_info(EventType.UNKNOWN).processing_sla) * 60
+
+
+def compute_deadline(ingested_at: float, event_type: Optional[str] = None) -> float:
+    """Absolute deadline (unix timestamp) for a job ingested at ingested_at"""
+    return ingested_at + sla_seconds(event_type)
+
+
+def deadline_for_job(job: Dict[str, Any]) -> float:
+    """Deadline stored on the job, or derived from its timestamp for older jobs"""
+    if job.get("deadline") is not None:
+        return float(job["deadline"])
+
+    try:
+        ingested = datetime.fromisoformat(job["timestamp"])
+        # The API writes naive UTC timestamps (datetime.utcnow)
+        if ingested.tzinfo is None:
+            ingested = ingested.replace(tzinfo=timezone.utc)
+        ingested_at = ingested.timestamp()
+    except (KeyError, TypeError, ValueError):
+        ingested_at = time.time()
+
+    metadata = (job.get("payload") or {}).get("metadata") or {}
+    return compute_deadline(ingested_at, metadata.get("event_type"))
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    """Make deadline the current job deadline inside the block"""
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def get_deadline() -> Optional[float]:
+    return _current_deadline.get()
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left until the current deadline, None without a deadline"""
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def bounded_timeout(timeout: float, floor: float = 1.0) -> float:
+    """Timeout capped by the time left, but at least floor seconds"""
+    remaining = remaining_time()
+    if remaining is None:
+        return timeout
+    return max(floor, min(timeout, remaining))
+
+
+def check_deadline(operation: str = "operation"):
+    """Raise DeadlineExceeded if the current deadline has passed"""
+    remaining = remaining_time()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceeded(f"Skipping {operation}: job deadline passed {-remaining:.0f}s ago")
@@ -0,0 +1,98 @@
+"""
+Incremental JSON member scanner for LLM token streams
+
+Feeds text chunks as they arrive and reports every object member whose value
+is complete, so fields can be shown before the model has finished the whole
+object. Text before the first "{" (e.g. a Markdown fence) is ignored.
+
+    scanner = JSONMemberStream(max_depth=2)
+    scanner.feed('{"doc_type": "INVOICE", "data": {"total": 5')  -> [(("doc_type",), "INVOICE")]
+    scanner.feed('00}}')  -> [(("data", "total"), 500), (("data",), {"total": 500})]
+"""
+
+import json
+from dataclasses import dataclass
+from typing import Any, List, Optional, Tuple
+
+
+@dataclass
+class _Frame:
+    is_object: bool
+    key: Optional[str] = None
+    key_start: int = 0
+    value_start: Optional[int] = None
+
+
+class JSONMemberStream:
+    """Reports (path, value) for completed members of objects up to max_depth"""
+
+    def __init__(self, max_depth: int = 1):
+        self.max_depth = max_depth
+        self._buffer = ""
+        self._position = 0
+        self._stack: List[_Frame] = []
+        self._started = False
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, chunk: str) -> List[Tuple[Tuple[str, ...], Any]]:
+        """Add text and return the members completed by it"""
+        self._buffer += chunk
+        members = []
+
+        while self._position < len(self._buffer):
+            index = self._position
+            char = self._buffer[index]
+            self._position += 1
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if not self._started:
+                if char != "{":
+                    continue
+                self._started = True
+
+            if char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._stack.append(_Frame(is_object=char == "{", key_start=index + 1))
+            elif char in "}]":
+                if not self._stack:
+                    continue
+                self._complete_member(index, members)
+                self._stack.pop()
+            elif char == ":" and self._stack and self._stack[-1].is_object:
+                frame = self._stack[-1]
+                try:
+                    frame.key = json.loads(self._buffer[frame.key_start:index])
+                except ValueError:
+                    frame.key = None
+                frame.value_start = index + 1
+            elif char == "," and self._stack:
+                self._complete_member(index, members)
+                self._stack[-1].key_start = index + 1
+
+        return members
+
+    def _complete_member(self, end: int, members: List[Tuple[Tuple[str, ...], Any]]):
+        frame = self._stack[-1]
+        if not frame.is_object or frame.key is None or frame.value_start is None:
+            return
+
+        # Only members reachable through object keys have a path
+        if all(parent.is_object for parent in self._stack) and len(self._stack) <= self.max_depth:
+            path = tuple(parent.key for parent in self._stack)
+            try:
+                members.append((path, json.loads(self._buffer[frame.value_start:end])))
+            except ValueError:
+                pass
+
+        frame.key = None
+        frame.value_start = None
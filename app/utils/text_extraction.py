@@ -0,0 +1,148 @@
+"""
+Bounded text extraction from JSON payloads (ML and Ollama paths)
+
+Walks the payload iteratively (no recursion limit), collects string leaves
+up to a character budget and remembers which JSON path every text segment
+came from, so model offsets can be traced back to the source field.
+
+  – preferred keys (text, content, ...) are visited first, so the budget
+    is spent on the document body before titles or ids
+  – metadata-like keys are skipped
+  – OCR structures are not read twice: a node with a full "text" skips its
+    pages/blocks/words, a fullTextAnnotation skips textAnnotations
+"""
+
+import os
+import json
+import bisect
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+TEXT_EXTRACTION_MAX_CHARS = int(os.getenv("TEXT_EXTRACTION_MAX_CHARS", "100000"))
+PREFERRED_KEYS = tuple(
+    key.strip() for key in os.getenv(
+        "TEXT_EXTRACTION_PREFERRED_KEYS",
+        "text,fullTextAnnotation,content,body,message,document,responses,pages,subject,title"
+    ).split(",") if key.strip()
+)
+SKIP_KEYS = frozenset(
+    key.strip() for key in os.getenv(
+        "TEXT_EXTRACTION_SKIP_KEYS",
+        "metadata,locale,property,boundingPoly,boundingBox,mime_type,content_type,gcs_uri"
+    ).split(",") if key.strip()
+)
+
+# Sibling keys that only repeat what the key on the left already contains
+REDUNDANT_SIBLINGS = {
+    "text": ("pages", "blocks", "paragraphs", "words", "symbols"),
+    "fullTextAnnotation": ("textAnnotations",)
+}
+
+SEPARATOR = "\n"
+
+
+@dataclass
+class ExtractedText:
+    """Extracted text plus a map from text offsets to JSON paths"""
+    text: str
+    segments: List[Tuple[int, int, str]] = field(default_factory=list)  # (start, end, json path)
+    truncated: bool = False
+
+    def __post_init__(self):
+        # Segment starts, built once so every lookup is a single bisect
+        self._starts = [start for start, _, _ in self.segments]
+
+    def _segment_index(self, offset: int) -> Optional[int]:
+        index = bisect.bisect_right(self._starts, offset) - 1
+        if index < 0 or offset >= self.segments[index][1]:
+            return None
+        return index
+
+    def path_at(self, offset: int) -> Optional[str]:
+        """JSON path of the field the text offset falls into"""
+        index = self._segment_index(offset)
+        return None if index is None else self.segments[index][2]
+
+    def field_offset(self, offset: int) -> Optional[int]:
+        """Offset relative to the start of its source field"""
+        index = self._segment_index(offset)
+        return None if index is None else offset - self.segments[index][0]
+
+
+def _ordered_items(node: Dict[str, Any]) -> List[Tuple[str, Any]]:
+    """Dict items with preferred keys first, skipped and redundant keys removed"""
+    skip = set(SKIP_KEYS)
+    for key, redundant in REDUNDANT_SIBLINGS.items():
+        if node.get(key):
+            skip.update(redundant)
+
+    preferred = [(key, node[key]) for key in PREFERRED_KEYS if key in node and key not in skip]
+    others = [
+        (key, value) for key, value in node.items()
+        if key not in skip and key not in PREFERRED_KEYS
+    ]
+    return preferred + others
+
+
+def extract_text(payload: Any, max_chars: int = TEXT_EXTRACTION_MAX_CHARS) -> ExtractedText:
+    """
+    Collect the string leaves of a payload into one text
+
+    Args:
+        payload: Parsed JSON (dict, list or str)
+        max_chars: Character budget for the extracted text
+
+    Returns:
+        ExtractedText with segments mapping text offsets to JSON paths
+    """
+    parts: List[str] = []
+    segments: List[Tuple[int, int, str]] = []
+    length = 0
+    truncated = False
+
+    stack: List[Tuple[Any, str]] = [(payload, "$")]
+    while stack:
+        node, path = stack.pop()
+
+        if isinstance(node, str):
+            if not node.strip():
+                continue
+
+            start = length + (len(SEPARATOR) if parts else 0)
+            remaining = max_chars - start
+            if remaining <= 0:
+                truncated = True
+                break
+
+            value = node[:remaining]
+            if parts:
+                parts.append(SEPARATOR)
+            parts.append(value)
+            segments.append((start, start + len(value), path))
+            length = start + len(value)
+
+            if len(value) < len(node):
+                truncated = True
+                break
+
+        elif isinstance(node, dict):
+            # Reversed, so the first child is popped first
+            for key, value in reversed(_ordered_items(node)):
+                stack.append((value, f"{path}.{key}"))
+
+        elif isinstance(node, list):
+            for index in range(len(node) - 1, -1, -1):
+                stack.append((node[index], f"{path}[{index}]"))
+
+    return ExtractedText(text="".join(parts), segments=segments, truncated=truncated)
+
+
+def payload_to_text(payload: Any, max_chars: int = TEXT_EXTRACTION_MAX_CHARS) -> str:
+    """
+    Text for model input: string leaves, or compact JSON for payloads
+    without any text (bounded by the same budget)
+    """
+    extracted = extract_text(payload, max_chars)
+    if extracted.text:
+        return extracted.text
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str)[:max_chars]
@@ -5,41 +5,62 @@ TODO: Implement background-worker mit aioredis Subscriber
 
 import os
 import json
+import time
 import asyncio
 import logging
 import signal
 import sys
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import uuid
 
-import redis.asyncio as aioredis
-from sqlalchemy import select
+from sqlalchemy import select, delete, update
 
 from app.db.session import get_db
 from app.db.models import Document, Entity, ProcessingJob
 from app.ingestion.gcp_fetcher import fetch_from_gcs
-from app.ml_client.predict import predict_document
+from app.ml_client.predict import predict_document, startup_ml_client, shutdown_ml_client, ml_breaker
+from app.ml_client.fallback import predict_with_fallback
+from app.ml_client.resilience import CLOSED
 from app.utils.mapping import map_label_to_id
+from app.worker.queue_backend import QueueBackend, create_queue_backend, JOB_LEASE_SECONDS
+from app.worker.coalescing import create_coalescer, source_key_for_job
+from app.utils.deadline import deadline_scope, deadline_for_job, remaining_time
 
 logger = logging.getLogger(__name__)
 
+class JobCancelledError(Exception):
+    """Raised when a job is cancelled while it is being processed"""
+    pass
+
 class BackgroundWorker:
     """
-    Background worker for processing document jobs from Redis queue
+    Background worker for processing document jobs from the job queue
     """
     
-    def __init__(self, worker_id: Optional[str] = None):
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        queue_backend: Optional[QueueBackend] = None,
+        install_signal_handlers: bool = True
+    ):
         self.worker_id = worker_id or f"worker-{uuid.uuid4().hex[:8]}"
-        self.redis_client = None
+        # A backend passed in is shared (e.g. with the API) and not closed by this worker
+        self.queue = queue_backend
+        self._owns_queue = queue_backend is None
+        self.coalescer = None
         self.running = False
-        self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
         self.queue_name = "doc_jobs"
+        self.rescore_queue = f"{self.queue_name}:rescore"
         self.batch_size = int(os.getenv("WORKER_BATCH_SIZE", "1"))
         self.poll_interval = float(os.getenv("WORKER_POLL_INTERVAL", "1.0"))
         self.max_retries = int(os.getenv("WORKER_MAX_RETRIES", "3"))
+        self.cancel_poll_interval = float(os.getenv("WORKER_CANCEL_POLL_INTERVAL", "1.0"))
+        self.reap_interval = float(os.getenv("WORKER_REAP_INTERVAL", "30"))
+        self._last_reap = 0.0
         
-        # Graceful shutdown handling
+        # Graceful shutdown handling (embedded workers leave signals to their host)
+        self.install_signal_handlers = install_signal_handlers
         self._shutdown_event = asyncio.Event()
         
     async def start(self):
@@ -47,13 +68,18 @@ class BackgroundWorker:
         logger.info(f"Starting background worker {self.worker_id}")
         
         try:
-            # Initialize Redis connection
-            self.redis_client = await aioredis.from_url(self.redis_url)
-            await self.redis_client.ping()
-            logger.info(f"Connected to Redis: {self.redis_url}")
+            # Initialize job queue
+            if self.queue is None:
+                self.queue = create_queue_backend()
+                await self.queue.connect()
+            await self.queue.ping()
+            logger.info(f"Worker {self.worker_id} using {self.queue.name} queue backend")
+            
+            self.coalescer = create_coalescer(self.queue)
             
             # Set up signal handlers for graceful shutdown
-            self._setup_signal_handlers()
+            if self.install_signal_handlers:
+                self._setup_signal_handlers()
             
             self.running = True
             
@@ -74,9 +100,10 @@ class BackgroundWorker:
     
     async def cleanup(self):
         """Clean up resources"""
-        if self.redis_client:
-            await self.redis_client.close()
-            logger.info(f"Closed Redis connection for worker {self.worker_id}")
+        if self.queue and self._owns_queue:
+            await self.queue.close()
+            self.queue = None
+            logger.info(f"Closed queue connection for worker {self.worker_id}")
     
     def _setup_signal_handlers(self):
         """Set up signal handlers for graceful shutdown"""
@@ -93,15 +120,12 @@ class BackgroundWorker:
         
         while self.running and not self._shutdown_event.is_set():
             try:
-                # Check for jobs with timeout
-                await asyncio.wait_for(
-                    self._process_batch(),
-                    timeout=self.poll_interval
-                )
+                await self._maybe_reap()
                 
-            except asyncio.TimeoutError:
-                # No jobs available, continue polling
-                pass
+                # Queue pops time out on their own; the batch itself must not be
+                # cut short, otherwise jobs are cancelled mid-processing
+                await self._process_batch()
+
             except Exception as e:
                 logger.error(f"Error in processing loop: {e}")
                 await asyncio.sleep(5)  # Wait before retrying
@@ -113,17 +137,18 @@ class BackgroundWorker:
         jobs_processed = 0
         
         while jobs_processed < self.batch_size and self.running:
-            # Pop job from queue (blocking with timeout)
-            job_data = await self.redis_client.brpop(
-                self.queue_name, 
-                timeout=int(self.poll_interval)
+            # Dequeue, lease and mark processing in one step (blocking with timeout)
+            job_json = await self.queue.claim(
+                self.queue_name,
+                self.worker_id,
+                timeout=self.poll_interval
             )
             
-            if not job_data:
+            if not job_json:
+                # Idle: use spare capacity to re-score degraded results
+                await self._drain_rescore_queue()
                 break  # No jobs available
             
-            queue_name, job_json = job_data
-            
             try:
                 job = json.loads(job_json)
                 await self._process_job(job)
@@ -136,8 +161,9 @@ class BackgroundWorker:
                 # Optionally, push job to dead letter queue
                 await self._handle_failed_job(job_json, str(e))
     
-    async def _process_job(self, job: Dict[str, Any]):
-        """Process a single job"""
+    async def _process_job(self, job: Dict[str, Any], queue_name: Optional[str] = None):
+        """Process a single job claimed from queue_name (default: the main queue)"""
+        queue_name = queue_name or self.queue_name
         job_id = job.get("job_id")
         if not job_id:
             logger.error("Job missing job_id")
@@ -145,38 +171,217 @@ class BackgroundWorker:
         
         start_time = datetime.utcnow()
         logger.info(f"Worker {self.worker_id} processing job {job_id}")
+        rescore = job.get("rescore", False)
+        
+        # Downstream timeouts follow the job's SLA deadline; re-scoring runs
+        # after the fact and has no deadline
+        deadline = None if rescore else deadline_for_job(job)
+        if deadline is not None and deadline < time.time():
+            logger.warning(f"Job {job_id} is past its deadline, fetching once and classifying without ML calls")
         
+        # Renew the job's lease while it runs, so the reaper only requeues
+        # jobs of workers that died
+        heartbeat = self._keep_alive(
+            lambda: self.queue.extend(queue_name, job_id, self.worker_id),
+            JOB_LEASE_SECONDS / 3,
+            f"lease of job {job_id}"
+        )
         try:
-            # Update job status to processing
-            async with get_db() as db:
-                result = await db.execute(select(Document).where(Document.id == job_id))
-                document = result.scalar_one_or_none()
-                
-                if not document:
-                    logger.error(f"Document not found for job {job_id}")
+            with deadline_scope(deadline):
+                await self._run_job(job, job_id, start_time, rescore, queue_name)
+        finally:
+            await self._stop_keep_alive(heartbeat)
+    
+    async def _run_job(self, job: Dict[str, Any], job_id: str, start_time: datetime, rescore: bool, queue_name: str):
+        """
+        Fetch, classify and store one job (inside its deadline scope).
+        Queue bookkeeping goes to queue_name, so re-scoring has its own counters;
+        cancellation is always requested on the main queue.
+        """
+        waiting_job_ids = []
+        
+        try:
+            # The "processing" status lives in the queue backend (set by claim),
+            # the Document row is only written once the job has a result
+            
+            # Join an in-flight job for the same source instead of redoing the work
+            # (main queue only: waiters are completed on the leader's queue)
+            lease = None
+            source_key = None
+            if self.coalescer and queue_name == self.queue_name:
+                source_key = source_key_for_job(job)
+            if source_key:
+                lease = await self.coalescer.acquire(source_key, job_id, json.dumps(job))
+                if not lease.is_leader:
+                    # The leader completes this job; if it dies, the coalescing
+                    # reaper requeues it
+                    await self.queue.detach(queue_name, job_id)
                     return
-                
-                document.status = "processing"
-                document.updated_at = datetime.utcnow()
-                await db.commit()
             
-            # Fetch document content
-            content = await self._fetch_content(job)
+            # Keep the coalescing lock alive for as long as the leader works
+            heartbeat = None
+            if lease:
+                heartbeat = self._keep_alive(
+                    lambda: self.coalescer.refresh(lease),
+                    self.coalescer.lock_ttl / 3,
+                    f"coalescing lock for {lease.key}"
+                )
             
-            # Get ML prediction
-            prediction = await predict_document(content)
+            try:
+                # Stages run under a cancellation watch, so DELETE /jobs/{id}
+                # aborts in-flight fetch and prediction calls
+                content = await self._run_cancellable(job_id, self._fetch_content(job))
+                
+                # Get ML prediction; degrade to cheaper tiers on ML outage or
+                # tight deadline, except when re-scoring a degraded result
+                if rescore:
+                    classify = predict_document(content)
+                else:
+                    classify = predict_with_fallback(content)
+                prediction = await self._run_cancellable(job_id, classify)
+            finally:
+                if heartbeat:
+                    await self._stop_keep_alive(heartbeat)
+                if lease:
+                    waiting_job_ids = await self.coalescer.release(lease)
             
             # Calculate processing time
             processing_time = (datetime.utcnow() - start_time).total_seconds()
             
-            # Store results in database
-            await self._store_results(job_id, prediction, processing_time)
+            # Store results in database, fanning out to coalesced jobs
+            for result_job_id in [job_id] + waiting_job_ids:
+                # The queue tombstone is set first on DELETE /jobs/{id}
+                stored = (
+                    not await self.queue.is_cancelled(self.queue_name, result_job_id)
+                    and await self._store_results(result_job_id, prediction, processing_time)
+                )
+                status = "completed" if stored else "cancelled"
+                await self.queue.complete(queue_name, result_job_id, status=status)
+                
+                if stored and prediction.get("degraded"):
+                    await self.queue.push(
+                        self.rescore_queue,
+                        json.dumps({**job, "job_id": result_job_id, "rescore": True})
+                    )
             
+            if waiting_job_ids:
+                logger.info(f"Job {job_id} result shared with {len(waiting_job_ids)} coalesced jobs")
             logger.info(f"Job {job_id} completed successfully in {processing_time:.2f}s")
             
+        except JobCancelledError:
+            logger.info(f"Job {job_id} cancelled, worker released")
+            await self.queue.complete(queue_name, job_id, status="cancelled")
+            
+            # Coalesced jobs still want the result: hand them back to the queue
+            for waiting_job_id in waiting_job_ids:
+                await self.queue.complete(self.queue_name, waiting_job_id, status="requeued")
+                await self.queue.push(self.queue_name, json.dumps({**job, "job_id": waiting_job_id}))
+            
         except Exception as e:
+            if rescore:
+                # The degraded result stays in place; try again later, up to max_retries times
+                attempts = int(job.get("rescore_attempts", 0)) + 1
+                if attempts > self.max_retries:
+                    logger.warning(f"Re-scoring job {job_id} failed {attempts} times, giving up and keeping degraded result: {e}")
+                    await self.queue.fail(queue_name, job_id, str(e))
+                    return
+                
+                logger.warning(f"Re-scoring job {job_id} failed, keeping degraded result: {e}")
+                await self.queue.complete(queue_name, job_id, status="requeued")
+                await self.queue.push(self.rescore_queue, json.dumps({**job, "rescore_attempts": attempts}))
+                return
+            
             logger.error(f"Job {job_id} failed: {e}")
-            await self._handle_job_failure(job_id, str(e))
+            for failed_job_id in [job_id] + waiting_job_ids:
+                await self._handle_job_failure(failed_job_id, str(e), queue_name)
+    
+    def _keep_alive(self, refresh, interval: float, what: str) -> asyncio.Task:
+        """Call refresh() every interval seconds until stopped (heartbeat for leases and locks)"""
+        async def beat():
+            while True:
+                await asyncio.sleep(max(interval, 1.0))
+                try:
+                    if not await refresh():
+                        logger.warning(f"Worker {self.worker_id} lost the {what}")
+                except Exception as e:
+                    logger.error(f"Failed to refresh the {what}: {e}")
+        
+        return asyncio.ensure_future(beat())
+    
+    @staticmethod
+    async def _stop_keep_alive(task: asyncio.Task):
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+    
+    async def _maybe_reap(self):
+        """Requeue jobs whose owner died (at most every reap_interval seconds)"""
+        if time.monotonic() - self._last_reap < self.reap_interval:
+            return
+        self._last_reap = time.monotonic()
+        
+        try:
+            # Jobs whose worker stopped renewing the lease
+            reaped = await self.queue.reap_expired(self.queue_name, max_attempts=self.max_retries)
+            for job_id, outcome in reaped.items():
+                logger.warning(f"Lease of job {job_id} expired, job {outcome}")
+                if outcome == "failed":
+                    await self._mark_document_failed(job_id, "Job lease expired")
+            
+            # Re-scoring keeps the degraded result when it gives up
+            for job_id, outcome in (await self.queue.reap_expired(self.rescore_queue, max_attempts=self.max_retries)).items():
+                logger.warning(f"Lease of re-scoring job {job_id} expired, job {outcome}")
+        except Exception as e:
+            logger.error(f"Failed to reap expired leases: {e}")
+        
+        if not self.coalescer:
+            return
+        
+        try:
+            # Waiters of a leader whose coalescing lock expired never get a result
+            for job_json in await self.coalescer.reap_orphans():
+                job_id = json.loads(job_json).get("job_id")
+                await self.queue.complete(self.queue_name, job_id, status="requeued")
+                await self.queue.push(self.queue_name, job_json)
+                logger.warning(f"Requeued job {job_id}, its coalescing leader is gone")
+        except Exception as e:
+            logger.error(f"Failed to reap orphaned jobs: {e}")
+    
+    async def _drain_rescore_queue(self):
+        """
+        Re-score one degraded result while the ML server is healthy. The job is
+        claimed from the re-score queue and counted there, not in the main
+        queue's counters, so a degraded document is counted once per queue.
+        """
+        if ml_breaker.state != CLOSED:
+            return
+        
+        try:
+            if not await self.queue.length(self.rescore_queue):
+                return
+            
+            job_json = await self.queue.claim(self.rescore_queue, self.worker_id, timeout=1)
+            if job_json:
+                logger.info(f"Worker {self.worker_id} re-scoring a degraded result")
+                await self._process_job(json.loads(job_json), self.rescore_queue)
+        except Exception as e:
+            logger.error(f"Failed to drain re-score queue: {e}")
+    
+    async def _run_cancellable(self, job_id: str, coro):
+        """
+        Run one job stage, polling for cancellation while it is in flight.
+        Fast stages finish before the first poll and cost no extra queue calls.
+        """
+        task = asyncio.ensure_future(coro)
+        
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=self.cancel_poll_interval)
+            if done:
+                return task.result()
+            
+            if await self.queue.is_cancelled(self.queue_name, job_id):
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise JobCancelledError(job_id)
     
     async def _fetch_content(self, job: Dict[str, Any]) -> Dict[str, Any]:
         """Fetch document content from GCS or use direct payload"""
@@ -185,6 +390,12 @@ class BackgroundWorker:
         
         if gcs_uri:
             logger.info(f"Fetching content from GCS: {gcs_uri}")
+            remaining = remaining_time()
+            if remaining is not None and remaining <= 0:
+                # Late jobs still need their content to degrade like payload
+                # jobs do: one best-effort fetch with the regular timeout
+                with deadline_scope(None):
+                    return await fetch_from_gcs(gcs_uri)
             return await fetch_from_gcs(gcs_uri)
         elif payload:
             logger.info("Using direct payload")
@@ -192,20 +403,31 @@ class BackgroundWorker:
         else:
             raise ValueError("No content source provided (gcs_uri or payload)")
     
-    async def _store_results(self, job_id: str, prediction: Dict[str, Any], processing_time: float):
-        """Store prediction results in database"""
+    async def _store_results(self, job_id: str, prediction: Dict[str, Any], processing_time: float) -> bool:
+        """Store prediction results in database; returns False if the job was cancelled meanwhile"""
         async with get_db() as db:
-            # Update document with prediction results
-            result = await db.execute(select(Document).where(Document.id == job_id))
-            document = result.scalar_one()
+            # Update document with prediction results, unless it was cancelled
+            # meanwhile (conditional, so a concurrent cancel cannot be overwritten)
+            result = await db.execute(
+                update(Document)
+                .where(Document.id == job_id, Document.status != "cancelled")
+                .values(
+                    status="completed",
+                    doc_type=prediction.get("doc_type"),
+                    event_type=prediction.get("event_type"),
+                    confidence=prediction.get("confidence", 0.0),
+                    processing_time=processing_time,
+                    model_version=prediction.get("model_version", "1.0"),
+                    updated_at=datetime.utcnow()
+                )
+            )
+            if result.rowcount == 0:
+                logger.info(f"Job {job_id} was cancelled, discarding result")
+                await db.rollback()
+                return False
             
-            document.status = "completed"
-            document.doc_type = prediction.get("doc_type")
-            document.event_type = prediction.get("event_type")
-            document.confidence = prediction.get("confidence", 0.0)
-            document.processing_time = processing_time
-            document.model_version = prediction.get("model_version", "1.0")
-            document.updated_at = datetime.utcnow()
+            # Re-scoring replaces the entities of the degraded result
+            await db.execute(delete(Entity).where(Entity.document_id == job_id))
             
             # Create entity records
             entities_data = prediction.get("entities", [])
@@ -222,9 +444,19 @@ class BackgroundWorker:
                 db.add(entity)
             
             await db.commit()
+            return True
     
-    async def _handle_job_failure(self, job_id: str, error_message: str):
+    async def _handle_job_failure(self, job_id: str, error_message: str, queue_name: Optional[str] = None):
         """Handle job failure by updating status"""
+        try:
+            await self.queue.fail(queue_name or self.queue_name, job_id, error_message)
+        except Exception as e:
+            logger.error(f"Failed to record job {job_id} failure in queue: {e}")
+        
+        await self._mark_document_failed(job_id, error_message)
+    
+    async def _mark_document_failed(self, job_id: str, error_message: str):
+        """Write the failed status and error to the job's document"""
         try:
             async with get_db() as db:
                 result = await db.execute(select(Document).where(Document.id == job_id))
@@ -251,25 +483,34 @@ class BackgroundWorker:
             "timestamp": datetime.utcnow().isoformat()
         }
         
-        await self.redis_client.lpush(dead_letter_queue, json.dumps(failed_job))
+        await self.queue.push(dead_letter_queue, json.dumps(failed_job))
         logger.info(f"Moved failed job to dead letter queue: {dead_letter_queue}")
     
     async def get_worker_stats(self) -> Dict[str, Any]:
         """Get worker statistics"""
         try:
             # Get queue length
-            queue_length = await self.redis_client.llen(self.queue_name)
+            queue_length = await self.queue.length(self.queue_name)
             
             # Get dead letter queue length
             dead_letter_queue = f"{self.queue_name}:failed"
-            failed_jobs = await self.redis_client.llen(dead_letter_queue)
+            failed_jobs = await self.queue.length(dead_letter_queue)
+            rescore_jobs = await self.queue.length(self.rescore_queue)
+            
+            # Counters maintained atomically by the queue backend
+            counters = await self.queue.get_counters(self.queue_name)
+            rescore_counters = await self.queue.get_counters(self.rescore_queue)
             
             return {
                 "worker_id": self.worker_id,
                 "status": "running" if self.running else "stopped",
                 "queue_length": queue_length,
                 "failed_jobs": failed_jobs,
-                "redis_connected": bool(self.redis_client),
+                "rescore_jobs": rescore_jobs,
+                "job_counters": counters,
+                "rescore_counters": rescore_counters,
+                "queue_backend": self.queue.name if self.queue else None,
+                "queue_connected": bool(self.queue),
                 "poll_interval": self.poll_interval,
                 "batch_size": self.batch_size,
                 "max_retries": self.max_retries
@@ -324,25 +565,150 @@ async def get_worker_stats() -> Dict[str, Any]:
             "error": "No worker instance found"
         }
 
+class WorkerPool:
+    """
+    Fixed-size pool of workers sharing one queue backend
+
+    Used embedded in the API process (combined mode) and by the standalone
+    worker process (worker mode).
+    """
+    
+    def __init__(self, size: int, queue_backend: Optional[QueueBackend] = None):
+        self.size = max(size, 1)
+        self.queue = queue_backend
+        self._owns_queue = queue_backend is None
+        self.workers: List[BackgroundWorker] = []
+        self._tasks: List[asyncio.Task] = []
+    
+    async def start(self):
+        """Start all workers as tasks on the current event loop"""
+        if self.queue is None:
+            self.queue = create_queue_backend()
+            await self.queue.connect()
+        
+        prefix = f"worker-{uuid.uuid4().hex[:8]}"
+        for index in range(self.size):
+            worker = BackgroundWorker(
+                worker_id=f"{prefix}-{index}",
+                queue_backend=self.queue,
+                install_signal_handlers=False
+            )
+            self.workers.append(worker)
+            self._tasks.append(asyncio.create_task(worker.start()))
+        
+        logger.info(f"Worker pool started with {self.size} workers")
+    
+    async def stop(self):
+        """Stop all workers and wait for in-flight jobs to finish"""
+        for worker in self.workers:
+            await worker.stop()
+        
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.workers = []
+        
+        if self.queue and self._owns_queue:
+            await self.queue.close()
+            self.queue = None
+        
+        logger.info("Worker pool stopped")
+    
+    def alive_workers(self) -> int:
+        """Number of workers whose processing loop is still running"""
+        return len([task for task in self._tasks if not task.done()])
+    
+    def is_healthy(self) -> bool:
+        """Healthy while at least one worker is alive"""
+        return self.alive_workers() > 0
+    
+    async def get_stats(self) -> Dict[str, Any]:
+        """Get pool statistics"""
+        return {
+            "size": self.size,
+            "alive": self.alive_workers(),
+            "queue_backend": self.queue.name if self.queue else None,
+            "workers": [await worker.get_worker_stats() for worker in self.workers]
+        }
+
+# Health endpoint for worker-only deployments
+WORKER_HEALTH_PORT = int(os.getenv("WORKER_HEALTH_PORT", "8081"))
+
+async def start_health_server(pool: WorkerPool, port: int = WORKER_HEALTH_PORT):
+    """
+    Serve GET /health for worker-only pods:
+    200 while workers are alive and the queue is reachable, 503 otherwise
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            parts = request_line.decode(errors="ignore").split()
+            path = parts[1] if len(parts) > 1 else ""
+            
+            if not path:
+                status, body = "400 Bad Request", {"detail": "Malformed request line"}
+            elif path != "/health":
+                status, body = "404 Not Found", {"detail": "Not found"}
+            else:
+                try:
+                    queue_ok = bool(pool.queue) and await pool.queue.ping()
+                except Exception:
+                    queue_ok = False
+                
+                healthy = pool.is_healthy() and queue_ok
+                status = "200 OK" if healthy else "503 Service Unavailable"
+                body = {
+                    "status": "ok" if healthy else "unavailable",
+                    "mode": "worker",
+                    "workers": pool.alive_workers(),
+                    "queue_connected": queue_ok,
+                    "timestamp": datetime.utcnow().isoformat()
+                }
+            
+            payload = json.dumps(body).encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+    
+    server = await asyncio.start_server(handle, host="0.0.0.0", port=port)
+    logger.info(f"Worker health endpoint listening on :{port}/health")
+    return server
+
 # Command-line interface for running worker standalone
 async def main():
-    """Main function for running worker as standalone process"""
+    """Main function for running workers as standalone process (worker-only mode)"""
     logging.basicConfig(
         level=logging.INFO,
         format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
     )
     
-    worker = BackgroundWorker()
+    pool = WorkerPool(int(os.getenv("WORKER_CONCURRENCY", "1")))
+    stop_event = asyncio.Event()
     
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop_event.set)
+    
+    health_server = None
     try:
-        await worker.start()
-    except KeyboardInterrupt:
-        logger.info("Received keyboard interrupt, shutting down...")
+        await startup_ml_client()
+        await pool.start()
+        if WORKER_HEALTH_PORT:
+            health_server = await start_health_server(pool)
+        
+        await stop_event.wait()
+        logger.info("Received shutdown signal, stopping workers...")
     except Exception as e:
         logger.error(f"Worker failed: {e}")
         sys.exit(1)
     finally:
-        await worker.cleanup()
+        if health_server:
+            health_server.close()
+        await pool.stop()
+        await shutdown_ml_client()
 
 if __name__ == "__main__":
     asyncio.run(main())
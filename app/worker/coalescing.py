@@ -0,0 +1,256 @@
+"""
+In-flight job coalescing (singleflight) for identical document sources
+
+Jobs with the same source (gcs_uri, or a hash of the direct payload) that
+arrive while another job for that source is being processed register as
+waiters instead of fetching and predicting again. The leader fans its result
+out to every waiting job once it is done.
+
+With Redis the lock and waiter list live in Redis, so coalescing works across
+worker processes. Without Redis an in-process lock table is used.
+
+Redis layout (per source key):
+  – lock:<key>                 holds the leader's token, TTL refreshed by the
+                               leader's heartbeat (refresh)
+  – waiters:<key>:<token>      serialized waiting jobs of that leader only, so
+                               a later leader never drains an earlier one's
+  – groups                     sorted set "<key>|<token>" -> lock expiry (ms);
+                               reap_orphans() hands back the waiters of leaders
+                               whose lock expired (crashed worker) for requeueing
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Coalescing configuration
+COALESCE_ENABLED = os.getenv("WORKER_COALESCE_JOBS", "true").lower() == "true"
+COALESCE_LOCK_TTL = int(os.getenv("WORKER_COALESCE_LOCK_TTL", "300"))  # seconds
+COALESCE_KEY_PREFIX = "doc_jobs:coalesce"
+# Waiter lists outlive their lock so the reaper still finds them after a crash
+WAITERS_TTL_FACTOR = 10
+
+# Take the lock and register the group for the reaper
+# KEYS: lock, groups   ARGV: token, lock ttl ms, group member, now ms
+_ACQUIRE_SCRIPT = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    redis.call('ZADD', KEYS[2], ARGV[4] + ARGV[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Register a waiter with the current lock holder (if any), under its token
+# KEYS: lock   ARGV: waiters key prefix, waiters ttl ms, job json
+_JOIN_SCRIPT = """
+local token = redis.call('GET', KEYS[1])
+if not token then
+    return 0
+end
+local waiters_key = ARGV[1] .. token
+redis.call('RPUSH', waiters_key, ARGV[3])
+redis.call('PEXPIRE', waiters_key, ARGV[2])
+return 1
+"""
+
+# Extend the lock and its waiter list while the leader is still working
+# KEYS: lock, waiters, groups   ARGV: token, lock ttl ms, waiters ttl ms, group member, now ms
+_REFRESH_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('PEXPIRE', KEYS[1], ARGV[2])
+redis.call('PEXPIRE', KEYS[2], ARGV[3])
+redis.call('ZADD', KEYS[3], ARGV[5] + ARGV[2], ARGV[4])
+return 1
+"""
+
+# Drain this leader's waiters and drop the lock (if still ours) in one step
+# KEYS: lock, waiters, groups   ARGV: token, group member
+_RELEASE_SCRIPT = """
+local waiters = redis.call('LRANGE', KEYS[2], 0, -1)
+redis.call('DEL', KEYS[2])
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+redis.call('ZREM', KEYS[3], ARGV[2])
+return waiters
+"""
+
+# Collect the waiters of leaders whose lock has expired
+# KEYS: groups   ARGV: key prefix, now ms, limit
+_REAP_SCRIPT = """
+local orphans = {}
+local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[2], 'LIMIT', 0, ARGV[3])
+for _, member in ipairs(members) do
+    local separator = string.find(member, '|', 1, true)
+    local key = string.sub(member, 1, separator - 1)
+    local token = string.sub(member, separator + 1)
+    local lock_key = ARGV[1] .. ':lock:' .. key
+    if redis.call('GET', lock_key) == token then
+        -- still held: the score lags behind a refresh, move it to the real expiry
+        redis.call('ZADD', KEYS[1], ARGV[2] + redis.call('PTTL', lock_key), member)
+    else
+        local waiters_key = ARGV[1] .. ':waiters:' .. key .. ':' .. token
+        for _, waiter in ipairs(redis.call('LRANGE', waiters_key, 0, -1)) do
+            table.insert(orphans, waiter)
+        end
+        redis.call('DEL', waiters_key)
+        redis.call('ZREM', KEYS[1], member)
+    end
+end
+return orphans
+"""
+
+
+@dataclass
+class CoalesceLease:
+    """Result of joining a coalescing group"""
+    key: str
+    is_leader: bool
+    token: Optional[str] = None
+
+
+def source_key_for_job(job: Dict[str, Any]) -> Optional[str]:
+    """Build the coalescing key for a job (gcs_uri first, payload hash otherwise)"""
+    gcs_uri = job.get("gcs_uri")
+    if gcs_uri:
+        return "uri:" + hashlib.sha256(gcs_uri.encode()).hexdigest()
+
+    payload = job.get("payload")
+    if payload:
+        canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+        return "sha256:" + hashlib.sha256(canonical.encode()).hexdigest()
+
+    return None
+
+
+def _job_id(job_json: str) -> Optional[str]:
+    try:
+        return json.loads(job_json).get("job_id")
+    except (ValueError, AttributeError):
+        return None
+
+
+class JobCoalescer:
+    """
+    Singleflight coordinator for document jobs
+
+    Usage:
+        lease = await coalescer.acquire(key, job_id, job_json)
+        if not lease.is_leader:
+            return  # the leader will store our result
+        try:
+            result = ...  # call refresh(lease) periodically
+        finally:
+            waiters = await coalescer.release(lease)
+    """
+
+    def __init__(self, redis_client=None, lock_ttl: int = COALESCE_LOCK_TTL):
+        self.redis = redis_client
+        self.lock_ttl = lock_ttl
+        self.lock_ttl_ms = lock_ttl * 1000
+        self.waiters_ttl_ms = self.lock_ttl_ms * WAITERS_TTL_FACTOR
+        self.groups_key = f"{COALESCE_KEY_PREFIX}:groups"
+        self._local_waiters: Dict[str, List[str]] = {}
+        if redis_client:
+            self._acquire_script = redis_client.register_script(_ACQUIRE_SCRIPT)
+            self._join_script = redis_client.register_script(_JOIN_SCRIPT)
+            self._refresh_script = redis_client.register_script(_REFRESH_SCRIPT)
+            self._release_script = redis_client.register_script(_RELEASE_SCRIPT)
+            self._reap_script = redis_client.register_script(_REAP_SCRIPT)
+
+    async def acquire(self, key: str, job_id: str, job_json: str) -> CoalesceLease:
+        """Become leader for key, or register the job as waiter of the current leader"""
+        if self.redis is None:
+            return self._acquire_local(key, job_id, job_json)
+
+        token = f"{job_id}:{uuid.uuid4().hex[:8]}"
+
+        # The lock can disappear between SET NX and the join; retry until one succeeds
+        while True:
+            acquired = await self._acquire_script(
+                keys=[self._lock_key(key), self.groups_key],
+                args=[token, self.lock_ttl_ms, f"{key}|{token}", self._now_ms()]
+            )
+            if acquired:
+                return CoalesceLease(key=key, is_leader=True, token=token)
+
+            joined = await self._join_script(
+                keys=[self._lock_key(key)],
+                args=[f"{COALESCE_KEY_PREFIX}:waiters:{key}:", self.waiters_ttl_ms, job_json]
+            )
+            if joined:
+                logger.info(f"Job {job_id} coalesced with in-flight job for {key}")
+                return CoalesceLease(key=key, is_leader=False)
+
+    async def refresh(self, lease: CoalesceLease) -> bool:
+        """Extend the leader's lock; False if it was lost (expired and taken over)"""
+        if not lease.is_leader or self.redis is None:
+            return True
+
+        return bool(await self._refresh_script(
+            keys=[self._lock_key(lease.key), self._waiters_key(lease.key, lease.token), self.groups_key],
+            args=[lease.token, self.lock_ttl_ms, self.waiters_ttl_ms, f"{lease.key}|{lease.token}", self._now_ms()]
+        ))
+
+    async def release(self, lease: CoalesceLease) -> List[str]:
+        """Release leadership and return the job ids that waited for the result"""
+        if not lease.is_leader:
+            return []
+
+        if self.redis is None:
+            waiters = self._local_waiters.pop(lease.key, [])
+        else:
+            waiters = await self._release_script(
+                keys=[self._lock_key(lease.key), self._waiters_key(lease.key, lease.token), self.groups_key],
+                args=[lease.token, f"{lease.key}|{lease.token}"]
+            )
+
+        job_ids = [_job_id(w.decode() if isinstance(w, bytes) else w) for w in waiters]
+        return [job_id for job_id in job_ids if job_id]
+
+    async def reap_orphans(self, limit: int = 100) -> List[str]:
+        """Serialized waiting jobs whose leader's lock expired (crashed leader); they must be requeued"""
+        if self.redis is None:
+            return []
+
+        orphans = await self._reap_script(
+            keys=[self.groups_key],
+            args=[COALESCE_KEY_PREFIX, self._now_ms(), limit]
+        )
+        return [w.decode() if isinstance(w, bytes) else w for w in orphans]
+
+    def _acquire_local(self, key: str, job_id: str, job_json: str) -> CoalesceLease:
+        if key in self._local_waiters:
+            self._local_waiters[key].append(job_json)
+            logger.info(f"Job {job_id} coalesced with in-flight job for {key}")
+            return CoalesceLease(key=key, is_leader=False)
+
+        self._local_waiters[key] = []
+        return CoalesceLease(key=key, is_leader=True)
+
+    def _lock_key(self, key: str) -> str:
+        return f"{COALESCE_KEY_PREFIX}:lock:{key}"
+
+    def _waiters_key(self, key: str, token: str) -> str:
+        return f"{COALESCE_KEY_PREFIX}:waiters:{key}:{token}"
+
+    @staticmethod
+    def _now_ms() -> int:
+        return int(time.time() * 1000)
+
+
+def create_coalescer(queue_backend) -> Optional[JobCoalescer]:
+    """Create a coalescer sharing the queue's Redis connection (if any)"""
+    if not COALESCE_ENABLED:
+        return None
+
+    return JobCoalescer(redis_client=getattr(queue_backend, "client", None))
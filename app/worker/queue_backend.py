@@ -0,0 +1,766 @@
+"""
+Queue backends for document jobs
+
+  – RedisQueueBackend  -> Redis lists (LPUSH / BRPOP), default for multi-node setups
+  – LocalQueueBackend  -> asyncio.Queue + SQLite write-ahead journal, no Redis needed
+
+Selected via QUEUE_BACKEND ("redis" | "local").
+
+Job bookkeeping (dequeue + lease + "processing" status + counters, and the
+matching completion / failure transitions) is done by the backend in a single
+step: Lua scripts on Redis, plain dict updates for the local backend.
+
+Workers extend the lease of their job while it runs. Leases that expire
+(crashed worker) are reaped: the job is requeued, or failed once it has
+expired more than max_attempts times.
+"""
+
+import os
+import json
+import asyncio
+import logging
+import sqlite3
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+logger = logging.getLogger(__name__)
+
+# Queue configuration
+QUEUE_BACKEND = os.getenv("QUEUE_BACKEND", "redis").lower()
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+QUEUE_JOURNAL_PATH = os.getenv("QUEUE_JOURNAL_PATH", "neuralex_queue.db")
+JOB_LEASE_SECONDS = int(os.getenv("WORKER_JOB_LEASE_SECONDS", "300"))
+JOB_STATE_TTL = int(os.getenv("JOB_STATE_TTL", "86400"))  # keep job states for a day
+LOCAL_STATE_LIMIT = int(os.getenv("QUEUE_LOCAL_STATE_LIMIT", "10000"))
+
+# Job states that no longer change (cancel() leaves them as they are)
+FINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# Dequeue (or take an already popped job), lease it, mark it processing and
+# bump counters in one round trip. Jobs cancelled while queued are skipped.
+# The lease is indexed (leases: job id -> expiry ms, inflight: job id -> job)
+# so the reaper can find and requeue jobs whose worker died.
+# KEYS: queue, stats   ARGV: key prefix, worker id, lease ms, now, state ttl, [job]
+_CLAIM_SCRIPT = """
+local popped = ARGV[6]
+for attempt = 1, 100 do
+    local job = popped
+    if not job then
+        job = redis.call('RPOP', KEYS[1])
+        if not job then
+            return false
+        end
+    end
+
+    local ok, decoded = pcall(cjson.decode, job)
+    local job_id = nil
+    if ok and type(decoded) == 'table' and type(decoded['job_id']) == 'string' then
+        job_id = decoded['job_id']
+    end
+
+    if job_id and redis.call('DEL', ARGV[1] .. ':cancelled:' .. job_id) == 1 then
+        -- tombstoned while queued, drop it without handing it to a worker
+        if popped then
+            return false
+        end
+    else
+        redis.call('HINCRBY', KEYS[2], 'dequeued', 1)
+        if job_id then
+            local state_key = ARGV[1] .. ':state:' .. job_id
+            redis.call('SET', ARGV[1] .. ':lease:' .. job_id, ARGV[2], 'PX', ARGV[3])
+            redis.call('ZADD', ARGV[1] .. ':leases', math.floor(ARGV[4] * 1000) + ARGV[3], job_id)
+            redis.call('HSET', ARGV[1] .. ':inflight', job_id, job)
+            redis.call('HSET', state_key, 'status', 'processing', 'worker_id', ARGV[2], 'started_at', ARGV[4])
+            redis.call('EXPIRE', state_key, ARGV[5])
+            redis.call('HINCRBY', KEYS[2], 'processing', 1)
+        end
+        return job
+    end
+end
+return false
+"""
+
+# Release the lease, write the final status (completed, failed, cancelled or
+# requeued) and move the counters; failures can also be dead-lettered.
+# KEYS: stats, dead letter queue
+# ARGV: key prefix, job id, now, state ttl, status, error, [dead letter entry]
+_FINISH_SCRIPT = """
+local state_key = ARGV[1] .. ':state:' .. ARGV[2]
+redis.call('DEL', ARGV[1] .. ':lease:' .. ARGV[2])
+redis.call('ZREM', ARGV[1] .. ':leases', ARGV[2])
+redis.call('HDEL', ARGV[1] .. ':inflight', ARGV[2])
+redis.call('HSET', state_key, 'status', ARGV[5], 'finished_at', ARGV[3])
+if ARGV[6] ~= '' then
+    redis.call('HSET', state_key, 'error', ARGV[6])
+end
+redis.call('EXPIRE', state_key, ARGV[4])
+if redis.call('HINCRBY', KEYS[1], 'processing', -1) < 0 then
+    redis.call('HSET', KEYS[1], 'processing', 0)
+end
+redis.call('HINCRBY', KEYS[1], ARGV[5], 1)
+if ARGV[7] then
+    redis.call('LPUSH', KEYS[2], ARGV[7])
+end
+return 1
+"""
+
+# Cancel a job: queued jobs are tombstoned and skipped by claim, in-flight
+# jobs are flagged for their worker (or the reaper, if the worker died).
+# Returns the state the job was in.
+# KEYS: stats   ARGV: key prefix, job id, now, state ttl
+_CANCEL_SCRIPT = """
+local state_key = ARGV[1] .. ':state:' .. ARGV[2]
+local status = redis.call('HGET', state_key, 'status')
+if status == 'completed' or status == 'failed' or status == 'cancelled' then
+    return status
+end
+
+redis.call('SET', ARGV[1] .. ':cancelled:' .. ARGV[2], ARGV[3], 'EX', ARGV[4])
+if status == 'processing' then
+    return 'processing'
+end
+
+redis.call('HSET', state_key, 'status', 'cancelled', 'finished_at', ARGV[3])
+redis.call('EXPIRE', state_key, ARGV[4])
+redis.call('HINCRBY', KEYS[1], 'cancelled', 1)
+return 'queued'
+"""
+
+# Extend the lease of a running job, as long as it is still held by this worker
+# ARGV: key prefix, job id, worker id, lease ms, now
+_EXTEND_SCRIPT = """
+local lease_key = ARGV[1] .. ':lease:' .. ARGV[2]
+if redis.call('GET', lease_key) ~= ARGV[3] then
+    return 0
+end
+redis.call('PEXPIRE', lease_key, ARGV[4])
+redis.call('ZADD', ARGV[1] .. ':leases', math.floor(ARGV[5] * 1000) + ARGV[4], ARGV[2])
+return 1
+"""
+
+# Drop the lease of a job that stays "processing" but is finished by another
+# worker (a coalesced job waiting for its leader)
+# ARGV: key prefix, job id
+_DETACH_SCRIPT = """
+redis.call('DEL', ARGV[1] .. ':lease:' .. ARGV[2])
+redis.call('ZREM', ARGV[1] .. ':leases', ARGV[2])
+redis.call('HDEL', ARGV[1] .. ':inflight', ARGV[2])
+return 1
+"""
+
+# Requeue (or fail, after max attempts) jobs whose lease expired; jobs
+# cancelled meanwhile are marked cancelled. Returns {job id, outcome} pairs.
+# KEYS: stats, queue, dead letter queue
+# ARGV: key prefix, now, limit, max attempts, state ttl, timestamp
+_REAP_SCRIPT = """
+local leases = ARGV[1] .. ':leases'
+local inflight = ARGV[1] .. ':inflight'
+local now_ms = math.floor(ARGV[2] * 1000)
+local reaped = {}
+for _, job_id in ipairs(redis.call('ZRANGEBYSCORE', leases, '-inf', now_ms, 'LIMIT', 0, ARGV[3])) do
+    local ttl = redis.call('PTTL', ARGV[1] .. ':lease:' .. job_id)
+    if ttl > 0 then
+        -- extended after the index was written, move it to the real expiry
+        redis.call('ZADD', leases, now_ms + ttl, job_id)
+    else
+        local job = redis.call('HGET', inflight, job_id)
+        local state_key = ARGV[1] .. ':state:' .. job_id
+        redis.call('ZREM', leases, job_id)
+        redis.call('HDEL', inflight, job_id)
+        if redis.call('HINCRBY', KEYS[1], 'processing', -1) < 0 then
+            redis.call('HSET', KEYS[1], 'processing', 0)
+        end
+
+        local status = 'requeued'
+        if redis.call('DEL', ARGV[1] .. ':cancelled:' .. job_id) == 1 then
+            status = 'cancelled'
+        elseif not job or redis.call('HINCRBY', state_key, 'lease_expirations', 1) > tonumber(ARGV[4]) then
+            status = 'failed'
+            redis.call('HSET', state_key, 'error', 'Job lease expired')
+            if job then
+                redis.call('LPUSH', KEYS[3], cjson.encode({
+                    original_job = job,
+                    error = 'Job lease expired',
+                    worker_id = redis.call('HGET', state_key, 'worker_id') or '',
+                    timestamp = ARGV[6]
+                }))
+            end
+        else
+            redis.call('LPUSH', KEYS[2], job)
+        end
+
+        redis.call('HSET', state_key, 'status', status, 'finished_at', ARGV[2])
+        redis.call('EXPIRE', state_key, ARGV[5])
+        redis.call('HINCRBY', KEYS[1], status, 1)
+        table.insert(reaped, job_id)
+        table.insert(reaped, status)
+    end
+end
+return reaped
+"""
+
+
+class QueueBackend:
+    """
+    Minimal queue interface used by the API and the background worker
+    """
+
+    name = "base"
+
+    async def connect(self):
+        """Open connections / restore state"""
+        pass
+
+    async def close(self):
+        """Release resources"""
+        pass
+
+    async def ping(self) -> bool:
+        """Check that the backend is usable"""
+        raise NotImplementedError
+
+    async def push(self, queue_name: str, job_json: str):
+        """Append a serialized job to a queue"""
+        raise NotImplementedError
+
+    async def pop(self, queue_name: str, timeout: float) -> Optional[str]:
+        """Take the oldest job from a queue, waiting up to timeout seconds"""
+        raise NotImplementedError
+
+    async def length(self, queue_name: str) -> int:
+        """Number of jobs waiting in a queue"""
+        raise NotImplementedError
+
+    async def claim(self, queue_name: str, worker_id: str, timeout: float) -> Optional[str]:
+        """Dequeue a job, lease it to worker_id and mark it processing"""
+        raise NotImplementedError
+
+    async def complete(self, queue_name: str, job_id: str, status: str = "completed"):
+        """Release the job's lease and mark it completed (or cancelled / requeued)"""
+        raise NotImplementedError
+
+    async def fail(self, queue_name: str, job_id: str, error: str, dead_letter: Optional[Dict[str, Any]] = None):
+        """Release the job's lease, mark it failed and optionally dead-letter it"""
+        raise NotImplementedError
+
+    async def extend(self, queue_name: str, job_id: str, worker_id: str) -> bool:
+        """Renew the lease of a running job; False if worker_id no longer holds it"""
+        raise NotImplementedError
+
+    async def detach(self, queue_name: str, job_id: str):
+        """Drop the lease of a job that another worker will complete (it stays processing)"""
+        raise NotImplementedError
+
+    async def reap_expired(self, queue_name: str, max_attempts: int, limit: int = 100) -> Dict[str, str]:
+        """
+        Requeue jobs whose lease expired, fail them after max_attempts expiries.
+        Returns the outcome per reaped job id ("requeued", "failed" or "cancelled")
+        """
+        raise NotImplementedError
+
+    async def cancel(self, queue_name: str, job_id: str) -> str:
+        """
+        Cancel a job. Returns "queued" (job will be skipped), "processing"
+        (worker will abort it) or the final status if it already finished
+        """
+        raise NotImplementedError
+
+    async def is_cancelled(self, queue_name: str, job_id: str) -> bool:
+        """Whether cancellation was requested for an in-flight job"""
+        raise NotImplementedError
+
+    async def get_job_state(self, queue_name: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Live state of a job (status, worker_id, timestamps) if known"""
+        raise NotImplementedError
+
+    async def get_job_states(self, queue_name: str, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Live states of several jobs (unknown jobs are left out)"""
+        states = {}
+        for job_id in job_ids:
+            state = await self.get_job_state(queue_name, job_id)
+            if state:
+                states[job_id] = state
+        return states
+
+    async def get_counters(self, queue_name: str) -> Dict[str, int]:
+        """Job counters (dequeued, processing, completed, failed)"""
+        raise NotImplementedError
+
+
+class RedisQueueBackend(QueueBackend):
+    """
+    Redis list backed queue (LPUSH on enqueue, BRPOP on dequeue)
+    """
+
+    name = "redis"
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url or REDIS_URL
+        self.client = None
+        self._claim_script = None
+        self._finish_script = None
+        self._cancel_script = None
+        self._extend_script = None
+        self._detach_script = None
+        self._reap_script = None
+
+    async def connect(self):
+        self.client = await aioredis.from_url(self.redis_url)
+        await self.client.ping()
+        self._claim_script = self.client.register_script(_CLAIM_SCRIPT)
+        self._finish_script = self.client.register_script(_FINISH_SCRIPT)
+        self._cancel_script = self.client.register_script(_CANCEL_SCRIPT)
+        self._extend_script = self.client.register_script(_EXTEND_SCRIPT)
+        self._detach_script = self.client.register_script(_DETACH_SCRIPT)
+        self._reap_script = self.client.register_script(_REAP_SCRIPT)
+        logger.info(f"Connected to Redis: {self.redis_url}")
+
+    async def close(self):
+        if self.client:
+            await self.client.close()
+            self.client = None
+            logger.info("Redis connection closed")
+
+    async def ping(self) -> bool:
+        return bool(await self.client.ping())
+
+    async def push(self, queue_name: str, job_json: str):
+        await self.client.lpush(queue_name, job_json)
+
+    async def pop(self, queue_name: str, timeout: float) -> Optional[str]:
+        # BRPOP only accepts whole seconds; 0 would block forever
+        job_data = await self.client.brpop(queue_name, timeout=max(int(timeout), 1))
+        if not job_data:
+            return None
+        _, job_json = job_data
+        return job_json.decode() if isinstance(job_json, bytes) else job_json
+
+    async def length(self, queue_name: str) -> int:
+        return await self.client.llen(queue_name)
+
+    async def claim(self, queue_name: str, worker_id: str, timeout: float) -> Optional[str]:
+        args = [queue_name, worker_id, JOB_LEASE_SECONDS * 1000, time.time(), JOB_STATE_TTL]
+
+        # Fast path: one round trip while the queue has work
+        job_json = await self._claim_script(keys=[queue_name, f"{queue_name}:stats"], args=args)
+
+        if job_json is None:
+            # Idle: block until a job arrives, then lease the popped job
+            popped = await self.pop(queue_name, timeout)
+            if popped is None:
+                return None
+            job_json = await self._claim_script(
+                keys=[queue_name, f"{queue_name}:stats"],
+                args=args + [popped]
+            )
+
+        return job_json.decode() if isinstance(job_json, bytes) else job_json
+
+    async def complete(self, queue_name: str, job_id: str, status: str = "completed"):
+        await self._finish(queue_name, job_id, status)
+
+    async def fail(self, queue_name: str, job_id: str, error: str, dead_letter: Optional[Dict[str, Any]] = None):
+        await self._finish(queue_name, job_id, "failed", error, dead_letter)
+
+    async def extend(self, queue_name: str, job_id: str, worker_id: str) -> bool:
+        return bool(await self._extend_script(
+            args=[queue_name, job_id, worker_id, JOB_LEASE_SECONDS * 1000, time.time()]
+        ))
+
+    async def detach(self, queue_name: str, job_id: str):
+        await self._detach_script(args=[queue_name, job_id])
+
+    async def reap_expired(self, queue_name: str, max_attempts: int, limit: int = 100) -> Dict[str, str]:
+        reaped = await self._reap_script(
+            keys=[f"{queue_name}:stats", queue_name, f"{queue_name}:failed"],
+            args=[queue_name, time.time(), limit, max_attempts, JOB_STATE_TTL, datetime.utcnow().isoformat()]
+        )
+        reaped = [item.decode() if isinstance(item, bytes) else item for item in reaped]
+        return dict(zip(reaped[::2], reaped[1::2]))
+
+    async def cancel(self, queue_name: str, job_id: str) -> str:
+        outcome = await self._cancel_script(
+            keys=[f"{queue_name}:stats"],
+            args=[queue_name, job_id, time.time(), JOB_STATE_TTL]
+        )
+        return outcome.decode() if isinstance(outcome, bytes) else outcome
+
+    async def is_cancelled(self, queue_name: str, job_id: str) -> bool:
+        return bool(await self.client.exists(f"{queue_name}:cancelled:{job_id}"))
+
+    async def _finish(
+        self,
+        queue_name: str,
+        job_id: str,
+        status: str,
+        error: str = "",
+        dead_letter: Optional[Dict[str, Any]] = None
+    ):
+        args = [queue_name, job_id, time.time(), JOB_STATE_TTL, status, error]
+        if dead_letter is not None:
+            args.append(json.dumps(dead_letter))
+
+        await self._finish_script(keys=[f"{queue_name}:stats", f"{queue_name}:failed"], args=args)
+
+    async def get_job_state(self, queue_name: str, job_id: str) -> Optional[Dict[str, Any]]:
+        state = await self.client.hgetall(f"{queue_name}:state:{job_id}")
+        return self._decode_state(state) if state else None
+
+    async def get_job_states(self, queue_name: str, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        # One pipelined round trip for a whole page of jobs
+        async with self.client.pipeline(transaction=False) as pipe:
+            for job_id in job_ids:
+                pipe.hgetall(f"{queue_name}:state:{job_id}")
+            states = await pipe.execute()
+        return {job_id: self._decode_state(state) for job_id, state in zip(job_ids, states) if state}
+
+    @staticmethod
+    def _decode_state(state: Dict[Any, Any]) -> Dict[str, Any]:
+        return {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in state.items()
+        }
+
+    async def get_counters(self, queue_name: str) -> Dict[str, int]:
+        counters = await self.client.hgetall(f"{queue_name}:stats")
+        return {
+            (k.decode() if isinstance(k, bytes) else k): int(v)
+            for k, v in counters.items()
+        }
+
+
+class LocalQueueBackend(QueueBackend):
+    """
+    In-process queue for single-node deployments
+
+    Jobs are kept in one asyncio.Queue per queue name. Every push is first
+    written to a SQLite journal (WAL mode). Claimed jobs keep their journal
+    entry until they complete or fail, so both queued jobs and jobs that were
+    running when the process died are queued again on restart.
+    The API and the workers must run in the same process to share the queue.
+    """
+
+    name = "local"
+
+    def __init__(self, journal_path: Optional[str] = None):
+        self.journal_path = journal_path or QUEUE_JOURNAL_PATH
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        # job key -> tombstone time, oldest first; expire after JOB_STATE_TTL like in Redis
+        self._cancelled: Dict[str, float] = {}
+        # keys of jobs in a final status, oldest first; only these are evicted
+        self._finished: Dict[str, None] = {}
+        # job key -> (worker id, lease expiry, job json)
+        self._leases: Dict[str, Tuple[str, float, str]] = {}
+        # job key -> journal entry of a claimed job, deleted when it finishes
+        self._entries: Dict[str, int] = {}
+        self._conn: Optional[sqlite3.Connection] = None
+        # SQLite connections are bound to their thread; a single worker thread
+        # serializes journal writes and keeps them off the event loop
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def connect(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="queue-journal")
+        pending = await self._run(self._open_journal)
+
+        for entry_id, queue_name, job_json in pending:
+            self._get_queue(queue_name).put_nowait((entry_id, job_json))
+
+        logger.info(
+            f"Local queue journal opened at {self.journal_path} "
+            f"({len(pending)} queued or interrupted jobs restored)"
+        )
+
+    async def close(self):
+        if self._executor:
+            await self._run(self._close_journal)
+            self._executor.shutdown(wait=True)
+            self._executor = None
+            logger.info("Local queue journal closed")
+
+    async def ping(self) -> bool:
+        return self._conn is not None
+
+    async def push(self, queue_name: str, job_json: str):
+        entry_id = await self._run(self._journal_insert, queue_name, job_json)
+        self._get_queue(queue_name).put_nowait((entry_id, job_json))
+
+    async def pop(self, queue_name: str, timeout: float) -> Optional[str]:
+        entry = await self._take(queue_name, timeout)
+        if entry is None:
+            return None
+
+        entry_id, job_json = entry
+        await self._run(self._journal_delete, entry_id)
+        return job_json
+
+    async def length(self, queue_name: str) -> int:
+        return self._get_queue(queue_name).qsize()
+
+    async def claim(self, queue_name: str, worker_id: str, timeout: float) -> Optional[str]:
+        deadline = time.monotonic() + timeout
+
+        while True:
+            entry = await self._take(queue_name, max(deadline - time.monotonic(), 0))
+            if entry is None:
+                return None
+
+            entry_id, job_json = entry
+            try:
+                job_id = json.loads(job_json).get("job_id")
+            except (ValueError, AttributeError):
+                job_id = None
+
+            # Tombstoned while queued: drop it without handing it to a worker
+            self._expire_tombstones()
+            if job_id and self._cancelled.pop(f"{queue_name}:{job_id}", None):
+                await self._run(self._journal_delete, entry_id)
+                continue
+
+            counters = self._get_counters(queue_name)
+            counters["dequeued"] += 1
+
+            if job_id:
+                key = f"{queue_name}:{job_id}"
+                state = self._states.setdefault(key, {})
+                state.update(status="processing", worker_id=worker_id, started_at=str(time.time()))
+                self._finished.pop(key, None)
+                self._leases[key] = (worker_id, time.time() + JOB_LEASE_SECONDS, job_json)
+                self._entries[key] = entry_id
+                counters["processing"] += 1
+            else:
+                # Without a job id it can never be completed, so it is not journaled
+                await self._run(self._journal_delete, entry_id)
+
+            return job_json
+
+    async def complete(self, queue_name: str, job_id: str, status: str = "completed"):
+        self._cancelled.pop(f"{queue_name}:{job_id}", None)
+        await self._finish(queue_name, job_id, status)
+
+    async def fail(self, queue_name: str, job_id: str, error: str, dead_letter: Optional[Dict[str, Any]] = None):
+        self._cancelled.pop(f"{queue_name}:{job_id}", None)
+        # Dead-letter before dropping the journal entry, so a crash in between keeps the job
+        if dead_letter is not None:
+            await self.push(f"{queue_name}:failed", json.dumps(dead_letter))
+        await self._finish(queue_name, job_id, "failed", error=error)
+
+    async def extend(self, queue_name: str, job_id: str, worker_id: str) -> bool:
+        key = f"{queue_name}:{job_id}"
+        lease = self._leases.get(key)
+        if not lease or lease[0] != worker_id:
+            return False
+        self._leases[key] = (worker_id, time.time() + JOB_LEASE_SECONDS, lease[2])
+        return True
+
+    async def detach(self, queue_name: str, job_id: str):
+        self._leases.pop(f"{queue_name}:{job_id}", None)
+
+    async def reap_expired(self, queue_name: str, max_attempts: int, limit: int = 100) -> Dict[str, str]:
+        now = time.time()
+        prefix = f"{queue_name}:"
+        expired = [
+            key for key, (_, expires_at, _) in self._leases.items()
+            if key.startswith(prefix) and expires_at <= now
+        ][:limit]
+
+        reaped = {}
+        for key in expired:
+            worker_id, _, job_json = self._leases.pop(key)
+            job_id = key[len(prefix):]
+            state = self._states.setdefault(key, {})
+            state["lease_expirations"] = int(state.get("lease_expirations", 0)) + 1
+
+            # Push first: _finish updates the state before it yields, so a worker
+            # claiming the requeued job cannot be overwritten by "requeued"
+            if self._cancelled.pop(key, None):
+                reaped[job_id] = "cancelled"
+                await self._finish(queue_name, job_id, "cancelled")
+            elif state["lease_expirations"] > max_attempts:
+                reaped[job_id] = "failed"
+                await self.push(f"{queue_name}:failed", json.dumps({
+                    "original_job": job_json,
+                    "error": "Job lease expired",
+                    "worker_id": worker_id,
+                    "timestamp": datetime.utcnow().isoformat()
+                }))
+                await self._finish(queue_name, job_id, "failed", error="Job lease expired")
+            else:
+                reaped[job_id] = "requeued"
+                await self.push(queue_name, job_json)
+                await self._finish(queue_name, job_id, "requeued")
+        return reaped
+
+    async def cancel(self, queue_name: str, job_id: str) -> str:
+        key = f"{queue_name}:{job_id}"
+        status = self._states.get(key, {}).get("status")
+        if status in FINAL_STATUSES:
+            return status
+
+        self._expire_tombstones()
+        self._cancelled.pop(key, None)
+        self._cancelled[key] = time.time()
+        if status == "processing":
+            return "processing"
+
+        self._states[key] = {"status": "cancelled", "finished_at": str(time.time())}
+        self._mark_finished(key)
+        self._get_counters(queue_name)["cancelled"] += 1
+        return "queued"
+
+    async def is_cancelled(self, queue_name: str, job_id: str) -> bool:
+        self._expire_tombstones()
+        return f"{queue_name}:{job_id}" in self._cancelled
+
+    async def get_job_state(self, queue_name: str, job_id: str) -> Optional[Dict[str, Any]]:
+        state = self._states.get(f"{queue_name}:{job_id}")
+        return dict(state) if state else None
+
+    async def get_job_states(self, queue_name: str, job_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        states = {job_id: self._states.get(f"{queue_name}:{job_id}") for job_id in job_ids}
+        return {job_id: dict(state) for job_id, state in states.items() if state}
+
+    async def get_counters(self, queue_name: str) -> Dict[str, int]:
+        return dict(self._get_counters(queue_name))
+
+    async def _finish(self, queue_name: str, job_id: str, status: str, **fields):
+        key = f"{queue_name}:{job_id}"
+        self._leases.pop(key, None)
+        entry_id = self._entries.pop(key, None)
+        state = self._states.setdefault(key, {})
+        state.update(status=status, finished_at=str(time.time()), **fields)
+
+        counters = self._get_counters(queue_name)
+        counters["processing"] = max(counters["processing"] - 1, 0)
+        counters[status] = counters.get(status, 0) + 1
+
+        if status in FINAL_STATUSES:
+            self._mark_finished(key)
+
+        if entry_id is not None:
+            await self._run(self._journal_delete, entry_id)
+
+    def _mark_finished(self, key: str):
+        self._finished.pop(key, None)
+        self._finished[key] = None
+
+        # Bound memory like the Redis state TTL does: drop the oldest finished
+        # states, queued and running jobs keep their live status
+        while len(self._states) > LOCAL_STATE_LIMIT and self._finished:
+            oldest = next(iter(self._finished))
+            del self._finished[oldest]
+            self._states.pop(oldest, None)
+
+    def _expire_tombstones(self):
+        cutoff = time.time() - JOB_STATE_TTL
+        while self._cancelled:
+            key, cancelled_at = next(iter(self._cancelled.items()))
+            if cancelled_at > cutoff:
+                break
+            del self._cancelled[key]
+
+    def _get_counters(self, queue_name: str) -> Dict[str, int]:
+        if queue_name not in self._counters:
+            self._counters[queue_name] = {
+                "dequeued": 0, "processing": 0, "completed": 0, "failed": 0, "cancelled": 0
+            }
+        return self._counters[queue_name]
+
+    async def _take(self, queue_name: str, timeout: float) -> Optional[Tuple[int, str]]:
+        """Oldest (journal entry id, job json) of a queue; the journal entry is kept"""
+        try:
+            return await asyncio.wait_for(self._get_queue(queue_name).get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def _get_queue(self, queue_name: str) -> asyncio.Queue:
+        if queue_name not in self._queues:
+            self._queues[queue_name] = asyncio.Queue()
+        return self._queues[queue_name]
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    # Journal operations (executed on the journal thread)
+
+    def _open_journal(self) -> List[Tuple[int, str, str]]:
+        self._conn = sqlite3.connect(self.journal_path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL is durable across application crashes in WAL mode
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS queue_journal (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue_name TEXT NOT NULL,
+                job_json TEXT NOT NULL,
+                enqueued_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+        cursor = self._conn.execute(
+            "SELECT id, queue_name, job_json FROM queue_journal ORDER BY id"
+        )
+        return cursor.fetchall()
+
+    def _close_journal(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+    def _journal_insert(self, queue_name: str, job_json: str) -> int:
+        cursor = self._conn.execute(
+            "INSERT INTO queue_journal (queue_name, job_json, enqueued_at) VALUES (?, ?, ?)",
+            (queue_name, job_json, time.time())
+        )
+        self._conn.commit()
+        return cursor.lastrowid
+
+    def _journal_delete(self, entry_id: int):
+        self._conn.execute("DELETE FROM queue_journal WHERE id = ?", (entry_id,))
+        self._conn.commit()
+
+
+def create_queue_backend(backend: Optional[str] = None) -> QueueBackend:
+    """Create a queue backend from configuration"""
+    backend = (backend or QUEUE_BACKEND).lower()
+
+    if backend == "local":
+        return LocalQueueBackend()
+    if backend == "redis":
+        return RedisQueueBackend()
+
+    raise ValueError(f"Unknown queue backend: {backend}")
+
+
+# Process-wide backend shared by the API and embedded workers
+_queue_backend: Optional[QueueBackend] = None
+
+
+async def get_queue_backend() -> QueueBackend:
+    """Get (and connect on first use) the process-wide queue backend"""
+    global _queue_backend
+
+    if _queue_backend is None:
+        backend = create_queue_backend()
+        await backend.connect()
+        _queue_backend = backend
+
+    return _queue_backend
+
+
+async def close_queue_backend():
+    """Close the process-wide queue backend"""
+    global _queue_backend
+
+    if _queue_backend:
+        await _queue_backend.close()
+        _queue_backend = None
@@ -237,6 +237,12 @@ class DocumentProcessor {
             // Show upload progress
             this.showUploadProgress(file.name);
 
+            // Complete processing streams its intermediate results
+            if (processingMethod === 'complete') {
+                await this.streamProcessing('/api/process/complete/stream', formData, file.name);
+                return;
+            }
+
             let endpoint;
             switch (processingMethod) {
                 case 'vision-only':
@@ -276,6 +282,143 @@ class DocumentProcessor {
         }
     }
 
+    async streamProcessing(endpoint, formData, filename) {
+        const response = await fetch(endpoint, {
+            method: 'POST',
+            body: formData,
+            headers: { 'Accept': 'text/event-stream' }
+        });
+
+        if (!response.ok || !response.body) {
+            this.showUploadError('Upload fehlgeschlagen');
+            return;
+        }
+
+        const state = { filename, stage: 'Texterkennung läuft', progress: 25, fields: {} };
+        this.showStreamProgress(state);
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
+
+            for (const raw of events) {
+                const event = this.parseServerSentEvent(raw);
+                if (event && this.handleStreamEvent(event, state)) {
+                    return;
+                }
+            }
+        }
+    }
+
+    parseServerSentEvent(raw) {
+        let type = 'message';
+        const data = [];
+
+        raw.split('\n').forEach(line => {
+            if (line.startsWith('event:')) type = line.slice(6).trim();
+            else if (line.startsWith('data:')) data.push(line.slice(5).trim());
+        });
+
+        if (data.length === 0) return null;
+        try {
+            return { type, data: JSON.parse(data.join('\n')) };
+        } catch (error) {
+            return null;
+        }
+    }
+
+    // Returns true once the stream has finished (result or error)
+    handleStreamEvent(event, state) {
+        switch (event.type) {
+            case 'ocr':
+                state.stage = `Text erkannt (${event.data.characters} Zeichen), Analyse läuft`;
+                state.progress = 40;
+                break;
+            case 'doc_type':
+                state.docType = event.data.doc_type;
+                state.progress = Math.max(state.progress, 60);
+                break;
+            case 'event_type':
+                state.eventType = event.data.event_type;
+                state.progress = Math.max(state.progress, 75);
+                break;
+            case 'field':
+                state.fields[event.data.name] = event.data.value;
+                state.stage = 'Daten werden extrahiert';
+                state.progress = Math.min(95, Math.max(state.progress, 80) + 2);
+                break;
+            case 'escalated':
+                // A stronger model redoes the extraction and reports the fields again
+                state.fields = {};
+                state.stage = `Nachbearbeitung mit ${event.data.model}`;
+                break;
+            case 'result':
+                this.showUploadSuccess({ job_id: event.data.document_id, status: event.data.status });
+                setTimeout(() => {
+                    this.loadDocuments();
+                }, 500);
+                return true;
+            case 'error':
+                this.showUploadError(event.data.error || 'Verarbeitung fehlgeschlagen');
+                return true;
+        }
+
+        this.showStreamProgress(state);
+        return false;
+    }
+
+    showStreamProgress(state) {
+        const queue = document.getElementById('processing-queue');
+        if (!queue) return;
+
+        // Only static markup goes through innerHTML; file name, stage, types and
+        // extracted fields come from the document and are set as text
+        queue.innerHTML = `
+            <div class="processing-item">
+                <div class="processing-header">
+                    <span class="processing-name"></span>
+                    <span class="processing-status processing"></span>
+                </div>
+                <div class="processing-progress">
+                    <div class="progress-bar"></div>
+                </div>
+                <div class="processing-meta">
+                    <span class="stream-doc-type"></span>
+                    <span class="stream-event-type"></span>
+                </div>
+            </div>
+        `;
+
+        queue.querySelector('.processing-name').textContent = state.filename;
+        queue.querySelector('.processing-status').textContent = state.stage;
+        queue.querySelector('.progress-bar').style.width = `${Number(state.progress) || 0}%`;
+        queue.querySelector('.stream-doc-type').textContent = `Dokumenttyp: ${state.docType || '…'}`;
+        queue.querySelector('.stream-event-type').textContent = `Event-Typ: ${state.eventType || '…'}`;
+
+        const entries = Object.entries(state.fields);
+        if (entries.length === 0) return;
+
+        const fields = document.createElement('div');
+        fields.className = 'processing-meta';
+        entries.forEach(([name, value]) => {
+            const row = document.createElement('div');
+            const label = document.createElement('strong');
+            label.textContent = `${name}:`;
+            row.appendChild(label);
+            row.appendChild(document.createTextNode(` ${typeof value === 'object' ? JSON.stringify(value) : value}`));
+            fields.appendChild(row);
+        });
+        queue.querySelector('.processing-item').appendChild(fields);
+    }
+
     showUploadProgress(filename) {
         const queue = document.getElementById('processing-queue');
         if (!queue) return;
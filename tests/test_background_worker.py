@@ -0,0 +1,112 @@
+"""
+Tests for the background worker's job flow (queue bookkeeping, no database)
+"""
+
+import json
+import time
+
+import pytest
+
+from app.utils.deadline import check_deadline
+from app.worker import background_worker
+from app.worker.background_worker import BackgroundWorker
+from app.worker.queue_backend import LocalQueueBackend
+
+
+@pytest.fixture
+def stored(monkeypatch):
+    """Fixture replacing ML calls and the database write; records stored results"""
+    results = []
+
+    async def degraded(content):
+        return {"doc_type": "invoice", "confidence": 0.4, "degraded": True}
+
+    async def full(content):
+        return {"doc_type": "invoice", "confidence": 0.9}
+
+    async def store(self, job_id, prediction, processing_time):
+        results.append((job_id, prediction))
+        return True
+
+    monkeypatch.setattr(background_worker, "predict_with_fallback", degraded)
+    monkeypatch.setattr(background_worker, "predict_document", full)
+    monkeypatch.setattr(BackgroundWorker, "_store_results", store)
+    return results
+
+
+class TestRescoring:
+    """Test re-scoring of degraded results"""
+
+    @pytest.mark.asyncio
+    async def test_rescore_is_counted_apart_from_main_queue(self, tmp_path, stored):
+        backend = LocalQueueBackend(str(tmp_path / "queue.db"))
+        await backend.connect()
+        worker = BackgroundWorker(queue_backend=backend, install_signal_handlers=False)
+
+        try:
+            await backend.push("doc_jobs", json.dumps({"job_id": "job-1", "payload": {"text": "Invoice 42"}}))
+            await worker._process_job(json.loads(await backend.claim("doc_jobs", worker.worker_id, timeout=1)))
+            assert await backend.length("doc_jobs:rescore") == 1
+
+            await worker._drain_rescore_queue()
+
+            assert [prediction.get("degraded", False) for _, prediction in stored] == [True, False]
+            main = await backend.get_counters("doc_jobs")
+            rescore = await backend.get_counters("doc_jobs:rescore")
+            assert (main["dequeued"], main["completed"], main["processing"]) == (1, 1, 0)
+            assert (rescore["dequeued"], rescore["completed"], rescore["processing"]) == (1, 1, 0)
+            assert await backend.length("doc_jobs") == 0
+        finally:
+            await backend.close()
+
+
+    @pytest.mark.asyncio
+    async def test_failing_rescore_gives_up_after_max_retries(self, tmp_path, stored, monkeypatch):
+        async def broken(content):
+            raise ValueError("unreadable document")
+
+        monkeypatch.setattr(background_worker, "predict_document", broken)
+        backend = LocalQueueBackend(str(tmp_path / "queue.db"))
+        await backend.connect()
+        worker = BackgroundWorker(queue_backend=backend, install_signal_handlers=False)
+        worker.max_retries = 2
+
+        try:
+            await backend.push("doc_jobs:rescore", json.dumps({"job_id": "job-1", "payload": {"text": "?"}, "rescore": True}))
+            for _ in range(5):
+                await worker._drain_rescore_queue()
+
+            rescore = await backend.get_counters("doc_jobs:rescore")
+            assert (rescore["dequeued"], rescore["requeued"], rescore["failed"]) == (3, 2, 1)
+            assert await backend.length("doc_jobs:rescore") == 0
+            assert stored == []
+        finally:
+            await backend.close()
+
+class TestDeadlines:
+    """Test jobs that are already past their SLA deadline"""
+
+    @pytest.mark.asyncio
+    async def test_late_gcs_job_is_fetched_and_degraded(self, tmp_path, stored, monkeypatch):
+        fetched = []
+
+        async def fetch(gcs_uri):
+            check_deadline("GCS fetch")
+            fetched.append(gcs_uri)
+            return {"text": "Invoice 42"}
+
+        monkeypatch.setattr(background_worker, "fetch_from_gcs", fetch)
+        backend = LocalQueueBackend(str(tmp_path / "queue.db"))
+        await backend.connect()
+        worker = BackgroundWorker(queue_backend=backend, install_signal_handlers=False)
+
+        try:
+            job = {"job_id": "job-1", "gcs_uri": "gs://bucket/doc.json", "deadline": time.time() - 600}
+            await backend.push("doc_jobs", json.dumps(job))
+            await worker._process_job(json.loads(await backend.claim("doc_jobs", worker.worker_id, timeout=1)))
+
+            assert fetched == ["gs://bucket/doc.json"]
+            assert [job_id for job_id, _ in stored] == ["job-1"]
+            assert (await backend.get_job_state("doc_jobs", "job-1"))["status"] == "completed"
+        finally:
+            await backend.close()
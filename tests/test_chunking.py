@@ -0,0 +1,94 @@
+"""
+Tests for sliding-window prediction of long documents
+"""
+
+import pytest
+
+from app.ml_client.chunking import split_windows, merge_window_predictions, predict_chunked
+
+
+def test_split_windows_cover_text_with_overlap():
+    """Windows stay within size, overlap and reassemble the full text"""
+    text = " ".join(f"word{i}" for i in range(200))
+    windows = split_windows(text, size=100, overlap=20)
+
+    assert all(len(window) <= 100 for _, window in windows)
+    assert windows[0][0] == 0
+    for (start, window), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start < start + len(window)  # overlapping
+        assert text[start:start + len(window)] == window
+
+    last_start, last_window = windows[-1]
+    assert last_start + len(last_window) == len(text)
+
+
+def test_short_text_is_single_window():
+    """Text within the window size is not split"""
+    assert split_windows("short text", size=100, overlap=20) == [(0, "short text")]
+
+
+def test_merge_shifts_offsets_and_drops_overlap_duplicates():
+    """Entities get document offsets; the overlap copy with lower confidence is dropped"""
+    merged = merge_window_predictions([
+        (0, "a" * 100, {
+            "doc_type": "contract", "event_type": "legal", "confidence": 0.9,
+            "entities": [{"type": "date", "text": "2024-01-01", "confidence": 0.7, "start_pos": 85, "end_pos": 95}]
+        }),
+        (80, "b" * 100, {
+            "doc_type": "contract", "event_type": "legal", "confidence": 0.8,
+            "entities": [
+                {"type": "date", "text": "2024-01-01", "confidence": 0.9, "start_pos": 5, "end_pos": 15},
+                {"type": "amount", "text": "500 EUR", "confidence": 0.8, "start_pos": 50, "end_pos": 57}
+            ]
+        })
+    ])
+
+    assert [(e["type"], e["start_pos"], e["confidence"]) for e in merged["entities"]] == [
+        ("date", 85, 0.9),
+        ("amount", 130, 0.8)
+    ]
+    assert merged["doc_type"] == "contract"
+    assert merged["confidence"] == pytest.approx(0.85)
+
+
+def test_merge_keeps_overlapping_spans_of_one_window():
+    """Nested spans the model returned for one window are not duplicates"""
+    merged = merge_window_predictions([
+        (0, "a" * 100, {
+            "doc_type": "contract", "event_type": "legal", "confidence": 0.9,
+            "entities": [
+                {"type": "organization", "text": "Acme Holding GmbH", "confidence": 0.9, "start_pos": 10, "end_pos": 27},
+                {"type": "organization", "text": "Acme", "confidence": 0.6, "start_pos": 10, "end_pos": 14}
+            ]
+        }),
+        (80, "b" * 100, {"doc_type": "contract", "event_type": "legal", "confidence": 0.9, "entities": []})
+    ])
+
+    assert sorted(e["text"] for e in merged["entities"]) == ["Acme", "Acme Holding GmbH"]
+
+
+def test_merge_votes_by_confidence_and_length():
+    """A long confident window outvotes a short one"""
+    merged = merge_window_predictions([
+        (0, "x" * 900, {"doc_type": "contract", "event_type": "legal", "confidence": 0.8, "entities": []}),
+        (800, "y" * 100, {"doc_type": "invoice", "event_type": "billing", "confidence": 0.95, "entities": []})
+    ])
+
+    assert merged["doc_type"] == "contract"
+    assert merged["event_type"] == "legal"
+
+
+@pytest.mark.asyncio
+async def test_predict_chunked_predicts_every_window():
+    """Each window is sent with its offset in the metadata"""
+    seen = []
+
+    async def predict_window(payload):
+        seen.append(payload["metadata"]["chunk_offset"])
+        return {"doc_type": "report", "event_type": "general", "confidence": 0.6, "entities": []}
+
+    result = await predict_chunked("lorem ipsum " * 50, {"source": "test"}, predict_window, size=200, overlap=20)
+
+    assert result["chunks"] == len(seen) > 1
+    assert seen[0] == 0
+    assert result["doc_type"] == "report"
@@ -0,0 +1,132 @@
+"""
+Tests for in-flight job coalescing (in-process and Redis lock tables)
+"""
+
+import json
+
+import pytest
+
+from app.worker.coalescing import JobCoalescer, source_key_for_job
+
+
+def _job(job_id, uri="gs://bucket/doc.pdf"):
+    return json.dumps({"job_id": job_id, "gcs_uri": uri})
+
+
+@pytest.fixture
+def redis_client():
+    """Fixture providing an in-memory Redis with Lua support"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.aioredis.FakeRedis()
+
+
+class TestSourceKey:
+    """Test the coalescing key of a job"""
+
+    def test_same_uri_same_key(self):
+        assert source_key_for_job({"gcs_uri": "gs://a/b"}) == source_key_for_job({"gcs_uri": "gs://a/b"})
+
+    def test_payload_key_ignores_field_order(self):
+        first = source_key_for_job({"payload": {"text": "x", "title": "y"}})
+        second = source_key_for_job({"payload": {"title": "y", "text": "x"}})
+        assert first == second
+
+    def test_no_source(self):
+        assert source_key_for_job({"job_id": "job-1"}) is None
+
+
+class TestLocalCoalescer:
+    """Test the in-process lock table"""
+
+    @pytest.mark.asyncio
+    async def test_fan_out_to_waiters(self):
+        coalescer = JobCoalescer()
+
+        leader = await coalescer.acquire("key", "job-1", _job("job-1"))
+        first = await coalescer.acquire("key", "job-2", _job("job-2"))
+        second = await coalescer.acquire("key", "job-3", _job("job-3"))
+
+        assert leader.is_leader
+        assert not first.is_leader and not second.is_leader
+        assert await coalescer.release(leader) == ["job-2", "job-3"]
+        assert await coalescer.release(first) == []
+
+    @pytest.mark.asyncio
+    async def test_next_job_leads_after_release(self):
+        coalescer = JobCoalescer()
+
+        await coalescer.release(await coalescer.acquire("key", "job-1", _job("job-1")))
+        lease = await coalescer.acquire("key", "job-2", _job("job-2"))
+
+        assert lease.is_leader
+        assert await coalescer.release(lease) == []
+
+
+class TestRedisCoalescer:
+    """Test the Redis lock, token-scoped waiter lists and orphan reaping"""
+
+    @pytest.mark.asyncio
+    async def test_fan_out_to_waiters(self, redis_client):
+        coalescer = JobCoalescer(redis_client)
+
+        leader = await coalescer.acquire("key", "job-1", _job("job-1"))
+        waiter = await coalescer.acquire("key", "job-2", _job("job-2"))
+
+        assert leader.is_leader and leader.token
+        assert not waiter.is_leader
+        assert await coalescer.release(leader) == ["job-2"]
+        assert await redis_client.keys("doc_jobs:coalesce:lock:*") == []
+
+        # The lock is free again
+        lease = await coalescer.acquire("key", "job-3", _job("job-3"))
+        assert lease.is_leader
+        await coalescer.release(lease)
+
+    @pytest.mark.asyncio
+    async def test_later_leader_does_not_drain_earlier_waiters(self, redis_client):
+        """A leader whose lock expired keeps its waiters; the next leader only gets its own"""
+        coalescer = JobCoalescer(redis_client)
+
+        stale = await coalescer.acquire("key", "job-1", _job("job-1"))
+        await coalescer.acquire("key", "job-2", _job("job-2"))
+        await redis_client.delete("doc_jobs:coalesce:lock:key")  # lock expired
+
+        current = await coalescer.acquire("key", "job-3", _job("job-3"))
+        await coalescer.acquire("key", "job-4", _job("job-4"))
+
+        assert current.is_leader
+        assert await coalescer.release(current) == ["job-4"]
+        assert await coalescer.release(stale) == ["job-2"]
+
+    @pytest.mark.asyncio
+    async def test_refresh_extends_lock(self, redis_client):
+        coalescer = JobCoalescer(redis_client, lock_ttl=5)
+
+        lease = await coalescer.acquire("key", "job-1", _job("job-1"))
+        await redis_client.pexpire("doc_jobs:coalesce:lock:key", 100)
+
+        assert await coalescer.refresh(lease)
+        assert await redis_client.pttl("doc_jobs:coalesce:lock:key") > 1000
+
+        # A lost lock is reported and not taken back
+        await redis_client.delete("doc_jobs:coalesce:lock:key")
+        assert not await coalescer.refresh(lease)
+        assert not await redis_client.exists("doc_jobs:coalesce:lock:key")
+
+    @pytest.mark.asyncio
+    async def test_reap_orphans_of_expired_leader(self, redis_client, monkeypatch):
+        coalescer = JobCoalescer(redis_client, lock_ttl=5)
+
+        await coalescer.acquire("key", "job-1", _job("job-1"))
+        await coalescer.acquire("key", "job-2", _job("job-2"))
+
+        # Lock still held: nothing to reap
+        assert await coalescer.reap_orphans() == []
+
+        await redis_client.delete("doc_jobs:coalesce:lock:key")  # leader crashed
+        monkeypatch.setattr(JobCoalescer, "_now_ms", staticmethod(lambda: 2 ** 50))
+
+        orphans = await coalescer.reap_orphans()
+        assert [json.loads(orphan)["job_id"] for orphan in orphans] == ["job-2"]
+        assert await coalescer.reap_orphans() == []
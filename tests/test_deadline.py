@@ -0,0 +1,51 @@
+"""
+Tests for SLA-based job deadlines
+"""
+
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+from app.utils.deadline import (
+    DeadlineExceeded,
+    bounded_timeout,
+    check_deadline,
+    compute_deadline,
+    deadline_for_job,
+    deadline_scope
+)
+
+
+def test_deadline_follows_event_type_sla():
+    """Deadline is ingest time plus the event type's SLA; unknown types use the default"""
+    assert compute_deadline(1000.0, "urgent") == 1000.0 + 5 * 60
+    assert compute_deadline(1000.0, "billing") == 1000.0 + 30 * 60
+    assert compute_deadline(1000.0, "no-such-type") == 1000.0 + 60 * 60
+    assert deadline_for_job({"deadline": 42}) == 42.0
+
+
+def test_naive_job_timestamp_is_utc():
+    """Timestamps written with datetime.utcnow() are read as UTC, whatever the local zone"""
+    ingested = datetime(2024, 5, 1, 12, 0, 0)
+    expected = compute_deadline(ingested.replace(tzinfo=timezone.utc).timestamp(), "billing")
+    metadata = {"metadata": {"event_type": "billing"}}
+
+    assert deadline_for_job({"timestamp": ingested.isoformat(), "payload": metadata}) == expected
+    aware = ingested.replace(tzinfo=timezone.utc).isoformat()
+    assert deadline_for_job({"timestamp": aware, "payload": metadata}) == expected
+
+
+def test_timeouts_are_capped_inside_deadline_scope():
+    """Downstream timeouts shrink to the remaining budget, never below the floor"""
+    assert bounded_timeout(30) == 30
+
+    with deadline_scope(time.time() + 5):
+        assert 4 < bounded_timeout(30) <= 5
+
+    with deadline_scope(time.time() - 10):
+        assert bounded_timeout(30) == 1.0
+        with pytest.raises(DeadlineExceeded):
+            check_deadline("test call")
+
+    assert bounded_timeout(30) == 30
@@ -0,0 +1,412 @@
+"""
+Tests for the ML server client (mocked HTTP transport, no ML server required)
+"""
+
+import gzip
+import json
+import time
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.ml_client import predict
+from app.ml_client.predict import PredictionBatcher, predict_documents
+from app.ml_client.resilience import CircuitBreaker, CircuitOpenError, hedged
+from app.ml_client.prediction_cache import PredictionCache
+from app.ml_client.fallback import predict_with_fallback
+from app.ml_client.balancer import EndpointBalancer
+from app.utils.deadline import DeadlineExceeded, deadline_scope
+
+
+@pytest.fixture
+def ml_server(monkeypatch):
+    """Fixture routing the shared ML client to an in-memory /predict handler"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        requests.append(body)
+
+        if "documents" in body:
+            return httpx.Response(200, json={
+                "predictions": [{"doc_type": doc["text"], "confidence": 0.9} for doc in body["documents"]]
+            })
+        return httpx.Response(200, json={"doc_type": body["text"], "confidence": 0.8})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(predict, "_http_client", client)
+    monkeypatch.setattr(predict, "get_prediction_cache", lambda: None)
+    yield requests
+
+
+class TestSharedClient:
+    """Test the lifecycle of the pooled ML client"""
+
+    @pytest.mark.asyncio
+    async def test_created_lazily_and_reused(self, monkeypatch):
+        monkeypatch.setattr(predict, "_http_client", None)
+
+        client = predict.get_ml_client()
+        try:
+            assert predict.get_ml_client() is client
+            assert client.headers["Authorization"] == f"Bearer {predict.ML_API_KEY}"
+            assert client.timeout.read == predict.REQUEST_TIMEOUT
+        finally:
+            await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_closed_client_is_replaced(self, monkeypatch):
+        monkeypatch.setattr(predict, "_http_client", None)
+
+        closed = predict.get_ml_client()
+        await closed.aclose()
+
+        client = predict.get_ml_client()
+        try:
+            assert client is not closed
+            assert not client.is_closed
+        finally:
+            await client.aclose()
+
+    @pytest.mark.asyncio
+    async def test_shutdown_closes_pool(self, monkeypatch):
+        monkeypatch.setattr(predict, "_http_client", None)
+        monkeypatch.setattr(predict, "_prediction_cache", None)
+
+        client = predict.get_ml_client()
+        await predict.shutdown_ml_client()
+
+        assert client.is_closed
+        assert predict._http_client is None
+
+
+class TestPredictionBatching:
+    """Test batched prediction requests"""
+
+    @pytest.mark.asyncio
+    async def test_predict_documents_keeps_order(self, ml_server):
+        """Batched predictions come back in request order"""
+        results = await predict_documents([{"text": "invoice"}, {"text": "contract"}])
+
+        assert [result["doc_type"] for result in results] == ["invoice", "contract"]
+        assert len(ml_server) == 1
+
+    @pytest.mark.asyncio
+    async def test_batcher_aggregates_concurrent_calls(self, ml_server):
+        """Concurrent submissions share one request and get their own result"""
+        batcher = PredictionBatcher(max_size=3, max_wait_ms=50)
+
+        results = await asyncio.gather(*[batcher.submit({"text": f"doc-{i}"}) for i in range(5)])
+
+        assert [result["doc_type"] for result in results] == [f"doc-{i}" for i in range(5)]
+        # One full batch of 3, then the remaining 2 after the wait
+        assert [len(body.get("documents", [body])) for body in ml_server] == [3, 2]
+        assert batcher.get_stats()["batches"] == 2
+
+    @pytest.mark.asyncio
+    async def test_batcher_single_request_uses_plain_endpoint(self, ml_server):
+        """A lone request is not wrapped in a batch"""
+        batcher = PredictionBatcher(max_size=8, max_wait_ms=1)
+
+        result = await batcher.submit({"text": "letter"})
+
+        assert result["doc_type"] == "letter"
+        assert "documents" not in ml_server[0]
+
+
+class TestRequestEncoding:
+    """Test gzip request bodies and incremental response parsing"""
+
+    @pytest.mark.asyncio
+    async def test_large_body_is_gzipped_and_entities_validated(self, monkeypatch):
+        """Large requests go out compressed; streamed entities are normalised"""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request.headers.get("content-encoding"))
+            body = json.loads(gzip.decompress(request.content))
+            return httpx.Response(200, json={
+                "doc_type": "contract",
+                "confidence": 0.9,
+                "entities": [
+                    {"type": "party", "text": body["text"][:5], "confidence": 0.8, "start_pos": 0, "end_pos": 5,
+                     "metadata": {"spans": [[0, 5]]}},
+                    {"type": "date", "confidence": 7},
+                    "not-an-entity"
+                ]
+            })
+
+        monkeypatch.setattr(predict, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(predict, "compression_stats", {**predict.compression_stats, "accepted": True})
+
+        result = await predict._send_predict({"text": "Vertrag " * 5000})
+
+        assert seen == ["gzip"]
+        assert result["event_type"] == "unknown"
+        assert [(e["type"], e["text"], e["confidence"]) for e in result["entities"]] == [
+            ("party", "Vertr", 0.8),
+            ("date", "", 0.0)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_rejected_gzip_is_resent_uncompressed(self, monkeypatch):
+        """A 415 answer switches compression off and retries plain JSON once"""
+        seen = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            seen.append(request.headers.get("content-encoding"))
+            if request.headers.get("content-encoding") == "gzip":
+                return httpx.Response(415)
+            return httpx.Response(200, json={"predictions": [{"doc_type": "memo"}, None]})
+
+        monkeypatch.setattr(predict, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        monkeypatch.setattr(predict, "compression_stats", {**predict.compression_stats, "accepted": True})
+
+        result = await predict._send_predict({"documents": [{"text": "x" * 20000}, {"text": ""}]}, batch=True)
+
+        assert seen == ["gzip", None]
+        assert [prediction["doc_type"] for prediction in result] == ["memo", "unknown"]
+        assert predict.compression_stats["accepted"] is False
+
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("streamed", [True, False])
+    async def test_streamed_and_buffered_parsing_agree(self, monkeypatch, streamed):
+        """Without ijson the response is parsed in one piece with the same validation"""
+        if streamed and predict.ijson is None:
+            pytest.skip("ijson not installed")
+        if not streamed:
+            monkeypatch.setattr(predict, "ijson", None)
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            entities = [{"type": "party", "text": "Acme", "confidence": 0.8}, {"type": "date", "confidence": 7}, 3]
+            if "documents" in json.loads(request.content):
+                return httpx.Response(200, json={"predictions": [{"doc_type": "invoice", "entities": entities}, "x"]})
+            return httpx.Response(200, json={"doc_type": "contract", "confidence": 0.9, "entities": entities})
+
+        monkeypatch.setattr(predict, "_http_client", httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+
+        single = await predict._send_predict({"text": "Vertrag"})
+        batch = await predict._send_predict({"documents": [{"text": "a"}, {"text": "b"}]}, batch=True)
+
+        assert (single["doc_type"], single["confidence"]) == ("contract", 0.9)
+        assert [(e["type"], e["confidence"]) for e in single["entities"]] == [("party", 0.8), ("date", 0.0)]
+        assert [prediction["doc_type"] for prediction in batch] == ["invoice", "unknown"]
+        assert [e["type"] for e in batch[0]["entities"]] == ["party", "date"]
+
+
+class TestCircuitBreaker:
+    """Test breaker state transitions"""
+
+    def test_opens_on_error_rate_and_recovers(self):
+        """Failures open the circuit; a successful half-open probe closes it"""
+        breaker = CircuitBreaker("test", window=4, min_calls=4, error_rate=0.5, open_seconds=60)
+
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_success(0.01)
+        for _ in range(2):
+            breaker.before_call()
+            breaker.record_failure(0.01)
+
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.open_seconds = 0
+        assert breaker.state == "half_open"
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()  # only one probe at a time
+        breaker.record_success(0.01)
+        assert breaker.state == "closed"
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast_without_retries(self, ml_server, monkeypatch):
+        """An open circuit rejects predictions without calling the server"""
+        breaker = CircuitBreaker("test", open_seconds=60)
+        breaker._open()
+        monkeypatch.setattr(predict, "ml_breaker", breaker)
+
+        with pytest.raises(CircuitOpenError):
+            await predict.predict_document({"text": "invoice"})
+
+        assert ml_server == []
+        assert breaker.get_stats()["rejected"] == 1
+
+
+@pytest.mark.asyncio
+async def test_hedged_returns_faster_attempt():
+    """A slow first attempt is overtaken by the hedge"""
+    delays = [0.5, 0.01]
+    stats = {}
+
+    async def call():
+        delay = delays.pop(0)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert await hedged(call, delay=0.02, stats=stats) == 0.01
+    assert stats == {"hedges_sent": 1, "hedges_won": 1}
+
+
+class TestPredictionCache:
+    """Test the in-process tier of the prediction cache"""
+
+    @pytest.mark.asyncio
+    async def test_hit_after_miss_and_invalidation_on_new_model(self):
+        """Same text hits the cache until the server reports a new model"""
+        server_info = {"model_version": "v1"}
+
+        async def fetch_info():
+            return server_info
+
+        cache = PredictionCache(fetch_info, max_size=10)
+
+        assert await cache.get("invoice 42") is None
+        await cache.set("invoice 42", {"doc_type": "invoice"}, "v1")
+        assert await cache.get("invoice 42") == {"doc_type": "invoice"}
+        assert cache.get_stats()["hit_rate"] == 0.5
+
+        server_info["model_version"] = "v2"
+        cache._version_checked_at = 0.0
+        assert await cache.get("invoice 42") is None
+        assert cache.model_version == "v2"
+        assert cache.get_stats()["redis"]["invalidations"] == 1
+
+    @pytest.mark.asyncio
+    async def test_prediction_of_replaced_model_is_not_stored(self):
+        """A result computed while the model changed is not cached under the new version"""
+        server_info = {"model_version": "v1"}
+
+        async def fetch_info():
+            return server_info
+
+        cache = PredictionCache(fetch_info, max_size=10)
+        model_version = await cache.get_model_version()
+
+        server_info["model_version"] = "v2"
+        cache._version_checked_at = 0.0
+        assert await cache.get_model_version() == "v2"
+
+        await cache.set("invoice 42", {"doc_type": "invoice"}, model_version)
+        assert await cache.get("invoice 42") is None
+
+
+class TestFallbackChain:
+    """Test degradation to cheaper classification tiers"""
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_degrades_to_next_tier(self, ml_server, monkeypatch):
+        """With the circuit open the ML server is skipped and the result flagged"""
+        breaker = CircuitBreaker("test", open_seconds=60)
+        breaker._open()
+        monkeypatch.setattr(predict, "ml_breaker", breaker)
+
+        result = await predict_with_fallback({"text": "Invoice 42, amount due"}, tiers=["ml", "rules"])
+
+        assert result["doc_type"] == "invoice"
+        assert result["degraded"] is True
+        assert result["tier"] == "rules"
+        assert result["degraded_reason"] == "circuit_open"
+        assert ml_server == []
+
+    @pytest.mark.asyncio
+    async def test_expired_deadline_skips_ml(self, ml_server):
+        """A deadline that has passed goes straight to the cheaper tier"""
+        result = await predict_with_fallback({"text": "contract"}, deadline=0, tiers=["ml", "heuristic"])
+
+        assert result["tier"] == "heuristic"
+        assert result["degraded_reason"] == "deadline"
+
+    @pytest.mark.asyncio
+    async def test_no_ml_request_after_deadline(self, ml_server):
+        """Direct ML calls are not sent once the job deadline has passed"""
+        with deadline_scope(time.time() - 1):
+            with pytest.raises(DeadlineExceeded):
+                await predict.predict_document({"text": "contract"})
+
+        assert ml_server == []
+
+    def test_no_retry_whose_backoff_runs_past_deadline(self):
+        """A retry is only started if its backoff and a minimal attempt fit before the deadline"""
+        stop = predict._stop_at_deadline()
+
+        assert not stop(SimpleNamespace(upcoming_sleep=4))
+        with deadline_scope(time.time() + 3):
+            assert stop(SimpleNamespace(upcoming_sleep=4))
+            assert not stop(SimpleNamespace(upcoming_sleep=0.5))
+        with deadline_scope(time.time() + 0.5):
+            assert stop(SimpleNamespace(upcoming_sleep=0))
+
+    @pytest.mark.asyncio
+    async def test_healthy_ml_is_not_degraded(self, ml_server):
+        """The first tier answers without degradation flags"""
+        result = await predict_with_fallback({"text": "letter"}, tiers=["ml", "rules"])
+
+        assert result["doc_type"] == "letter"
+        assert "degraded" not in result
+
+
+class TestEndpointBalancer:
+    """Test least-outstanding-requests routing"""
+
+    def test_prefers_idle_and_fast_endpoints(self):
+        """In-flight requests and latency both push traffic elsewhere"""
+        balancer = EndpointBalancer(["http://ml-a", "http://ml-b"])
+        first = balancer.acquire()
+        second = balancer.acquire()
+        assert {first.url, second.url} == {"http://ml-a", "http://ml-b"}
+
+        balancer.record_success(first, 2.0)
+        balancer.record_success(second, 0.01)
+        assert balancer.pick() is second
+
+    def test_consecutive_failures_eject_endpoint(self, monkeypatch):
+        """A failing replica is taken out of rotation"""
+        monkeypatch.setattr("app.ml_client.balancer.ML_EJECT_AFTER", 2)
+        balancer = EndpointBalancer(["http://ml-a", "http://ml-b"])
+        bad = balancer.endpoints[0]
+
+        for _ in range(2):
+            bad.in_flight += 1
+            balancer.record_failure(bad)
+
+        assert not bad.available
+        assert all(balancer.acquire() is balancer.endpoints[1] for _ in range(3))
+
+    @pytest.mark.asyncio
+    async def test_probe_restores_endpoint_it_marked_down(self):
+        """A successful active probe re-admits a replica that failed an earlier probe"""
+        balancer = EndpointBalancer(["http://ml-a"])
+
+        async def unhealthy(url):
+            return False
+
+        async def healthy(url):
+            return True
+
+        await balancer.probe(unhealthy)
+        assert not balancer.endpoints[0].available
+
+        await balancer.probe(healthy)
+        assert balancer.endpoints[0].available
+
+    @pytest.mark.asyncio
+    async def test_probe_does_not_cut_ejection_short(self, monkeypatch):
+        """A replica failing /predict but answering /health sits out its ejection window"""
+        monkeypatch.setattr("app.ml_client.balancer.ML_EJECT_AFTER", 1)
+        balancer = EndpointBalancer(["http://ml-a"])
+        endpoint = balancer.acquire()
+        balancer.record_failure(endpoint)
+
+        async def healthy(url):
+            return True
+
+        await balancer.probe(healthy)
+        assert not endpoint.available
+
+        endpoint.ejected_until = time.monotonic() - 1  # window over
+        assert endpoint.available
@@ -0,0 +1,383 @@
+"""
+Tests for the Ollama document analyzer (fake async client, no Ollama server required)
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app.ml_client import cascade, ollama_client
+from app.ml_client.ollama_client import OllamaDocumentAnalyzer
+from app.ml_client.llm_cache import LLMCache, SQLiteCacheStore
+from app.ml_client.ollama_pool import OllamaPool
+
+
+class FakeOllama:
+    """Async stand-in for ollama.AsyncClient answering by prompt content"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def generate(self, model, prompt, options=None, stream=False, **kwargs):
+        self.calls.append({"model": model, "prompt": prompt, "options": options, "stream": stream, **kwargs})
+        await asyncio.sleep(self.delay)
+
+        response = self._answer(prompt, model=model, **kwargs)
+        if stream:
+            return self._stream(response)
+        return response
+
+    async def _stream(self, response):
+        text = response["response"]
+        for start in range(0, len(text), 5):
+            await asyncio.sleep(0)
+            yield {"response": text[start:start + 5]}
+        yield {"response": "", "done": True, "prompt_eval_count": response.get("prompt_eval_count")}
+
+    async def list(self):
+        return {"models": []}
+
+    async def close(self):
+        pass
+
+    def _answer(self, prompt, model=None, **kwargs):
+        if kwargs.get("format"):
+            return {"response": json.dumps({
+                "doc_type": "invoice",
+                "event_type": "PAYMENT_DUE",
+                "data": {"invoice_number": "R-42", "total_amount": "500 EUR"}
+            }), "prompt_eval_count": 900, "eval_count": 40}
+        if "Dokumenttypen" in prompt:
+            return {"response": "INVOICE"}
+        if "Event-Type" in prompt:
+            return {"response": "PAYMENT_DUE"}
+        return {"response": json.dumps({"invoice_number": "R-42", "total_amount": "500 EUR"}),
+                "prompt_eval_count": 700, "eval_count": 30}
+
+
+@pytest.fixture
+def analyzer():
+    """Analyzer wired to the fake client"""
+    analyzer = OllamaDocumentAnalyzer()
+    analyzer.client = FakeOllama(delay=0.05)
+    analyzer.cache = None
+    return analyzer
+
+
+@pytest.mark.asyncio
+async def test_analyses_overlap_without_blocking_the_loop(analyzer):
+    """Concurrent analyses run in parallel and the loop keeps serving other work"""
+    ticks = 0
+
+    async def heartbeat():
+        nonlocal ticks
+        while True:
+            ticks += 1
+            await asyncio.sleep(0.01)
+
+    beat = asyncio.create_task(heartbeat())
+    start = asyncio.get_running_loop().time()
+    results = await asyncio.gather(*[
+        analyzer.analyze_document({"text": f"Rechnung R-{i} über 500 EUR"}, mode="multi_call")
+        for i in range(10)
+    ])
+    elapsed = asyncio.get_running_loop().time() - start
+    beat.cancel()
+
+    assert all(result["doc_type"] == "INVOICE" for result in results)
+    assert results[0]["extracted_data"]["invoice_number"] == "R-42"
+    # Ten documents of three 50 ms calls each, overlapping instead of 1.5 s in sequence
+    assert elapsed < 0.5
+    assert ticks >= 5
+
+
+@pytest.mark.asyncio
+async def test_single_pass_replaces_three_calls(analyzer):
+    """One JSON-formatted call yields the same analysis as the three-call mode"""
+    single = await analyzer.analyze_document({"text": "Rechnung R-42"}, mode="single_pass")
+    multi = await analyzer.analyze_document({"text": "Rechnung R-42"}, mode="multi_call")
+
+    for result in (single, multi):
+        assert (result["doc_type"], result["event_type"]) == ("INVOICE", "PAYMENT_DUE")
+        assert result["extracted_data"]["invoice_number"] == "R-42"
+
+    assert single["llm_usage"]["llm_calls"] == 1
+    assert multi["llm_usage"]["llm_calls"] == 3
+    assert analyzer.client.calls[0]["format"] == "json"
+    assert set(analyzer.get_usage_stats()) == {"single_pass", "multi_call"}
+
+
+@pytest.mark.asyncio
+async def test_identical_reanalysis_is_served_from_cache(analyzer, tmp_path):
+    """Deterministic calls are cached on disk; sampled extraction calls are not"""
+    store = SQLiteCacheStore(str(tmp_path / "llm_cache.db"), max_entries=100)
+    analyzer.cache = LLMCache(store)
+    document = {"text": "Rechnung R-42"}
+
+    first = await analyzer.analyze_document(document, mode="multi_call")
+    second = await analyzer.analyze_document(document, mode="multi_call")
+
+    # Both classification calls (temperature 0.1) hit, extraction (0.2) runs again
+    assert first["llm_usage"]["llm_calls"] == 3
+    assert (second["llm_usage"]["llm_calls"], second["llm_usage"]["cache_hits"]) == (1, 2)
+    assert second["doc_type"] == first["doc_type"]
+
+    # A fresh process finds the entries in the SQLite tier
+    analyzer.cache = LLMCache(store)
+    third = await analyzer.analyze_document(document, mode="multi_call")
+    assert third["llm_usage"]["cache_hits"] == 2
+    assert analyzer.cache.get_stats()["store"]["store_hits"] == 2
+    await analyzer.cache.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_reports_classification_before_fields(analyzer):
+    """Streaming analysis emits doc type, event type and each field ahead of the result"""
+    events = [event async for event in analyzer.analyze_document_stream({"text": "Rechnung R-42"}, mode="single_pass")]
+
+    assert [kind for kind, _ in events] == ["doc_type", "event_type", "field", "field", "result"]
+    assert events[2][1] == {"name": "invoice_number", "value": "R-42"}
+    assert events[-1][1]["extracted_data"] == {"invoice_number": "R-42", "total_amount": "500 EUR"}
+    assert analyzer.client.calls[0]["stream"] is True
+    assert events[-1][1]["llm_usage"]["prompt_tokens"] == 900
+
+
+@pytest.mark.asyncio
+async def test_routes_send_short_tasks_to_the_small_model(analyzer):
+    """Classification goes to the small model, long extractions to the large one"""
+    analyzer.router.set_routes([
+        {"task": "doc_type", "model": "gemma:2b"},
+        {"task": "event_type", "model": "gemma:2b"},
+        {"task": "extract", "max_chars": 100, "model": "phi3"}
+    ])
+
+    short = await analyzer.analyze_document({"text": "Rechnung R-42"}, mode="multi_call")
+    long = await analyzer.analyze_document({"text": "Rechnung R-42 " + "Position " * 50}, mode="multi_call")
+
+    assert [call["model"] for call in analyzer.client.calls] == [
+        "gemma:2b", "gemma:2b", "phi3", "gemma:2b", "gemma:2b", analyzer.default_model
+    ]
+    assert (short["model"], long["model"]) == ("phi3", analyzer.default_model)
+
+    metrics = {entry["task"] + ":" + entry["model"]: entry for entry in analyzer.router.get_stats()["metrics"]}
+    assert metrics["doc_type:gemma:2b"]["calls"] == 2
+    assert metrics["extract:phi3"]["prompt_tokens"] == 700
+
+    with pytest.raises(ValueError):
+        analyzer.router.set_routes([{"task": "summarize", "model": "phi3"}])
+    assert len(analyzer.router.routes) == 3
+
+
+class CheapModelMissesTotal(FakeOllama):
+    """The small model leaves out the invoice total, the large one finds it"""
+
+    def _answer(self, prompt, model=None, **kwargs):
+        response = super()._answer(prompt, model=model, **kwargs)
+        if model == "phi3" and kwargs.get("format"):
+            return {"response": json.dumps({"doc_type": "INVOICE", "event_type": "PAYMENT_DUE",
+                                            "data": {"invoice_number": "R-42"}})}
+        return response
+
+
+@pytest.mark.asyncio
+async def test_cascade_escalates_only_incomplete_extractions(analyzer, monkeypatch):
+    """A missing required field sends the document to the stronger model, complete ones stay small"""
+    monkeypatch.setattr(cascade, "OLLAMA_CASCADE_MODELS", ["llama3.2"])
+    monkeypatch.setattr(ollama_client, "OLLAMA_CASCADE_MODELS", ["llama3.2"])
+    monkeypatch.setattr(cascade, "cascade_stats", {})
+    analyzer.router.set_routes([{"task": "single_pass", "model": "phi3"}])
+
+    analyzer.client = CheapModelMissesTotal()
+    escalated = await analyzer.analyze_document({"text": "Rechnung R-42"}, mode="single_pass")
+    analyzer.client = FakeOllama()
+    cheap = await analyzer.analyze_document({"text": "Rechnung R-42"}, mode="single_pass")
+
+    assert escalated["cascade"] == {"models": ["phi3", "llama3.2"], "reasons": ["missing:total_amount"]}
+    assert escalated["extracted_data"]["total_amount"] == "500 EUR"
+    assert escalated["model"] == "llama3.2"
+    assert cheap["cascade"]["models"] == ["phi3"]
+    assert cascade.get_cascade_stats()["by_doc_type"]["INVOICE"]["escalation_rate"] == 0.5
+
+
+class CheapModelFindsOther(FakeOllama):
+    """The small model classifies the document as OTHER with a complete extraction"""
+
+    def _answer(self, prompt, model=None, **kwargs):
+        if kwargs.get("format"):
+            return {"response": json.dumps({"doc_type": "OTHER", "event_type": "DOCUMENT_PROCESSED", "data": {
+                "title": "Aushang", "date": "2024-05-01", "author": "Verwaltung",
+                "summary": "Hinweis zur Wartung", "keywords": ["Wartung"]
+            }})}
+        return super()._answer(prompt, model=model, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_cascade_keeps_complete_other_extractions(analyzer, monkeypatch):
+    """OTHER cannot reach the regular threshold, a complete extraction still stays on the small model"""
+    monkeypatch.setattr(cascade, "OLLAMA_CASCADE_MODELS", ["llama3.2"])
+    monkeypatch.setattr(ollama_client, "OLLAMA_CASCADE_MODELS", ["llama3.2"])
+    monkeypatch.setattr(cascade, "cascade_stats", {})
+    analyzer.router.set_routes([{"task": "single_pass", "model": "phi3"}])
+    analyzer.client = CheapModelFindsOther()
+
+    result = await analyzer.analyze_document({"text": "Aushang: Wartung am 1. Mai"}, mode="single_pass")
+
+    assert result["doc_type"] == "OTHER"
+    assert result["confidence"] < cascade.OLLAMA_CASCADE_MIN_CONFIDENCE
+    assert result["cascade"] == {"models": ["phi3"], "reasons": []}
+    assert cascade.validation_failure("OTHER", {}, 0.5) == "low_confidence"
+
+
+class CheapModelAnswersList(FakeOllama):
+    """The small model answers the extraction prompt with a JSON array instead of an object"""
+
+    def _answer(self, prompt, model=None, **kwargs):
+        response = super()._answer(prompt, model=model, **kwargs)
+        if model == "phi3" and "Dokumenttypen" not in prompt and "Event-Type" not in prompt:
+            return {"response": json.dumps([{"invoice_number": "R-42"}])}
+        return response
+
+
+@pytest.mark.asyncio
+async def test_cascade_escalates_non_object_extractions(analyzer, monkeypatch):
+    """A JSON array is treated as invalid output and escalated instead of failing the analysis"""
+    monkeypatch.setattr(cascade, "OLLAMA_CASCADE_MODELS", ["llama3.2"])
+    monkeypatch.setattr(ollama_client, "OLLAMA_CASCADE_MODELS", ["llama3.2"])
+    monkeypatch.setattr(cascade, "cascade_stats", {})
+    analyzer.router.set_routes([{"task": "extract", "model": "phi3"}])
+    analyzer.client = CheapModelAnswersList()
+
+    result = await analyzer.analyze_document({"text": "Rechnung R-42"}, mode="multi_call")
+
+    assert "error" not in result
+    assert result["cascade"] == {"models": ["phi3", "llama3.2"], "reasons": ["invalid_json"]}
+    assert result["extracted_data"]["total_amount"] == "500 EUR"
+
+    # Without an object the cascade still validates the shape before scoring it
+    async def list_attempt(model):
+        return "INVOICE", "PAYMENT_DUE", [{"invoice_number": "R-42"}]
+
+    outcome, models, reasons = await analyzer._cascade("extract", "Rechnung", list_attempt, lambda *args: None)
+    assert reasons == ["invalid_json", "invalid_json"]
+    assert outcome[2] == [{"invoice_number": "R-42"}]
+
+
+class PagedInvoice(FakeOllama):
+    """Reports what the prompt window shows: the number on page 1, items per page, the total at the end"""
+
+    def _answer(self, prompt, model=None, **kwargs):
+        data = {"items": [item for item in ("Beratung", "Wartung", "Lizenz") if item in prompt]}
+        if "Rechnung R-42" in prompt:
+            data["invoice_number"] = "R-42"
+        if "Zwischensumme 300 EUR" in prompt:
+            data["total_amount"] = "300 EUR"
+        if "Gesamtbetrag 900 EUR" in prompt:
+            data["total_amount"] = "900 EUR"
+        return {"response": json.dumps({"doc_type": "INVOICE", "event_type": "PAYMENT_DUE", "data": data})}
+
+
+@pytest.mark.asyncio
+async def test_long_documents_are_extracted_in_concurrent_windows(analyzer):
+    """Fields beyond the first 2000 characters are found; the last total wins, items are unioned"""
+    filler = "Leistungsbeschreibung " * 90
+    text = " ".join([
+        "Rechnung R-42 Beratung", filler, "Zwischensumme 300 EUR Wartung", filler, "Lizenz Gesamtbetrag 900 EUR"
+    ])
+    analyzer.client = PagedInvoice(delay=0.1)
+
+    start = asyncio.get_running_loop().time()
+    result = await analyzer.analyze_document({"text": text}, mode="single_pass")
+    elapsed = asyncio.get_running_loop().time() - start
+
+    assert len(analyzer.client.calls) >= 3
+    assert result["extracted_data"]["invoice_number"] == "R-42"
+    assert result["extracted_data"]["total_amount"] == "900 EUR"
+    assert result["extracted_data"]["items"] == ["Beratung", "Wartung", "Lizenz"]
+    # Windows run side by side: about one call's latency, not one per window
+    assert elapsed < 0.1 * len(analyzer.client.calls) * 0.75
+
+
+class FlakyServer(FakeOllama):
+    """Refuses connections while down"""
+
+    def __init__(self):
+        super().__init__()
+        self.down = True
+
+    async def list(self):
+        if self.down:
+            raise ConnectionError("connection refused")
+        return {"models": []}
+
+
+@pytest.mark.asyncio
+async def test_availability_backs_off_and_recovers(monkeypatch):
+    """Construction does no I/O; the prober backs off while Ollama is down and picks it up again"""
+    monkeypatch.setattr(ollama_client, "OLLAMA_PROBE_BACKOFF_MIN", 0.01)
+    monkeypatch.setattr(ollama_client, "OLLAMA_PROBE_TTL", 60)
+    analyzer = OllamaDocumentAnalyzer()
+    analyzer.client = server = FlakyServer()
+    analyzer.cache = None
+    assert analyzer.get_availability()["checked"] is False
+
+    result = await analyzer.analyze_document({"text": "Rechnung R-42"})
+    assert result == {"error": "Ollama nicht verfügbar"}
+
+    analyzer.start_probing()
+    await asyncio.sleep(0.1)
+    failures = analyzer.get_availability()["consecutive_failures"]
+    # 10 ms doubling: a handful of probes, not one per loop iteration
+    assert 2 <= failures <= 5
+
+    server.down = False
+    await asyncio.sleep(0.02 * 2 ** failures)
+    assert analyzer.is_available
+    assert analyzer.get_availability()["consecutive_failures"] == 0
+    assert (await analyzer.analyze_document({"text": "Rechnung R-42"}))["doc_type"] == "INVOICE"
+    await analyzer.close()
+
+
+class OllamaBox(FakeOllama):
+    """Host with a set of resident models, optionally refusing generate calls"""
+
+    def __init__(self, loaded, broken=False):
+        super().__init__()
+        self.loaded = loaded
+        self.broken = broken
+
+    async def ps(self):
+        return {"models": [{"model": name} for name in self.loaded]}
+
+    async def list(self):
+        return {"models": [{"model": "llama3.2:latest"}, {"model": "gemma:2b"}]}
+
+    async def generate(self, model, prompt, **kwargs):
+        if self.broken:
+            raise ConnectionError("connection reset")
+        return await super().generate(model, prompt, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_pool_prefers_hosts_with_the_model_loaded_and_falls_back(analyzer):
+    """Calls go to the host that has the model resident; a failing host hands over to the next"""
+    boxes = {
+        "http://cpu-1:11434": OllamaBox(["gemma:2b"]),
+        "http://cpu-2:11434": OllamaBox(["llama3.2:latest"]),
+        "http://cpu-3:11434": OllamaBox([], broken=True)
+    }
+    analyzer.pool = OllamaPool(list(boxes), lambda url: boxes[url])
+    await analyzer.probe()
+
+    await analyzer.analyze_document({"text": "Rechnung R-42"}, mode="single_pass")
+    assert len(boxes["http://cpu-2:11434"].calls) == 1
+    assert boxes["http://cpu-2:11434"].calls[0]["keep_alive"] == "30m"
+    assert not boxes["http://cpu-1:11434"].calls
+
+    # The host with the model resident breaks: the call moves to the next one
+    boxes["http://cpu-2:11434"].broken = True
+    result = await analyzer.analyze_document({"text": "Rechnung R-43"}, mode="single_pass")
+    assert result["doc_type"] == "INVOICE"
+    assert len(boxes["http://cpu-1:11434"].calls) == 1
+    assert "llama3.2:latest" in analyzer.pool.endpoints[0].loaded
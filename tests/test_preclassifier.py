@@ -0,0 +1,45 @@
+"""
+Tests for the keyword pre-classifier in front of the Ollama analyzer
+"""
+
+from app.schemas.doc_types import DocumentType, classify_document_type
+from app.ml_client.preclassifier import calibrate_threshold, preclassify
+
+INVOICE = "Rechnung Nr. 2024-118, Zahlungsziel 14 Tage, fällig am 01.03., MwSt 19%, IBAN DE12 3456"
+
+
+def test_confidence_grows_with_evidence_and_drops_with_conflict():
+    """More matching keywords raise confidence; competing types lower it"""
+    weak = classify_document_type({"text": "Rechnung"})
+    strong = classify_document_type({"text": INVOICE})
+    mixed = classify_document_type({"text": "Rechnung zum Vertrag, Vereinbarung vom Mai"})
+
+    assert weak.doc_type == strong.doc_type == DocumentType.INVOICE
+    assert strong.confidence > weak.confidence
+    assert mixed.confidence < weak.confidence
+    assert mixed.alternative_types
+
+
+def test_clear_documents_skip_the_llm_classification():
+    """Obvious invoices get doc and event type from the rules; vague text is left to the LLM"""
+    rules = preclassify(INVOICE, doc_threshold=0.8, event_threshold=0.7)
+    assert (rules.doc_type, rules.event_type) == ("INVOICE", "PAYMENT_DUE")
+
+    assert preclassify("Sehr geehrte Damen und Herren", doc_threshold=0.8).doc_type is None
+
+
+def test_calibration_picks_lowest_threshold_meeting_precision():
+    """The threshold admits as many documents as the labeled sample allows"""
+    samples = [
+        (INVOICE, "INVOICE"),
+        ("Kassenbon Kartenzahlung bezahlt", "RECEIPT"),
+        ("Rechnung", "INVOICE"),
+        ("Vertrag", "LETTER")
+    ]
+
+    result = calibrate_threshold(samples, target_precision=1.0)
+
+    # "Rechnung" and the mislabeled "Vertrag" score the same, so both stay with the LLM
+    assert 0.67 < result["threshold"] < 0.9
+    assert result["precision"] == 1.0
+    assert result["coverage"] == 0.5
@@ -0,0 +1,337 @@
+"""
+Tests for the in-process queue backend (no Redis required)
+"""
+
+import json
+
+import pytest
+
+from app.worker import queue_backend
+from app.worker.queue_backend import LocalQueueBackend, create_queue_backend, RedisQueueBackend
+
+
+@pytest.fixture
+def journal_path(tmp_path):
+    """Fixture providing a fresh journal file"""
+    return str(tmp_path / "queue.db")
+
+
+class TestLocalQueueBackend:
+    """Test asyncio queue with SQLite journal"""
+
+    @pytest.mark.asyncio
+    async def test_push_pop_fifo(self, journal_path):
+        """Jobs are returned in the order they were queued"""
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+
+        try:
+            for i in range(3):
+                await backend.push("doc_jobs", json.dumps({"job_id": f"job-{i}"}))
+
+            assert await backend.length("doc_jobs") == 3
+
+            popped = [json.loads(await backend.pop("doc_jobs", timeout=1))["job_id"] for _ in range(3)]
+            assert popped == ["job-0", "job-1", "job-2"]
+            assert await backend.length("doc_jobs") == 0
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_pop_timeout_returns_none(self, journal_path):
+        """Popping an empty queue returns None after the timeout"""
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+
+        try:
+            assert await backend.pop("doc_jobs", timeout=0.05) is None
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_pending_jobs_survive_restart(self, journal_path):
+        """Jobs not yet popped are restored from the journal"""
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+        await backend.push("doc_jobs", "first")
+        await backend.push("doc_jobs", "second")
+        await backend.push("doc_jobs:failed", "dead")
+        assert await backend.pop("doc_jobs", timeout=1) == "first"
+        await backend.close()
+
+        restored = LocalQueueBackend(journal_path)
+        await restored.connect()
+
+        try:
+            assert await restored.length("doc_jobs") == 1
+            assert await restored.pop("doc_jobs", timeout=1) == "second"
+            assert await restored.pop("doc_jobs:failed", timeout=1) == "dead"
+        finally:
+            await restored.close()
+
+    @pytest.mark.asyncio
+    async def test_unfinished_claims_survive_restart(self, journal_path):
+        """Jobs claimed but never completed (crashed worker) are queued again on restart"""
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+        for job_id in ("done", "failed", "crashed"):
+            await backend.push("doc_jobs", json.dumps({"job_id": job_id}))
+        for _ in range(3):
+            await backend.claim("doc_jobs", "worker-1", timeout=1)
+        await backend.complete("doc_jobs", "done")
+        await backend.fail("doc_jobs", "failed", "boom")
+        await backend.close()
+
+        restored = LocalQueueBackend(journal_path)
+        await restored.connect()
+
+        try:
+            assert await restored.length("doc_jobs") == 1
+            assert json.loads(await restored.claim("doc_jobs", "worker-2", timeout=1))["job_id"] == "crashed"
+            await restored.complete("doc_jobs", "crashed")
+        finally:
+            await restored.close()
+
+        # Completed after the restart: gone for good
+        again = LocalQueueBackend(journal_path)
+        await again.connect()
+        try:
+            assert await again.length("doc_jobs") == 0
+        finally:
+            await again.close()
+
+    @pytest.mark.asyncio
+    async def test_claim_complete_fail_bookkeeping(self, journal_path):
+        """Claim marks jobs processing; complete/fail move state and counters"""
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+
+        try:
+            await backend.push("doc_jobs", json.dumps({"job_id": "ok"}))
+            await backend.push("doc_jobs", json.dumps({"job_id": "bad"}))
+
+            await backend.claim("doc_jobs", "worker-1", timeout=1)
+            await backend.claim("doc_jobs", "worker-1", timeout=1)
+            state = await backend.get_job_state("doc_jobs", "ok")
+            assert state["status"] == "processing"
+            assert state["worker_id"] == "worker-1"
+
+            await backend.complete("doc_jobs", "ok")
+            await backend.fail("doc_jobs", "bad", "boom", dead_letter={"job_id": "bad"})
+
+            assert (await backend.get_job_state("doc_jobs", "bad"))["error"] == "boom"
+            assert await backend.get_counters("doc_jobs") == {
+                "dequeued": 2, "processing": 0, "completed": 1, "failed": 1, "cancelled": 0
+            }
+            assert await backend.length("doc_jobs:failed") == 1
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_cancel_queued_and_processing(self, journal_path):
+        """Cancelled queued jobs are skipped; running jobs are flagged for their worker"""
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+
+        try:
+            for job_id in ("queued", "running", "next"):
+                await backend.push("doc_jobs", json.dumps({"job_id": job_id}))
+
+            assert await backend.cancel("doc_jobs", "queued") == "queued"
+            assert json.loads(await backend.claim("doc_jobs", "worker-1", timeout=1))["job_id"] == "running"
+
+            assert await backend.cancel("doc_jobs", "running") == "processing"
+            assert await backend.is_cancelled("doc_jobs", "running")
+            await backend.complete("doc_jobs", "running", status="cancelled")
+            assert await backend.cancel("doc_jobs", "running") == "cancelled"
+
+            assert json.loads(await backend.claim("doc_jobs", "worker-1", timeout=1))["job_id"] == "next"
+            assert (await backend.get_counters("doc_jobs"))["cancelled"] == 2
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_job_states_batch(self, journal_path):
+        """Known jobs of a page are returned together, unknown ones are left out"""
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+
+        try:
+            await backend.push("doc_jobs", json.dumps({"job_id": "job-1"}))
+            await backend.claim("doc_jobs", "worker-1", timeout=1)
+
+            states = await backend.get_job_states("doc_jobs", ["job-1", "unknown"])
+            assert list(states) == ["job-1"]
+            assert states["job-1"]["status"] == "processing"
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_tombstones_expire(self, journal_path, monkeypatch):
+        """Cancel tombstones (also for unknown jobs) expire after the state TTL"""
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+
+        try:
+            await backend.cancel("doc_jobs", "unknown-1")
+            assert await backend.is_cancelled("doc_jobs", "unknown-1")
+
+            monkeypatch.setattr(queue_backend, "JOB_STATE_TTL", -1)
+            await backend.cancel("doc_jobs", "unknown-2")
+            assert not await backend.is_cancelled("doc_jobs", "unknown-1")
+            assert not await backend.is_cancelled("doc_jobs", "unknown-2")
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_state_limit_evicts_finished_jobs_only(self, journal_path, monkeypatch):
+        """Queued and running jobs keep their live status when the state table is full"""
+        monkeypatch.setattr(queue_backend, "LOCAL_STATE_LIMIT", 2)
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+
+        try:
+            for i in range(4):
+                await backend.push("doc_jobs", json.dumps({"job_id": f"job-{i}"}))
+            await backend.claim("doc_jobs", "worker-1", timeout=1)
+            for i in range(1, 4):
+                await backend.claim("doc_jobs", "worker-1", timeout=1)
+                await backend.complete("doc_jobs", f"job-{i}")
+
+            assert (await backend.get_job_state("doc_jobs", "job-0"))["status"] == "processing"
+            assert await backend.get_job_state("doc_jobs", "job-1") is None
+            assert await backend.get_job_state("doc_jobs", "job-2") is None
+            assert (await backend.get_job_state("doc_jobs", "job-3"))["status"] == "completed"
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_is_requeued_then_failed(self, journal_path, monkeypatch):
+        """Jobs of a dead worker go back to the queue until they run out of attempts"""
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+
+        try:
+            await backend.push("doc_jobs", json.dumps({"job_id": "job-1"}))
+            await backend.claim("doc_jobs", "worker-1", timeout=1)
+
+            # Held and renewed: nothing to reap
+            assert await backend.extend("doc_jobs", "job-1", "worker-1")
+            assert not await backend.extend("doc_jobs", "job-1", "worker-2")
+            assert await backend.reap_expired("doc_jobs", max_attempts=1) == {}
+
+            monkeypatch.setattr(queue_backend, "JOB_LEASE_SECONDS", -1)
+            assert await backend.extend("doc_jobs", "job-1", "worker-1")
+            assert await backend.reap_expired("doc_jobs", max_attempts=1) == {"job-1": "requeued"}
+            assert (await backend.get_counters("doc_jobs"))["processing"] == 0
+
+            await backend.claim("doc_jobs", "worker-2", timeout=1)
+            assert await backend.reap_expired("doc_jobs", max_attempts=1) == {"job-1": "failed"}
+            assert (await backend.get_job_state("doc_jobs", "job-1"))["status"] == "failed"
+            assert await backend.length("doc_jobs:failed") == 1
+        finally:
+            await backend.close()
+
+    @pytest.mark.asyncio
+    async def test_detached_job_is_not_reaped(self, journal_path, monkeypatch):
+        """Coalesced jobs stay processing without a lease of their own"""
+        monkeypatch.setattr(queue_backend, "JOB_LEASE_SECONDS", -1)
+        backend = LocalQueueBackend(journal_path)
+        await backend.connect()
+
+        try:
+            await backend.push("doc_jobs", json.dumps({"job_id": "job-1"}))
+            await backend.claim("doc_jobs", "worker-1", timeout=1)
+            await backend.detach("doc_jobs", "job-1")
+
+            assert await backend.reap_expired("doc_jobs", max_attempts=3) == {}
+            assert (await backend.get_job_state("doc_jobs", "job-1"))["status"] == "processing"
+        finally:
+            await backend.close()
+
+
+class TestRedisQueueBackend:
+    """Test the Lua bookkeeping scripts against an in-memory Redis"""
+
+    @pytest.fixture
+    def backend(self, monkeypatch):
+        """Fixture providing a backend whose connect() opens an in-memory Redis"""
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        monkeypatch.setattr(queue_backend.aioredis, "from_url", lambda url: fakeredis.aioredis.FakeRedis())
+        return RedisQueueBackend()
+
+    @staticmethod
+    async def _expire_lease(backend, job_id):
+        await backend.client.delete(f"doc_jobs:lease:{job_id}")
+        await backend.client.zadd("doc_jobs:leases", {job_id: 0})
+
+    @pytest.mark.asyncio
+    async def test_expired_lease_is_requeued_then_failed(self, backend):
+        await backend.connect()
+        await backend.push("doc_jobs", json.dumps({"job_id": "job-1"}))
+        await backend.claim("doc_jobs", "worker-1", timeout=1)
+
+        assert await backend.extend("doc_jobs", "job-1", "worker-1")
+        assert not await backend.extend("doc_jobs", "job-1", "worker-2")
+        assert await backend.reap_expired("doc_jobs", max_attempts=1) == {}
+
+        await self._expire_lease(backend, "job-1")
+        assert await backend.reap_expired("doc_jobs", max_attempts=1) == {"job-1": "requeued"}
+        assert await backend.length("doc_jobs") == 1
+        assert (await backend.get_counters("doc_jobs"))["processing"] == 0
+
+        await backend.claim("doc_jobs", "worker-2", timeout=1)
+        await self._expire_lease(backend, "job-1")
+        assert await backend.reap_expired("doc_jobs", max_attempts=1) == {"job-1": "failed"}
+        assert (await backend.get_job_state("doc_jobs", "job-1"))["status"] == "failed"
+        dead_letter = json.loads(await backend.pop("doc_jobs:failed", timeout=1))
+        assert dead_letter["error"] == "Job lease expired"
+        assert dead_letter["worker_id"] == "worker-2"
+
+    @pytest.mark.asyncio
+    async def test_cancel_running_job_with_expired_lease(self, backend):
+        """A job whose lease lapsed is still reported as processing and cancelled by the reaper"""
+        await backend.connect()
+        await backend.push("doc_jobs", json.dumps({"job_id": "job-1"}))
+        await backend.claim("doc_jobs", "worker-1", timeout=1)
+        await self._expire_lease(backend, "job-1")
+
+        assert await backend.cancel("doc_jobs", "job-1") == "processing"
+        assert await backend.reap_expired("doc_jobs", max_attempts=3) == {"job-1": "cancelled"}
+        assert await backend.length("doc_jobs") == 0
+        assert (await backend.get_counters("doc_jobs"))["cancelled"] == 1
+
+    @pytest.mark.asyncio
+    async def test_job_states_in_one_round_trip(self, backend):
+        await backend.connect()
+        for job_id in ("job-1", "job-2"):
+            await backend.push("doc_jobs", json.dumps({"job_id": job_id}))
+        await backend.claim("doc_jobs", "worker-1", timeout=1)
+        await backend.complete("doc_jobs", "job-1")
+        await backend.claim("doc_jobs", "worker-1", timeout=1)
+
+        states = await backend.get_job_states("doc_jobs", ["job-1", "job-2", "unknown"])
+
+        assert {job_id: state["status"] for job_id, state in states.items()} == {
+            "job-1": "completed", "job-2": "processing"
+        }
+
+    @pytest.mark.asyncio
+    async def test_complete_clears_lease_index(self, backend):
+        await backend.connect()
+        await backend.push("doc_jobs", json.dumps({"job_id": "job-1"}))
+        await backend.claim("doc_jobs", "worker-1", timeout=1)
+        await backend.complete("doc_jobs", "job-1")
+
+        assert await backend.client.zcard("doc_jobs:leases") == 0
+        assert await backend.client.hlen("doc_jobs:inflight") == 0
+
+
+def test_create_queue_backend():
+    """Factory selects the configured backend"""
+    assert isinstance(create_queue_backend("local"), LocalQueueBackend)
+    assert isinstance(create_queue_backend("redis"), RedisQueueBackend)
+
+    with pytest.raises(ValueError):
+        create_queue_backend("kafka")
@@ -0,0 +1,87 @@
+"""
+Tests for the deployment mode entry points and the worker health endpoint
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from app import run as run_module
+from app.worker import background_worker
+from app.worker.background_worker import WorkerPool, start_health_server
+from app.worker.queue_backend import LocalQueueBackend
+
+
+class TestRunMode:
+    """Test app.run mode selection"""
+
+    def test_unknown_mode_exits(self):
+        with pytest.raises(SystemExit):
+            run_module.run("batch")
+
+    def test_worker_mode_runs_worker_main(self, monkeypatch):
+        calls = []
+
+        async def fake_main():
+            calls.append("worker")
+
+        monkeypatch.setattr(background_worker, "main", fake_main)
+        monkeypatch.setenv("RUN_MODE", "combined")
+
+        run_module.run("worker")
+
+        assert calls == ["worker"]
+        assert run_module.os.environ["RUN_MODE"] == "worker"
+
+    @pytest.mark.parametrize("mode", ["api", "combined"])
+    def test_http_modes_start_uvicorn(self, monkeypatch, mode):
+        import uvicorn
+
+        calls = []
+        monkeypatch.setattr(uvicorn, "run", lambda app, **kwargs: calls.append(app))
+        monkeypatch.setenv("RUN_MODE", "worker")
+
+        run_module.run(mode)
+
+        assert calls == ["app.main:app"]
+        assert run_module.os.environ["RUN_MODE"] == mode
+
+
+async def _request(port, request_line):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request_line)
+    writer.write_eof()
+    response = await asyncio.wait_for(reader.read(), 5)
+    writer.close()
+    status_line, _, body = response.partition(b"\r\n")
+    return int(status_line.split()[1]), json.loads(body.split(b"\r\n\r\n", 1)[1])
+
+
+class TestWorkerHealthServer:
+    """Test the health endpoint of worker-only deployments"""
+
+    @pytest.mark.asyncio
+    async def test_health_and_malformed_requests(self, tmp_path):
+        backend = LocalQueueBackend(str(tmp_path / "queue.db"))
+        await backend.connect()
+        pool = WorkerPool(2, queue_backend=backend)
+        await pool.start()
+        server = await start_health_server(pool, port=0)
+        port = server.sockets[0].getsockname()[1]
+
+        try:
+            status, body = await _request(port, b"GET /health HTTP/1.1\r\n\r\n")
+            assert status == 200
+            assert body["workers"] == 2
+
+            status, _ = await _request(port, b"GET /metrics HTTP/1.1\r\n\r\n")
+            assert status == 404
+
+            for malformed in (b"GET\r\n", b"\r\n", b""):
+                status, _ = await _request(port, malformed)
+                assert status == 400
+        finally:
+            server.close()
+            await pool.stop()
+            await backend.close()
@@ -0,0 +1,60 @@
+"""
+Tests for the bounded payload text extractor
+"""
+
+from app.utils.text_extraction import extract_text, payload_to_text
+
+
+def test_preferred_keys_first_and_metadata_skipped():
+    """Body text comes before other fields; metadata is not model input"""
+    extracted = extract_text({
+        "title": "Rechnung",
+        "metadata": {"source": "upload"},
+        "document": {"id": "doc-1", "text": "Betrag: 500 EUR"}
+    })
+
+    assert extracted.text == "Betrag: 500 EUR\ndoc-1\nRechnung"
+    assert extracted.path_at(0) == "$.document.text"
+    assert extracted.path_at(len("Betrag: 500 EUR") + 1) == "$.document.id"
+    assert not extracted.truncated
+
+
+def test_budget_truncates_and_marks_result():
+    """Extraction stops at the character budget"""
+    extracted = extract_text({"pages": [{"text": "a" * 60}, {"text": "b" * 60}]}, max_chars=100)
+
+    assert len(extracted.text) == 100
+    assert extracted.truncated
+    assert extracted.path_at(99) == "$.pages[1].text"
+
+
+def test_ocr_structures_are_not_read_twice():
+    """Vision responses contribute their full text once"""
+    vision = {
+        "responses": [{
+            "textAnnotations": [{"description": "Hallo Welt"}, {"description": "Hallo"}],
+            "fullTextAnnotation": {
+                "text": "Hallo Welt",
+                "pages": [{"blocks": [{"paragraphs": [{"words": [{"symbols": [{"text": "H"}]}]}]}]}]
+            }
+        }]
+    }
+
+    extracted = extract_text(vision)
+
+    assert extracted.text == "Hallo Welt"
+    assert extracted.path_at(3) == "$.responses[0].fullTextAnnotation.text"
+
+
+def test_deep_nesting_does_not_recurse():
+    """Deeply nested payloads are walked iteratively"""
+    payload = "leaf"
+    for _ in range(5000):
+        payload = {"child": payload}
+
+    assert extract_text(payload).text == "leaf"
+
+
+def test_payload_without_strings_falls_back_to_compact_json():
+    """Numeric-only payloads are serialised without indentation"""
+    assert payload_to_text({"amount": 5, "items": [1, 2]}) == '{"amount":5,"items":[1,2]}'